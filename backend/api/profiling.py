@@ -0,0 +1,28 @@
+"""
+Request dependency for opt-in profiling
+"""
+
+from typing import Callable, Optional
+
+from fastapi import Query, Request
+
+from services.profiling import RequestProfile, start_profile
+
+_TRUE = {'1', 'true', 'yes', 'on'}
+
+
+def request_profile(name: str) -> Callable[..., Optional[RequestProfile]]:
+    """
+    Dependency giving a RequestProfile when the request asks for one
+
+    Profiling is requested with ?profile=true or an X-Profile: 1 header
+    and only happens when PROFILE_ENABLED is set.
+    """
+    def dependency(
+        request: Request,
+        profile: bool = Query(False, description="Profile this request (requires PROFILE_ENABLED)")
+    ) -> Optional[RequestProfile]:
+        requested = profile or request.headers.get('x-profile', '').lower() in _TRUE
+        return start_profile(name, requested)
+
+    return dependency
@@ -0,0 +1,70 @@
+"""
+Pre-encoded JSON responses with content negotiation and ETags
+"""
+
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+
+from core.config import settings
+from services.executor import executor
+from services.metrics import metrics
+from services.serialization import compress
+
+
+def _opaque_tag(tag: str) -> str:
+    """An entity tag without its weak prefix, for weak comparison"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def canonical_query(request: Request) -> str:
+    """The request's query parameters in a fixed order, for deriving entity tags"""
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names etag (weak comparison)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    tags = {_opaque_tag(tag) for tag in header.split(',')}
+    return '*' in tags or _opaque_tag(etag) in tags
+
+
+def not_modified(etag: str, endpoint: str) -> Response:
+    """Empty 304 response confirming the client's copy is current"""
+    metrics.not_modified.inc(endpoint=endpoint)
+    return Response(status_code=304, headers={'ETag': etag, 'Vary': 'Accept-Encoding'})
+
+
+def _compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    with metrics.stage('compress'):
+        return compress(body, accept_encoding)
+
+
+async def json_response(
+    request: Request,
+    body: bytes,
+    status_code: int = 200,
+    etag: Optional[str] = None
+) -> Response:
+    """
+    Send already-encoded JSON, compressed as the client's Accept-Encoding allows
+
+    Bodies of RESPONSE_COMPRESS_OFFLOAD_BYTES or more are compressed on
+    the worker pool, keeping the event loop free for other requests.
+    """
+    accept_encoding = request.headers.get('accept-encoding')
+    if len(body) >= settings.RESPONSE_COMPRESS_OFFLOAD_BYTES:
+        body, encoding = await executor.run(_compress, body, accept_encoding)
+    else:
+        body, encoding = _compress(body, accept_encoding)
+    metrics.response_bytes.inc(len(body), encoding=encoding or 'identity')
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    if etag is not None:
+        headers['ETag'] = etag
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
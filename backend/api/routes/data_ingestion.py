@@ -2,21 +2,66 @@
 Data ingestion API routes
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import time
+from datetime import date
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from pathlib import Path
 from typing import Optional
 
-from core.models import DataIngestionResponse
-from services.data_service import DataService
+from api.profiling import request_profile
+from core.config import settings
+from core.models import DataIngestionResponse, StockImportResponse
+from services.columnar import read_stock_csv
+from services.data_service import StreamIngestResult, mapped_file
+from services.dataset import dataset
+from services.executor import executor, ExecutorSaturated
+from services.profiling import RequestProfile, profiled
+from services.snapshot import SnapshotError, read_manifest
+from services.tenants import tenant_registry
 
 router = APIRouter()
-data_service = DataService()
+
+
+def _ingestion_response(result: StreamIngestResult) -> DataIngestionResponse:
+    records = result.rows_processed
+    unique_products = result.products_identified
+    
+    return DataIngestionResponse(
+        success=True,
+        records_processed=records,
+        products_identified=unique_products,
+        message=f"Successfully processed {records} transactions for {unique_products} products",
+        records_rejected=result.reject_report.total_rejected,
+        records_duplicate=result.duplicate_rows,
+        reject_report=result.reject_report,
+        rows_per_second=round(result.rows_per_second, 1),
+        peak_rss_mb=(
+            round(result.peak_rss_bytes / (1024 * 1024), 1)
+            if result.peak_rss_bytes is not None else None
+        )
+    )
+
+
+def _parse_upload(upload) -> StreamIngestResult:
+    """Parse an upload for its counts and rejects without adding it to the dataset"""
+    with mapped_file(upload) as buffer:
+        return dataset.data_service.ingest_csv_buffer(buffer)
 
 
 @router.post("/ingest/csv", response_model=DataIngestionResponse)
-async def ingest_csv_data(file: UploadFile = File(...)):
+async def ingest_csv_data(
+    file: UploadFile = File(...),
+    append: bool = Query(False, description="Add the upload to the dataset instead of only validating it"),
+    profile: Optional[RequestProfile] = Depends(request_profile("ingest"))
+):
     """
     Upload and ingest transaction data from CSV file
     
+    By default the upload is only parsed and counted. With append=true
+    it is added to the existing dataset as a delta. With profiling
+    enabled, ?profile=true (or an X-Profile: 1 header) traces the
+    ingestion and adds its hottest functions to the response.
+    
     Expected CSV format:
     transaction_id,product_id,product_name,quantity,unit_price,transaction_date,customer_id
     """
@@ -24,42 +69,186 @@ async def ingest_csv_data(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be a CSV file")
     
     try:
-        # Save uploaded file temporarily
-        import tempfile
-        import os
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
-        
-        # Process the CSV
-        transactions = data_service.ingest_transactions_from_csv(tmp_file_path)
-        
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
-        
-        # Get unique products
-        unique_products = len(set(t.product_id for t in transactions))
-        
-        return DataIngestionResponse(
-            success=True,
-            records_processed=len(transactions),
-            products_identified=unique_products,
-            message=f"Successfully processed {len(transactions)} transactions for {unique_products} products"
-        )
+        # Parse the spooled upload in place through a memory map; parsing
+        # is CPU-bound, so run it off the event loop
+        ingest = dataset.ingest_csv_mapped if append else _parse_upload
+        result = await executor.run(profiled(profile, ingest), file.file)
+        response = _ingestion_response(result)
+        if profile:
+            response.profile = await executor.run(profile.save)
+        return response
     
+    except ExecutorSaturated:
+        raise
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
 
 
+@router.post("/ingest/file", response_model=DataIngestionResponse)
+async def ingest_csv_file(
+    filename: str = Query(..., description="Name of a CSV file in the upload directory"),
+    replace: bool = Query(False, description="Replace existing data instead of adding to it")
+):
+    """
+    Ingest a CSV file that is already in the upload directory
+    
+    The file is memory-mapped and parsed in place (in parallel if it is
+    large), so nothing is uploaded or copied.
+    """
+    upload_dir = Path(settings.UPLOAD_DIR).resolve()
+    path = (upload_dir / filename).resolve()
+    if upload_dir not in path.parents:
+        raise HTTPException(status_code=400, detail="File must be inside the upload directory")
+    if path.suffix != '.csv':
+        raise HTTPException(status_code=400, detail="File must be a CSV file")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail=f"File not found: {filename}")
+    
+    try:
+        result = await executor.run(dataset.ingest_csv_file, str(path), replace=replace)
+        return _ingestion_response(result)
+    
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+
+
+def _import_stock(upload, as_of: Optional[date]) -> StockImportResponse:
+    started = time.perf_counter()
+    batch, report = read_stock_csv(upload.read())
+    with_sales = dataset.import_stock(batch, as_of)
+    seconds = time.perf_counter() - started
+    records = len(batch)
+    
+    return StockImportResponse(
+        success=True,
+        records_processed=records,
+        products_with_sales=with_sales,
+        stocked_products=len(dataset.stock),
+        message=f"Successfully imported {records} stock rows, {with_sales} for products with sales",
+        records_rejected=report.total_rejected,
+        reject_report=report,
+        rows_per_second=round(records / seconds, 1) if seconds > 0 else None
+    )
+
+
+@router.post("/ingest/stock", response_model=StockImportResponse)
+async def ingest_stock_levels(
+    file: UploadFile = File(...),
+    as_of: Optional[date] = Query(None, description="Day the stock was counted (default: newest day with sales)")
+):
+    """
+    Upload stock on hand and unit cost per product
+    
+    Rows update the stored levels by product_id, and blank values keep
+    what was imported before. Current stock is the count less units sold
+    after the as_of day; unit costs value slow-moving stock and reorders.
+    
+    Expected CSV format (stock_on_hand or unit_cost may be left out):
+    product_id,stock_on_hand,unit_cost
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV file")
+    
+    try:
+        return await executor.run(_import_stock, file.file, as_of)
+    
+    except ExecutorSaturated:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+
+
+def _ingest_tenant_upload(tenant_id: str, upload, replace: bool) -> StreamIngestResult:
+    with tenant_registry.use(tenant_id, create=True) as tenant:
+        return tenant.dataset.ingest_csv_mapped(upload, replace)
+
+
+@router.post("/tenants/{tenant_id}/ingest/csv", response_model=DataIngestionResponse)
+async def ingest_tenant_csv(
+    tenant_id: str,
+    file: UploadFile = File(...),
+    replace: bool = Query(False, description="Replace the tenant's data instead of adding to it")
+):
+    """
+    Upload transaction data for one tenant
+    
+    The tenant is created on its first upload. Each tenant's data,
+    inventory and decision results are independent of other tenants'.
+    """
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV file")
+    
+    try:
+        result = await executor.run(_ingest_tenant_upload, tenant_id, file.file, replace)
+        return _ingestion_response(result)
+    
+    except ExecutorSaturated:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+
+
+def _snapshot_summary(manifest: dict, seconds: float) -> dict:
+    return {
+        "path": settings.SNAPSHOT_PATH,
+        "version": manifest["version"],
+        "created_at": manifest["created_at"],
+        "compressed": manifest["compressed"],
+        "rows": {name: table["rows"] for name, table in manifest["tables"].items()},
+        "seconds": round(seconds, 3)
+    }
+
+
+@router.post("/snapshot")
+async def save_snapshot(
+    compress: Optional[bool] = Query(None, description="Compress columns (default: SNAPSHOT_COMPRESS)")
+):
+    """Write the dataset to a binary columnar snapshot in SNAPSHOT_PATH"""
+    started = time.perf_counter()
+    manifest = await executor.run(dataset.save_snapshot, compress=compress)
+    return _snapshot_summary(manifest, time.perf_counter() - started)
+
+
+@router.post("/snapshot/load")
+async def load_snapshot():
+    """Replace the in-memory dataset with the snapshot in SNAPSHOT_PATH"""
+    if not Path(settings.SNAPSHOT_PATH).is_dir():
+        raise HTTPException(status_code=404, detail="No snapshot has been saved")
+    
+    started = time.perf_counter()
+    try:
+        await executor.run(dataset.load_snapshot)
+    except SnapshotError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return _snapshot_summary(read_manifest(settings.SNAPSHOT_PATH), time.perf_counter() - started)
+
+
 @router.get("/ingest/status")
 async def get_ingestion_status():
     """Get status of data ingestion"""
-    return {
+    status = {
         "status": "ready",
         "supported_formats": ["CSV"],
         "message": "Data ingestion service is operational"
     }
+    
+    history = dataset.history
+    if history is not None:
+        rows = len(history)
+        status["retained_transactions"] = rows
+        status["history_bytes_per_row"] = round(history.memory_bytes() / rows, 1) if rows else None
+    if len(dataset.stock):
+        status["stocked_products"] = len(dataset.stock)
+    transaction_ids = dataset.transaction_ids
+    if transaction_ids is not None:
+        status["indexed_transaction_ids"] = len(transaction_ids)
+        status["transaction_id_index_bytes"] = transaction_ids.memory_bytes()
+    return status
@@ -2,168 +2,743 @@
 Decision-focused API routes
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import Optional
-import tempfile
-import os
+import asyncio
+import time
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Optional, Tuple, Union
 
 from core.models import (
+    BatchDecisionRequest,
+    BatchDecisionResponse,
+    DecisionAnalysis,
+    DecisionChangesResponse,
     DecisionResponse,
     DecisionInsight,
+    DecisionType,
     InventoryRisk,
+    JobResponse,
+    JobStatus,
+    ProfileSummary,
+    RiskLevel,
     SlowMovingProduct,
-    ReorderRecommendation
+    ReorderRecommendation,
+    ScenarioSweepRequest,
+    ScenarioSweepResponse,
+    StreamFormat,
+    TenantDecisions
 )
-from services.data_service import DataService
-from services.decision_service import DecisionService
+from api.profiling import request_profile
+from api.responses import canonical_query, etag_matches, json_response, not_modified
+from core.config import settings
+from services.dataset import DataVersion, dataset
+from services.decision_cache import DecisionPipeline
+from services.decision_index import (
+    JsonPage,
+    JsonStream,
+    ResultFilter,
+    ResultIndex,
+    ResultPage,
+    decode_cursor,
+    encode_cursor,
+)
+from services.decision_service import RISK_PRIORITY, DecisionService
+from services.executor import executor, ExecutorSaturated
+from services.jobs import Job, job_queue
+from services.metrics import metrics
+from services.profiling import RequestProfile, profiled
+from services.scenarios import ScenarioSweep, expand_grid
+from services.serialization import (
+    dumps,
+    model_json,
+    ndjson_frames,
+    object_with_array,
+    object_with_arrays,
+    sse_frames,
+    stream_chunks,
+)
+from services.tenants import TenantNotFound, tenant_registry
+from services.vectorized_decisions import DECISION_TYPE_CODES
 
 router = APIRouter()
-data_service = DataService()
 decision_service = DecisionService()
+pipeline = DecisionPipeline(dataset, decision_service)
+
+# Index column codes back to their enum values
+RISK_LEVELS = {code: level for level, code in RISK_PRIORITY.items()}
+DECISION_TYPES = {code: decision_type for decision_type, code in DECISION_TYPE_CODES.items()}
+
+
+class DecisionQuery:
+    """Filter and pagination parameters shared by the decision endpoints"""
+    
+    def __init__(
+        self,
+        priority: Optional[RiskLevel] = Query(None, description="Only rows with this priority"),
+        decision_type: Optional[DecisionType] = Query(None, description="Only rows leading to this decision"),
+        product_id_prefix: Optional[str] = Query(None, description="Only products whose id starts with this"),
+        limit: Optional[int] = Query(
+            None, ge=1, le=settings.DECISION_PAGE_MAX_LIMIT,
+            description="Page size; omit to return all matching rows"
+        ),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        top_k: Optional[int] = Query(
+            None, ge=1, le=settings.DECISION_PAGE_MAX_LIMIT,
+            description="Return only the k highest-priority matching rows"
+        ),
+    ):
+        self.filter = ResultFilter(
+            priority=priority,
+            decision_type=decision_type,
+            product_id_prefix=product_id_prefix
+        )
+        self.limit = limit
+        self.cursor = cursor
+        self.top_k = top_k
+
+
+def _query_bounds(version: DataVersion, query: DecisionQuery) -> Tuple[int, Optional[int]]:
+    """Offset and limit of the rows a query asks for in a data version"""
+    if query.top_k is not None:
+        # Results are stored in priority order, so the top k are a prefix
+        return 0, query.top_k
+    
+    offset = 0
+    if query.cursor:
+        try:
+            offset = decode_cursor(query.cursor, version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return offset, query.limit
+
+
+def _index_page(
+    index: ResultIndex,
+    version: DataVersion,
+    query: DecisionQuery,
+    encoded: bool = False
+) -> Union[ResultPage, JsonPage]:
+    """
+    Fetch the requested page from an analysis's index and set its next cursor
+    
+    version is the data version the index was built from. Encoded pages
+    hold the rows as a JSON array, reusing each row's encoding from
+    earlier requests for the same data version.
+    """
+    fetch = index.page_json if encoded else index.page
+    page = fetch(query.filter, *_query_bounds(version, query))
+    if query.top_k is not None:
+        page.next_offset = None
+    return page
+
+
+def _insights_page(pipeline: DecisionPipeline, query: DecisionQuery, encoded: bool = False):
+    """The data version, requested page of insights and per-priority counts of all matches"""
+    version, index = pipeline.versioned_index('insights')
+    return version, _index_page(index, version, query, encoded), index.count_by_level(query.filter)
+
+
+def _tagged_page(
+    pipeline: DecisionPipeline,
+    analysis: str,
+    query: DecisionQuery,
+    request: Request
+) -> Tuple[str, Optional[Tuple[DataVersion, JsonPage]]]:
+    """An analysis's ETag and, unless the client's copy is still current, the data version and page"""
+    version, index = pipeline.versioned_index(analysis)
+    etag = pipeline.etag(analysis, canonical_query(request), version)
+    if etag_matches(request, etag):
+        return etag, None
+    return etag, (version, _index_page(index, version, query, True))
+
+
+def _tagged_stream(
+    pipeline: DecisionPipeline,
+    analysis: str,
+    query: DecisionQuery,
+    request: Request
+) -> Tuple[str, Optional[Tuple[DataVersion, JsonStream]]]:
+    """Like _tagged_page, but rows are encoded as the stream is consumed"""
+    version, index = pipeline.versioned_index(analysis)
+    etag = pipeline.etag(analysis, canonical_query(request), version)
+    if etag_matches(request, etag):
+        return etag, None
+    stream = index.stream_json(query.filter, *_query_bounds(version, query))
+    if query.top_k is not None:
+        stream.next_offset = None
+    return etag, (version, stream)
+
+
+async def _list_response(request: Request, key: str, page: JsonPage, version: DataVersion, etag: Optional[str] = None) -> Response:
+    """Encoded body of the paginated list endpoints"""
+    fields = {"total": page.total, "next_cursor": _next_cursor(page, version)}
+    return await json_response(request, object_with_array(fields, key, page.body), etag=etag)
+
+
+def _next_cursor(page: Union[ResultPage, JsonPage, JsonStream], version: DataVersion) -> Optional[str]:
+    if page.next_offset is None:
+        return None
+    return encode_cursor(version, page.next_offset)
+
+
+def _decision_body(
+    page: JsonPage,
+    level_counts,
+    version: DataVersion,
+    profile: Optional[ProfileSummary] = None
+) -> bytes:
+    """Encoded DecisionResponse around an already-encoded insights page"""
+    fields = {
+        "timestamp": datetime.now(),
+        "total_insights": page.total,
+        "critical_actions": level_counts[RiskLevel.CRITICAL],
+        "next_cursor": _next_cursor(page, version),
+        "data_version": version.number,
+    }
+    if profile is not None:
+        fields["profile"] = profile.model_dump(mode='json')
+    return object_with_array(fields, "insights", page.body)
+
+
+def _job_query(params: Dict[str, Any], limit: Optional[int] = None, cursor: Optional[str] = None) -> DecisionQuery:
+    """The DecisionQuery a generate job was submitted with, paged by limit and cursor"""
+    return DecisionQuery(
+        priority=RiskLevel(params['priority']) if params.get('priority') else None,
+        decision_type=DecisionType(params['decision_type']) if params.get('decision_type') else None,
+        product_id_prefix=params.get('product_id_prefix'),
+        limit=limit or params.get('limit'),
+        cursor=cursor,
+        top_k=params.get('top_k')
+    )
+
+
+def _run_generate_job(job: Job) -> Dict[str, Any]:
+    """
+    Background version of generate: ingest, analyze, return the totals
+    
+    The insights themselves are not kept with the job; they are served
+    in pages from the cached results of the data version it produced.
+    """
+    params = job.params
+    if job.upload_path:
+        job.stage = "ingesting"
+        # Spooled uploads are plain files, so large ones are parsed in parallel
+        dataset.ingest_csv_file(
+            job.upload_path,
+            replace=not params.get('append', False),
+            progress=job.record_rows
+        )
+        job.bytes_read = job.total_bytes
+    elif not dataset:
+        raise ValueError("No data available. Please upload a CSV file first.")
+    
+    # Run the analyses one at a time so progress shows which is in flight;
+    # building the insights page afterwards reuses their cached results
+    for stage, analysis in (
+        ("assessing_risks", pipeline.inventory_risks),
+        ("finding_slow_movers", pipeline.slow_movers),
+        ("recommending_reorders", pipeline.reorder_recommendations),
+    ):
+        job.stage = stage
+        analysis()
+    
+    job.stage = "building_insights"
+    with dataset.lock:
+        query = _job_query(params)
+        level_counts = pipeline.index('insights').count_by_level(query.filter)
+        return {
+            "data_version": dataset.version,
+            "data_epoch": dataset.epoch,
+            "total_insights": sum(level_counts.values()),
+            "critical_actions": level_counts[RiskLevel.CRITICAL],
+        }
 
-# In-memory storage for demo purposes
-# In production, use a proper database
-_inventory_cache = {}
-_transactions_cache = []
+
+def _job_insights_page(job: Job, limit: Optional[int], cursor: Optional[str]) -> Tuple[DataVersion, JsonPage, Any]:
+    """A page of a finished generate job's insights, if its data version is still current"""
+    with dataset.lock:
+        if dataset.data_version != (job.result.get("data_epoch"), job.result["data_version"]):
+            raise HTTPException(
+                status_code=410,
+                detail=f"Data changed since job {job.job_id} ran; submit it again or use /decisions/generate"
+            )
+        return _insights_page(pipeline, _job_query(job.params, limit, cursor), True)
+
+
+job_queue.register("generate_decisions", _run_generate_job)
 
 
 @router.post("/decisions/generate", response_model=DecisionResponse)
-async def generate_decisions(file: Optional[UploadFile] = File(None)):
+async def generate_decisions(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    append: bool = Query(False, description="Add the upload to existing data instead of replacing it"),
+    query: DecisionQuery = Depends(),
+    profile: Optional[RequestProfile] = Depends(request_profile("generate"))
+):
     """
     Generate decision insights from transaction data
     
     If a CSV file is provided, it will be processed first.
     Otherwise, uses cached data from previous ingestion.
-    """
-    global _inventory_cache, _transactions_cache
     
+    Filters and pagination apply to the returned insights; the totals
+    describe all insights matching the filters. With profiling enabled,
+    ?profile=true (or an X-Profile: 1 header) traces the request and adds
+    its hottest functions to the response.
+    """
     try:
         # Process CSV if provided
         if file:
             if not file.filename.endswith('.csv'):
                 raise HTTPException(status_code=400, detail="File must be a CSV file")
             
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-                content = await file.read()
-                tmp_file.write(content)
-                tmp_file_path = tmp_file.name
-            
-            transactions = data_service.ingest_transactions_from_csv(tmp_file_path)
-            _transactions_cache = transactions
-            os.unlink(tmp_file_path)
-        elif not _transactions_cache:
+            # Parse the spooled upload in place through a memory map
+            await executor.run(profiled(profile, dataset.ingest_csv_mapped), file.file, replace=not append)
+        elif not dataset:
             raise HTTPException(
                 status_code=400, 
                 detail="No data available. Please upload a CSV file first."
             )
-        else:
-            transactions = _transactions_cache
-        
-        # Calculate inventory
-        inventory = data_service.calculate_product_inventory(transactions)
-        _inventory_cache = inventory
-        
-        # Generate insights
-        inventory_risks = decision_service.identify_inventory_risks(inventory)
-        slow_movers = decision_service.identify_slow_moving_products(inventory)
-        reorder_recommendations = decision_service.generate_reorder_recommendations(
-            inventory, inventory_risks
-        )
         
-        # Generate comprehensive decision insights
-        insights = decision_service.generate_decision_insights(
-            inventory,
-            inventory_risks,
-            slow_movers,
-            reorder_recommendations
-        )
-        
-        # Count critical actions
-        from core.models import RiskLevel
-        critical_count = sum(1 for i in insights if i.priority == RiskLevel.CRITICAL)
-        
-        from datetime import datetime
-        return DecisionResponse(
-            timestamp=datetime.now(),
-            total_insights=len(insights),
-            critical_actions=critical_count,
-            insights=insights
-        )
+        # Analyses are memoized per dataset version; misses run on a worker
+        version, page, level_counts = await executor.run(profiled(profile, _insights_page), pipeline, query, True)
+        summary = await executor.run(profile.save) if profile else None
+        return await json_response(request, _decision_body(page, level_counts, version, summary))
     
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating decisions: {str(e)}")
 
 
+@router.post("/decisions/generate/jobs", response_model=JobResponse, status_code=202)
+async def submit_generate_job(
+    file: Optional[UploadFile] = File(None),
+    append: bool = Query(False, description="Add the upload to existing data instead of replacing it"),
+    query: DecisionQuery = Depends()
+):
+    """
+    Queue decision generation as a background job
+    
+    Returns immediately with a job id; poll GET /jobs/{job_id} for
+    progress. Once the job has succeeded its result holds the totals and
+    data_version, and GET /decisions/generate/jobs/{job_id}/insights
+    pages through the insights. Cursors are not accepted here.
+    """
+    if file and not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV file")
+    
+    params = {
+        "append": append,
+        "priority": query.filter.priority,
+        "decision_type": query.filter.decision_type,
+        "product_id_prefix": query.filter.product_id_prefix,
+        "limit": query.limit,
+        "top_k": query.top_k,
+    }
+    # Spooling the upload to disk is blocking I/O
+    job = await executor.run(
+        job_queue.submit, "generate_decisions", params, file.file if file else None
+    )
+    return job.to_response()
+
+
+@router.get("/decisions/generate/jobs/{job_id}/insights", response_model=DecisionResponse)
+async def get_generate_job_insights(
+    request: Request,
+    job_id: str,
+    limit: Optional[int] = Query(
+        None, ge=1, le=settings.DECISION_PAGE_MAX_LIMIT,
+        description="Page size; defaults to the limit the job was submitted with"
+    ),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """
+    Page through the insights of a succeeded generate job
+    
+    Served from the cached results of the data version the job
+    produced, with the filters it was submitted with; 410 once newer
+    data has been ingested.
+    """
+    job = job_queue.get(job_id)
+    if job is None or job.kind != "generate_decisions":
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job.status != JobStatus.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has not succeeded")
+    
+    version, page, level_counts = await executor.run(_job_insights_page, job, limit, cursor)
+    return await json_response(request, _decision_body(page, level_counts, version))
+
+
 @router.get("/decisions/inventory-risks")
-async def get_inventory_risks():
+async def get_inventory_risks(request: Request, query: DecisionQuery = Depends()):
     """Get inventory risk assessments"""
-    if not _inventory_cache:
+    if not dataset:
         raise HTTPException(
             status_code=404,
             detail="No inventory data available. Please generate decisions first."
         )
     
-    risks = decision_service.identify_inventory_risks(_inventory_cache)
-    return {"risks": risks, "total": len(risks)}
+    etag, result = await executor.run(_tagged_page, pipeline, 'inventory_risks', query, request)
+    if result is None:
+        return not_modified(etag, 'inventory_risks')
+    version, page = result
+    return await _list_response(request, "risks", page, version, etag)
 
 
 @router.get("/decisions/slow-movers")
-async def get_slow_moving_products():
+async def get_slow_moving_products(request: Request, query: DecisionQuery = Depends()):
     """Get slow-moving product identification"""
-    if not _inventory_cache:
+    if not dataset:
         raise HTTPException(
             status_code=404,
             detail="No inventory data available. Please generate decisions first."
         )
     
-    slow_movers = decision_service.identify_slow_moving_products(_inventory_cache)
-    return {"slow_movers": slow_movers, "total": len(slow_movers)}
+    etag, result = await executor.run(_tagged_page, pipeline, 'slow_movers', query, request)
+    if result is None:
+        return not_modified(etag, 'slow_movers')
+    version, page = result
+    return await _list_response(request, "slow_movers", page, version, etag)
 
 
 @router.get("/decisions/reorder-recommendations")
-async def get_reorder_recommendations():
+async def get_reorder_recommendations(request: Request, query: DecisionQuery = Depends()):
     """Get reorder quantity recommendations"""
-    if not _inventory_cache:
+    if not dataset:
         raise HTTPException(
             status_code=404,
             detail="No inventory data available. Please generate decisions first."
         )
     
-    risks = decision_service.identify_inventory_risks(_inventory_cache)
-    recommendations = decision_service.generate_reorder_recommendations(
-        _inventory_cache, risks
-    )
-    return {"recommendations": recommendations, "total": len(recommendations)}
+    etag, result = await executor.run(_tagged_page, pipeline, 'reorder_recommendations', query, request)
+    if result is None:
+        return not_modified(etag, 'reorder_recommendations')
+    version, page = result
+    return await _list_response(request, "recommendations", page, version, etag)
+
+
+@router.get("/decisions/stream")
+async def stream_decisions(
+    request: Request,
+    analysis: DecisionAnalysis = Query(DecisionAnalysis.INSIGHTS, description="Result sequence to stream"),
+    stream_format: Optional[StreamFormat] = Query(
+        None, alias="format", description="ndjson or sse; defaults to sse when the client accepts text/event-stream"
+    ),
+    query: DecisionQuery = Depends()
+):
+    """
+    Stream decision results in priority order, critical items first
+    
+    Rows are encoded and sent as they are produced, so the first
+    arrives without waiting for the rest. NDJSON sends one row per
+    line; SSE sends one event per row followed by an "end" event with
+    the total and next cursor. Both also report them in the X-Total-Count
+    and X-Next-Cursor headers. Filters and pagination match the list
+    endpoints.
+    """
+    if not dataset:
+        raise HTTPException(
+            status_code=404,
+            detail="No inventory data available. Please generate decisions first."
+        )
+    
+    if stream_format is None:
+        accept = request.headers.get('accept', '')
+        stream_format = StreamFormat.SSE if 'text/event-stream' in accept else StreamFormat.NDJSON
+    
+    etag, result = await executor.run(_tagged_stream, pipeline, analysis.value, query, request)
+    if result is None:
+        return not_modified(etag, 'stream')
+    
+    version, stream = result
+    next_cursor = _next_cursor(stream, version)
+    headers = {"X-Total-Count": str(stream.total), "ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    
+    if stream_format == StreamFormat.SSE:
+        headers.update({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+        frames = sse_frames(stream.rows, analysis.value, {"total": stream.total, "next_cursor": next_cursor})
+        media_type = "text/event-stream"
+    else:
+        frames = ndjson_frames(stream.rows)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(stream_chunks(frames), media_type=media_type, headers=headers)
+
+
+def _tagged_summary(pipeline: DecisionPipeline, request: Request) -> Tuple[str, Optional[bytes]]:
+    """The summary's ETag and, unless the client's copy is still current, its encoding"""
+    version, summary = pipeline.versioned_summary()
+    etag = pipeline.etag('summary', canonical_query(request), version)
+    if etag_matches(request, etag):
+        return etag, None
+    return etag, dumps(summary)
 
 
 @router.get("/decisions/summary")
-async def get_decisions_summary():
-    """Get a summary of all decision insights"""
-    if not _inventory_cache:
+async def get_decisions_summary(request: Request):
+    """
+    Get a summary of all decision insights
+    
+    Like the other GET decision endpoints, the response carries an ETag
+    for its data version; sending it back in If-None-Match returns an
+    empty 304 while the results are unchanged.
+    """
+    if not dataset:
+        raise HTTPException(
+            status_code=404,
+            detail="No inventory data available. Please generate decisions first."
+        )
+    
+    etag, body = await executor.run(_tagged_summary, pipeline, request)
+    if body is None:
+        return not_modified(etag, 'summary')
+    return await json_response(request, body, etag=etag)
+
+
+def _changes_body(pipeline: DecisionPipeline, since_version: int) -> Tuple[DataVersion, bytes]:
+    """The data version and encoded DecisionChangesResponse, reusing the insights' cached row encodings"""
+    with metrics.stage('changes') as stage:
+        version, index, previous, diff, full_resync = pipeline.changes(since_version)
+        stage.rows = len(diff)
+    
+    with metrics.stage('serialize') as stage:
+        added = b'[' + b','.join(index.encoded_rows(diff.added.tolist())) + b']'
+        changed = b'[' + b','.join(
+            dumps({
+                "previous_priority": RISK_LEVELS[int(previous.priorities[entry])],
+                "previous_decision_type": DECISION_TYPES[int(previous.decision_types[entry])],
+            })[:-1] + b',"insight":' + row + b'}'
+            for entry, row in zip(diff.changed_from.tolist(), index.encoded_rows(diff.changed.tolist()))
+        ) + b']'
+        removed = dumps([
+            {
+                "product_id": str(previous.product_ids[entry]),
+                "decision_type": DECISION_TYPES[int(previous.decision_types[entry])],
+                "priority": RISK_LEVELS[int(previous.priorities[entry])],
+            }
+            for entry in diff.removed.tolist()
+        ])
+        stage.rows = len(diff)
+    
+    fields = {
+        "timestamp": datetime.now(),
+        "since_version": since_version,
+        "data_version": version.number,
+        "full_resync": full_resync,
+        "total_changes": len(diff),
+    }
+    return version, object_with_arrays(fields, {"added": added, "changed": changed, "removed": removed})
+
+
+@router.get("/decisions/changes", response_model=DecisionChangesResponse)
+async def get_decision_changes(
+    request: Request,
+    since: int = Query(..., ge=0, description="data_version of the client's last full fetch")
+):
+    """
+    Insights added, removed or changed since an earlier data version
+    
+    Insights are matched by product and kind (stockout risk or slow
+    mover); a match whose priority or decision type differs is changed.
+    Added and changed rows are full insights in priority order. The last
+    DECISION_CHANGES_VERSIONS versions whose insights were fetched can be
+    diffed against. For older ones, and for since=0, the response is a
+    full resync: full_resync is true and added lists every current
+    insight, which replace the client's copy.
+    """
+    if not dataset:
         raise HTTPException(
             status_code=404,
             detail="No inventory data available. Please generate decisions first."
         )
+    if since > dataset.version:
+        raise HTTPException(status_code=400, detail=f"Unknown data version: {since}")
     
-    risks = decision_service.identify_inventory_risks(_inventory_cache)
-    slow_movers = decision_service.identify_slow_moving_products(_inventory_cache)
-    reorder_recs = decision_service.generate_reorder_recommendations(
-        _inventory_cache, risks
+    query = canonical_query(request)
+    etag = pipeline.etag('changes', query)
+    if etag_matches(request, etag):
+        return not_modified(etag, 'changes')
+    version, body = await executor.run(_changes_body, pipeline, since)
+    return await json_response(request, body, etag=pipeline.etag('changes', query, version))
+
+
+def _run_scenarios(request: ScenarioSweepRequest) -> ScenarioSweepResponse:
+    started = time.perf_counter()
+    scenarios = list(request.scenarios)
+    if request.grid is not None:
+        scenarios.extend(expand_grid(request.grid))
+    with dataset.lock:
+        table = dataset.inventory_table()
+        version = dataset.version
+    with metrics.stage('scenarios') as stage:
+        results = ScenarioSweep(table).evaluate(scenarios)
+        stage.rows = len(table)
+    return ScenarioSweepResponse(
+        timestamp=datetime.now(),
+        data_version=version,
+        products=len(table),
+        elapsed_seconds=round(time.perf_counter() - started, 3),
+        scenarios=results
     )
+
+
+@router.post("/decisions/scenarios", response_model=ScenarioSweepResponse)
+async def evaluate_scenarios(http_request: Request, request: ScenarioSweepRequest):
+    """
+    Evaluate what-if decision parameters over the current inventory
+    
+    Each scenario overrides some of the reorder lead time, slow-moving
+    threshold and safety buffer; a grid adds every combination of its
+    values. All scenarios are evaluated in one pass over the shared
+    inventory table, without changing the configured decisions.
+    """
+    if not dataset:
+        raise HTTPException(
+            status_code=404,
+            detail="No inventory data available. Please generate decisions first."
+        )
+    count = len(request.scenarios)
+    if request.grid is not None:
+        count += (
+            max(len(request.grid.reorder_lead_time_days), 1)
+            * max(len(request.grid.slow_moving_threshold_days), 1)
+            * max(len(request.grid.safety_buffer_days), 1)
+        )
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No scenarios given")
+    if count > settings.SCENARIO_MAX_COUNT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.SCENARIO_MAX_COUNT} scenarios per sweep"
+        )
+    
+    response = await executor.run(_run_scenarios, request)
+    return await json_response(http_request, model_json(response))
+
+
+@router.get("/decisions/cache")
+async def get_decision_cache_stats():
+    """Get hit/miss counters for the decision result cache"""
+    return {"data_version": dataset.version, **pipeline.cache.stats()}
+
+
+def _tenant_insights(tenant_id: str, query: DecisionQuery):
+    """Encoded insights page for one tenant, with its counts and data version"""
+    with tenant_registry.use(tenant_id) as tenant:
+        if not tenant.dataset:
+            raise ValueError("No data available for this tenant")
+        version, page, level_counts = _insights_page(tenant.pipeline, query, encoded=True)
+        return page, level_counts, version
+
+
+def _tagged_tenant_insights(tenant_id: str, query: DecisionQuery, request: Request):
+    """A tenant's insights ETag and, unless the client's copy is current, its page, counts and version"""
+    with tenant_registry.use(tenant_id) as tenant:
+        if not tenant.dataset:
+            raise ValueError("No data available for this tenant")
+        version, index = tenant.pipeline.versioned_index('insights')
+        etag = tenant.pipeline.etag('insights', canonical_query(request), version)
+        if etag_matches(request, etag):
+            return etag, None
+        page = _index_page(index, version, query, True)
+        return etag, (page, index.count_by_level(query.filter), version)
+
+
+def _tagged_tenant_summary(tenant_id: str, request: Request) -> Tuple[str, Optional[bytes]]:
+    with tenant_registry.use(tenant_id) as tenant:
+        if not tenant.dataset:
+            raise ValueError("No data available for this tenant")
+        return _tagged_summary(tenant.pipeline, request)
+
+
+@router.get("/tenants/{tenant_id}/decisions", response_model=DecisionResponse)
+async def get_tenant_decisions(request: Request, tenant_id: str, query: DecisionQuery = Depends()):
+    """Decision insights for one tenant's dataset"""
+    try:
+        etag, result = await executor.run(_tagged_tenant_insights, tenant_id, query, request)
+    except TenantNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        return not_modified(etag, 'tenant_insights')
+    page, level_counts, version = result
+    return await json_response(request, _decision_body(page, level_counts, version), etag=etag)
+
+
+@router.get("/tenants/{tenant_id}/decisions/summary")
+async def get_tenant_decisions_summary(request: Request, tenant_id: str):
+    """Summary of one tenant's decision insights"""
+    try:
+        etag, body = await executor.run(_tagged_tenant_summary, tenant_id, request)
+    except TenantNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if body is None:
+        return not_modified(etag, 'tenant_summary')
+    return await json_response(request, body, etag=etag)
+
+
+@router.post("/decisions/batch", response_model=BatchDecisionResponse)
+async def evaluate_decisions_batch(http_request: Request, request: BatchDecisionRequest):
+    """
+    Evaluate decisions for many tenants concurrently
+    
+    Tenants are evaluated on the worker pool, at most one per worker at
+    a time, so a large batch does not crowd out other requests. Each
+    result holds the tenant's top_k insights, or an error if it could
+    not be evaluated.
+    """
+    if len(request.tenant_ids) > settings.TENANT_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.TENANT_BATCH_MAX} tenants per batch"
+        )
+    if request.top_k > settings.DECISION_PAGE_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"top_k must be at most {settings.DECISION_PAGE_MAX_LIMIT}"
+        )
+    
+    query = DecisionQuery(
+        priority=request.priority,
+        decision_type=request.decision_type,
+        product_id_prefix=None,
+        limit=None,
+        cursor=None,
+        top_k=request.top_k
+    )
+    slots = asyncio.Semaphore(executor.max_workers)
+    
+    async def evaluate(tenant_id: str) -> bytes:
+        """One encoded TenantDecisions"""
+        async with slots:
+            try:
+                page, level_counts, version = await executor.run(_tenant_insights, tenant_id, query)
+            except (TenantNotFound, ValueError, ExecutorSaturated) as e:
+                return model_json(TenantDecisions(tenant_id=tenant_id, error=str(e)))
+            except Exception as e:
+                return model_json(TenantDecisions(
+                    tenant_id=tenant_id, error=f"Error generating decisions: {str(e)}"
+                ))
+        fields = {
+            "tenant_id": tenant_id,
+            "data_version": version.number,
+            "total_insights": page.total,
+            "critical_actions": level_counts[RiskLevel.CRITICAL],
+            "error": None,
+        }
+        return object_with_array(fields, "insights", page.body)
     
-    from core.models import RiskLevel
-    critical_risks = [r for r in risks if r.risk_level == RiskLevel.CRITICAL]
-    high_risks = [r for r in risks if r.risk_level == RiskLevel.HIGH]
-    
-    return {
-        "inventory_risks": {
-            "total": len(risks),
-            "critical": len(critical_risks),
-            "high": len(high_risks),
-            "medium": len([r for r in risks if r.risk_level == RiskLevel.MEDIUM]),
-            "low": len([r for r in risks if r.risk_level == RiskLevel.LOW])
-        },
-        "slow_moving_products": len(slow_movers),
-        "reorder_recommendations": len(reorder_recs),
-        "total_products": len(_inventory_cache)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(evaluate(tenant_id) for tenant_id in request.tenant_ids))
+    fields = {
+        "timestamp": datetime.now(),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
     }
+    return await json_response(http_request, object_with_array(fields, "results", b'[' + b','.join(results) + b']'))
@@ -0,0 +1,27 @@
+"""
+Background job API routes
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from core.models import JobResponse, JobStatus
+from services.jobs import job_queue
+
+router = APIRouter()
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get a job's status, progress and, once it has succeeded, its result"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_response()
+
+
+@router.get("/jobs")
+async def list_jobs(status: Optional[JobStatus] = Query(None, description="Only jobs in this state")):
+    """List recent jobs, newest first, without their results"""
+    jobs = [job.to_response().model_dump(exclude={'result'}) for job in job_queue.recent(status)]
+    return {"jobs": jobs, "total": len(jobs)}
@@ -0,0 +1,24 @@
+"""
+Tenant management API routes
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from services.executor import executor
+from services.tenants import tenant_registry
+
+router = APIRouter()
+
+
+@router.get("/tenants")
+async def list_tenants():
+    """Resident tenants with their estimated memory, saved tenants and eviction counters"""
+    return await executor.run(tenant_registry.stats)
+
+
+@router.delete("/tenants/{tenant_id}")
+async def delete_tenant(tenant_id: str):
+    """Drop a tenant's data from memory and disk"""
+    if not await executor.run(tenant_registry.delete, tenant_id):
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant_id}")
+    return {"deleted": tenant_id}
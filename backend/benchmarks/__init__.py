@@ -0,0 +1,5 @@
+"""
+Benchmarks for the ingestion and decision pipeline
+
+Run from the backend directory, e.g. `python -m benchmarks.history_memory`.
+"""
@@ -0,0 +1,129 @@
+"""
+Transaction id deduplication: memory per id and throughput of the index
+
+Usage: python -m benchmarks.dedup_index [--ids N] [--batch N] [--bloom-bits B] [--rows N] [--repeats N]
+Prints one JSON object with, for the exact index alone and with a Bloom
+filter in front: bytes per indexed id (against a Python set of the same
+ids), ids per second inserting fresh batches and re-checking duplicate
+ones, and the cost of deduplication during CSV ingestion of an upload
+that overlaps the previous one by half.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions_csv
+from services.dataset import Dataset
+from services.dedup import TransactionIdIndex, fingerprint_ids
+
+
+def _ids(start: int, count: int) -> np.ndarray:
+    ids = np.empty(count, dtype=object)
+    ids[:] = [f"TXN{i:012d}" for i in range(start, start + count)]
+    return ids
+
+
+def _index_stats(ids: int, batch: int, bloom_bits: int) -> dict:
+    index = TransactionIdIndex(bloom_bits)
+    batches = [fingerprint_ids(_ids(start, min(batch, ids - start))) for start in range(0, ids, batch)]
+
+    started = time.perf_counter()
+    for fingerprints in batches:
+        index.add_new(fingerprints)
+    insert_seconds = time.perf_counter() - started
+
+    # Every id again: the overlapping-export case
+    started = time.perf_counter()
+    duplicates = sum(len(fingerprints) - int(index.add_new(fingerprints).sum()) for fingerprints in batches)
+    recheck_seconds = time.perf_counter() - started
+    assert duplicates == ids
+
+    # Fresh ids against the full index: where the Bloom filter helps
+    fresh = fingerprint_ids(_ids(ids, batch))
+    started = time.perf_counter()
+    index.contains(fresh)
+    fresh_seconds = time.perf_counter() - started
+
+    return {
+        "bytes_per_id": round(index.memory_bytes() / ids, 2),
+        "insert_ids_per_second": round(ids / insert_seconds),
+        "duplicate_check_ids_per_second": round(ids / recheck_seconds),
+        "fresh_lookup_ids_per_second": round(batch / fresh_seconds),
+    }
+
+
+def _ingest_stats(rows: int, repeats: int) -> dict:
+    """Appending an upload that repeats half of the previous one (best of repeats)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate_transactions_csv(os.path.join(tmp, 'transactions.csv'), rows)
+        with open(path) as f:
+            header, *lines = f.read().splitlines()
+        half = len(lines) // 2
+        first, second = os.path.join(tmp, 'first.csv'), os.path.join(tmp, 'second.csv')
+        with open(first, 'w') as f:
+            f.write('\n'.join([header] + lines[:half + half // 2]) + '\n')
+        with open(second, 'w') as f:
+            f.write('\n'.join([header] + lines[half // 2:]) + '\n')
+
+        timings = {False: [], True: []}
+        duplicates = 0
+        for _ in range(repeats):
+            # Alternate so both modes see the same machine conditions
+            for deduplicate in (False, True):
+                dataset = Dataset(deduplicate=deduplicate)
+                dataset.ingest_csv_mapped(first)
+                started = time.perf_counter()
+                ingested = dataset.ingest_csv_mapped(second)
+                timings[deduplicate].append(time.perf_counter() - started)
+                duplicates = max(duplicates, ingested.duplicate_rows)
+
+        rows_parsed = len(lines) - half // 2
+        return {
+            "rows": rows_parsed,
+            "duplicate_rows": duplicates,
+            **{
+                name: {
+                    "seconds": round(min(timings[deduplicate]), 3),
+                    "rows_per_second": round(rows_parsed / min(timings[deduplicate])),
+                }
+                for name, deduplicate in (("without_dedup", False), ("with_dedup", True))
+            },
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ids', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=65_536, help="Ids per batch, about one parsed window")
+    parser.add_argument('--bloom-bits', type=int, default=10, help="Bloom filter bits per id")
+    parser.add_argument('--rows', type=int, default=200_000, help="Rows in the ingestion comparison")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    sample = _ids(0, min(args.ids, 1_000_000))
+    tracemalloc.start()
+    python_set = set(sample.tolist())
+    # The set's table plus the id strings it keeps alive
+    string_bytes = sum(sys.getsizeof(value) for value in sample[:1000]) / 1000 * len(sample)
+    set_bytes = tracemalloc.get_traced_memory()[0] + string_bytes
+    tracemalloc.stop()
+    del python_set
+
+    print(json.dumps({
+        "ids": args.ids,
+        "python_set_bytes_per_id": round(set_bytes / len(sample), 1),
+        "exact_index": _index_stats(args.ids, args.batch, 0),
+        "exact_index_with_bloom": _index_stats(args.ids, args.batch, args.bloom_bits),
+        "ingest": _ingest_stats(args.rows, args.repeats),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
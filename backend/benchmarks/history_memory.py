@@ -0,0 +1,89 @@
+"""
+Memory per retained transaction: pydantic objects vs columnar batches vs TransactionHistory
+
+Usage: python -m benchmarks.history_memory [--rows N] [--products N]
+Prints one JSON object with bytes per row for each representation.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_transactions_csv
+from services.data_service import DataService
+from services.history import TransactionHistory
+
+
+def _measured(build):
+    """Run build() and return (result, bytes it left allocated)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--object-rows', type=int, default=100_000,
+                        help="Rows materialized as pydantic objects (extrapolated per row)")
+    args = parser.parse_args()
+
+    service = DataService()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate_transactions_csv(
+            os.path.join(tmp, 'transactions.csv'), args.rows, products=args.products
+        )
+        batches = []
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            service.ingest_csv_stream(iter(lambda: f.read(1 << 20), b''), sink=batches.append)
+        parse_seconds = time.perf_counter() - started
+
+    def build_history():
+        history = TransactionHistory()
+        for batch in batches:
+            history.append(batch)
+        return history
+
+    started = time.perf_counter()
+    history, history_bytes = _measured(build_history)
+    append_seconds = time.perf_counter() - started
+
+    sample = history.to_columns()
+    object_rows = min(args.object_rows, len(sample))
+    _, object_bytes = _measured(lambda: sample.to_transactions(range(object_rows)))
+
+    columns_bytes = sum(
+        array.nbytes
+        for batch in batches
+        for array in (
+            batch.product_codes, batch.product_name_codes, batch.customer_codes,
+            batch.quantity, batch.unit_price, batch.transaction_date, batch.transaction_ids
+        )
+    ) + sum(sys.getsizeof(value) for batch in batches for value in batch.transaction_ids)
+
+    rows = len(history)
+    print(json.dumps({
+        "rows": rows,
+        "products": args.products,
+        "parse_seconds": round(parse_seconds, 3),
+        "history_append_seconds": round(append_seconds, 3),
+        "bytes_per_row": {
+            "pydantic_transaction": round(object_bytes / object_rows, 1),
+            "transaction_columns": round(columns_bytes / rows, 1),
+            "transaction_history": round(history_bytes / rows, 1),
+            "transaction_history_reported": round(history.memory_bytes() / rows, 1),
+        },
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
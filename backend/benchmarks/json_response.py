@@ -0,0 +1,97 @@
+"""
+Encoding large DecisionResponse payloads: FastAPI default vs fast paths
+
+Usage: python -m benchmarks.json_response [--sizes N [N ...]] [--repeats N]
+Prints one JSON object with p50/p99 seconds and body bytes per payload
+size for FastAPI's default path (jsonable_encoder, then json.dumps), a
+single pydantic model_dump_json, joining cached per-row fragments (cold
+and warm), and the warm fragments plus gzip.
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from core.config import settings
+from core.models import DecisionInsight, DecisionResponse, DecisionType, RiskLevel
+from services.serialization import JsonRows, object_with_array
+
+
+def _insights(count: int):
+    decision_types = list(DecisionType)
+    priorities = list(RiskLevel)
+    return [
+        DecisionInsight(
+            product_id=f"P{i:06d}",
+            product_name=f"Product {i}",
+            decision_type=decision_types[i % len(decision_types)],
+            priority=priorities[i % len(priorities)],
+            summary=f"Product {i} has {i % 17} days of stock left",
+            reasoning=f"Selling {i % 23 + 1} units per day against {i % 97} units on hand.",
+            recommended_action=f"Reorder {(i % 23 + 1) * 14} units",
+            estimated_impact=f"${(i % 1000) * 12.5:,.2f} in lost sales" if i % 3 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def _envelope(insights) -> dict:
+    return {"timestamp": datetime.now(), "total_insights": len(insights), "critical_actions": 0, "next_cursor": None}
+
+
+def _measure(encode, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = encode()
+        timings.append(time.perf_counter() - started)
+    return {
+        "p50_seconds": round(float(np.percentile(timings, 50)), 4),
+        "p99_seconds": round(float(np.percentile(timings, 99)), 4),
+        "bytes": len(body),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        insights = _insights(size)
+        positions = range(size)
+
+        def fastapi_default():
+            response = DecisionResponse(insights=insights, **_envelope(insights))
+            return json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+        def model_dump_json():
+            return DecisionResponse(insights=insights, **_envelope(insights)).model_dump_json().encode('utf-8')
+
+        def fragments(rows):
+            return object_with_array(_envelope(insights), "insights", rows.array(positions))
+
+        warm = JsonRows(insights)
+        fragments(warm)
+        results[size] = {
+            "fastapi_default": _measure(fastapi_default, args.repeats),
+            "model_dump_json": _measure(model_dump_json, args.repeats),
+            "fragments_cold": _measure(lambda: fragments(JsonRows(insights)), args.repeats),
+            "fragments_warm": _measure(lambda: fragments(warm), args.repeats),
+            "fragments_warm_gzip": _measure(
+                lambda: gzip.compress(fragments(warm), compresslevel=settings.RESPONSE_GZIP_LEVEL), args.repeats
+            ),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Serial vs sharded multi-process CSV ingestion
+
+Usage: python -m benchmarks.parallel_ingest [--rows N] [--workers 1,2,4,8]
+Prints one JSON object with wall time, rows/sec and speedup per worker count,
+and checks every run produces the same inventory as the serial parse.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_transactions_csv
+from services.data_service import DataService
+from services.parallel_ingest import parse_csv_file_parallel
+
+
+def main() -> None:
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, *(2 ** i for i in range(1, cpus.bit_length())), cpus})
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)))
+    args = parser.parse_args()
+
+    service = DataService()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate_transactions_csv(
+            os.path.join(tmp, 'transactions.csv'), args.rows, products=args.products
+        )
+
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            serial = service.ingest_csv_stream(iter(lambda: f.read(1 << 20), b''))
+        serial_seconds = time.perf_counter() - started
+        expected = service.inventory_from_summary(serial.aggregates.summary())
+
+        runs = []
+        for workers in (int(value) for value in args.workers.split(',')):
+            started = time.perf_counter()
+            parsed = parse_csv_file_parallel(path, workers)
+            seconds = time.perf_counter() - started
+            runs.append({
+                "workers": workers,
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(parsed.rows_parsed / seconds),
+                "speedup": round(serial_seconds / seconds, 2),
+                "matches_serial": service.inventory_from_summary(parsed.aggregates.summary()) == expected,
+            })
+
+    print(json.dumps({
+        "rows": serial.rows_processed,
+        "cpu_count": cpus,
+        "serial_seconds": round(serial_seconds, 3),
+        "serial_rows_per_second": round(serial.rows_processed / serial_seconds),
+        "parallel": runs,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
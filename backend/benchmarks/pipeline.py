@@ -0,0 +1,245 @@
+"""
+Stage-by-stage timings of the ingestion and decision pipeline
+
+Usage: python -m benchmarks.pipeline [--rows N] [--products N] [--days N]
+       [--skew S] [--repeats N] [--requests N] [--output PATH]
+Generates deterministic synthetic data, then times each stage: the
+pydantic ingestion path and DecisionService (as in the original request
+flow), the columnar ingestion and vectorized engine used by the API,
+a 100-scenario parameter sweep, and end-to-end HTTP requests. Prints
+(or writes) one JSON object with, per stage, latency percentiles over
+the repeats, throughput (rows/sec, or products/sec for stages that work
+per product) and the peak bytes allocated during one traced run, so
+results can be compared between releases.
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions_csv
+from core.config import settings
+from core.models import ScenarioGrid
+from services.data_service import DataService, peak_rss_bytes
+from services.dataset import Dataset
+from services.decision_service import DecisionService
+from services.scenarios import ScenarioSweep, expand_grid
+from services.vectorized_decisions import VectorizedDecisionEngine
+
+
+def _percentiles(timings: List[float]) -> Dict[str, float]:
+    return {
+        f"p{q}_seconds": round(float(np.percentile(timings, q)), 5)
+        for q in (50, 95, 99)
+    }
+
+
+def _stage(
+    fn: Callable[[], Any],
+    repeats: int,
+    count: int,
+    unit: str = 'rows',
+    trace_memory: bool = True
+) -> Dict[str, Any]:
+    """Time fn over repeats runs, then trace the allocations of one more"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    result = _percentiles(timings)
+    result[f"{unit}_per_second"] = round(count / max(float(np.median(timings)), 1e-9))
+    if trace_memory:
+        tracemalloc.start()
+        fn()
+        result["peak_alloc_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _requests(send: Callable[[], Any], count: int) -> Dict[str, Any]:
+    """Latency percentiles of count sequential requests"""
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = send()
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return {"requests": count, **_percentiles(timings)}
+
+
+def _python_stages(path: str, rows: int, repeats: int) -> Dict[str, Any]:
+    """The pydantic-object path through DataService and DecisionService"""
+    data_service = DataService()
+    decisions = DecisionService()
+
+    transactions = data_service.ingest_transactions_from_csv(path)
+    inventory = data_service.calculate_product_inventory(transactions)
+    risks = decisions.identify_inventory_risks(inventory)
+    slow_movers = decisions.identify_slow_moving_products(inventory)
+    reorders = decisions.generate_reorder_recommendations(inventory, risks)
+    products = len(inventory)
+
+    return {
+        "ingest_transactions_from_csv": _stage(
+            lambda: data_service.ingest_transactions_from_csv(path), repeats, rows
+        ),
+        "calculate_product_inventory": _stage(
+            lambda: data_service.calculate_product_inventory(transactions), repeats, rows
+        ),
+        "identify_inventory_risks": _stage(
+            lambda: decisions.identify_inventory_risks(inventory), repeats, products, 'products'
+        ),
+        "identify_slow_moving_products": _stage(
+            lambda: decisions.identify_slow_moving_products(inventory),
+            repeats, products, 'products'
+        ),
+        "generate_reorder_recommendations": _stage(
+            lambda: decisions.generate_reorder_recommendations(inventory, risks),
+            repeats, products, 'products'
+        ),
+        "generate_decision_insights": _stage(
+            lambda: decisions.generate_decision_insights(inventory, risks, slow_movers, reorders),
+            repeats, products, 'products'
+        ),
+    }
+
+
+def _vectorized_stages(path: str, rows: int, repeats: int) -> Dict[str, Any]:
+    """The columnar ingestion and array-based engine behind the API"""
+    dataset = Dataset()
+    dataset.ingest_csv_file(path)
+    table = dataset.inventory_table()
+    engine = VectorizedDecisionEngine()
+    risks = engine.identify_inventory_risks(table)
+    slow_movers = engine.identify_slow_moving_products(table)
+    reorders = engine.generate_reorder_recommendations(table, risks)
+    products = len(dataset)
+    # 100 scenarios: 10 lead times x 10 slow-moving thresholds
+    scenarios = expand_grid(ScenarioGrid(
+        reorder_lead_time_days=list(range(1, 11)),
+        slow_moving_threshold_days=list(range(30, 130, 10))
+    ))
+
+    def materialize(rows_sequence):
+        # Engine results build response models on access; count that too
+        return [row for row in rows_sequence]
+
+    return {
+        "ingest_csv_file": _stage(lambda: Dataset().ingest_csv_file(path), repeats, rows),
+        "inventory_table": _stage(lambda: dataset.data_service.inventory_table_from_summary(
+            dataset.aggregates.summary()
+        ), repeats, products, 'products'),
+        "identify_inventory_risks": _stage(
+            lambda: materialize(engine.identify_inventory_risks(table)),
+            repeats, products, 'products'
+        ),
+        "identify_slow_moving_products": _stage(
+            lambda: materialize(engine.identify_slow_moving_products(table)),
+            repeats, products, 'products'
+        ),
+        "generate_reorder_recommendations": _stage(
+            lambda: materialize(engine.generate_reorder_recommendations(table, risks)),
+            repeats, products, 'products'
+        ),
+        "generate_decision_insights": _stage(
+            lambda: materialize(engine.generate_decision_insights(risks, slow_movers, reorders)),
+            repeats, products, 'products'
+        ),
+        "scenario_sweep_100": _stage(
+            lambda: ScenarioSweep(table).evaluate(scenarios), repeats, products, 'products'
+        ),
+    }
+
+
+def _http_stages(path: str, tmp: str, repeats: int, requests: int) -> Dict[str, Any]:
+    """End-to-end requests through the FastAPI app"""
+    from fastapi.testclient import TestClient
+    from main import app
+
+    settings.UPLOAD_DIR = os.path.join(tmp, 'uploads')
+
+    def upload():
+        with open(path, 'rb') as f:
+            return client.post(
+                '/api/v1/decisions/generate', files={'file': ('transactions.csv', f, 'text/csv')}
+            )
+
+    with TestClient(app) as client:
+        return {
+            "generate_with_upload": _requests(upload, repeats),
+            "generate_cached": _requests(lambda: client.post('/api/v1/decisions/generate'), requests),
+            "inventory_risks_page": _requests(
+                lambda: client.get('/api/v1/decisions/inventory-risks', params={'limit': 100}), requests
+            ),
+            "summary": _requests(lambda: client.get('/api/v1/decisions/summary'), requests),
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--products', type=int, default=5_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--skew', type=float, default=1.0,
+                        help="Product popularity skew; 0 is uniform, 1 is Zipf-like")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per stage")
+    parser.add_argument('--requests', type=int, default=50, help="Requests per cached HTTP endpoint")
+    parser.add_argument('--skip-python', action='store_true', help="Skip the pydantic-object stages")
+    parser.add_argument('--output', help="Write the JSON here instead of printing it")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        path = generate_transactions_csv(
+            os.path.join(tmp, 'transactions.csv'), args.rows, products=args.products,
+            days=args.days, seed=args.seed, skew=args.skew
+        )
+        generate_seconds = time.perf_counter() - started
+
+        stages = {}
+        if not args.skip_python:
+            stages["python"] = _python_stages(path, args.rows, args.repeats)
+        stages["vectorized"] = _vectorized_stages(path, args.rows, args.repeats)
+        stages["http"] = _http_stages(path, tmp, args.repeats, args.requests)
+
+        result = {
+            "config": {
+                "rows": args.rows,
+                "products": args.products,
+                "days": args.days,
+                "skew": args.skew,
+                "seed": args.seed,
+                "repeats": args.repeats,
+                "csv_bytes": os.path.getsize(path),
+                "generate_seconds": round(generate_seconds, 3),
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "cpus": os.cpu_count(),
+                "decision_engine": settings.DECISION_ENGINE,
+            },
+            "stages": stages,
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Save/load round trip: CSV vs binary columnar snapshots
+
+Usage: python -m benchmarks.snapshot_roundtrip [--rows N] [--products N]
+Prints one JSON object with save and load seconds and bytes on disk for
+CSV (DataService.save_transactions, then re-parsing) and for uncompressed
+and compressed snapshots, and checks every reload gives the same inventory.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import generate_transactions_csv
+from services.dataset import Dataset
+from services.snapshot import read_table
+
+
+def _disk_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Dataset(retain_history=True)
+        source.ingest_csv_file(generate_transactions_csv(
+            os.path.join(tmp, 'source.csv'), args.rows, products=args.products
+        ))
+        expected = source.inventory
+        results = {}
+
+        # CSV: materialize Transaction models and write them row by row
+        service = source.data_service
+        service.upload_dir = Path(tmp)
+        csv_path, save_seconds = _timed(lambda: service.save_transactions(
+            source.history.to_columns().to_transactions(), 'roundtrip.csv'
+        ))
+        reloaded = Dataset(retain_history=True)
+        _, load_seconds = _timed(lambda: reloaded.ingest_csv_file(csv_path))
+        results['csv'] = {
+            "save_seconds": round(save_seconds, 3),
+            "load_seconds": round(load_seconds, 3),
+            "bytes": _disk_bytes(csv_path),
+            "matches": reloaded.inventory == expected,
+        }
+
+        for compress in (False, True):
+            path = os.path.join(tmp, 'compressed' if compress else 'snapshot')
+            _, save_seconds = _timed(lambda: source.save_snapshot(path, compress=compress))
+            reloaded = Dataset(retain_history=True)
+            _, load_seconds = _timed(lambda: reloaded.load_snapshot(path))
+            _, project_seconds = _timed(
+                lambda: read_table(path, 'transactions', ['quantity'])['quantity'].sum()
+            )
+            results['snapshot_compressed' if compress else 'snapshot'] = {
+                "save_seconds": round(save_seconds, 3),
+                "load_seconds": round(load_seconds, 3),
+                "quantity_column_sum_seconds": round(project_seconds, 3),
+                "bytes": _disk_bytes(path),
+                "matches": reloaded.inventory == expected,
+            }
+
+    print(json.dumps({"rows": args.rows, "products": args.products, **results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
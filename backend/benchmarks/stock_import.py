@@ -0,0 +1,87 @@
+"""
+Stock-on-hand and unit cost imports against the sales aggregates
+
+Usage: python -m benchmarks.stock_import [--products N] [--rows N] [--repeats N]
+Prints one JSON object with the time to parse a stock CSV covering every
+product, to merge it into the stock levels and join them to the
+aggregates (first import and a full re-import), and to rebuild the
+columnar inventory table with the imported stock; the dict lookups the
+join replaces are timed for comparison.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions_csv
+from services.columnar import read_stock_csv
+from services.dataset import Dataset
+
+
+def _best(repeats: int, run) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--rows', type=int, default=2_000_000, help="Transactions behind the aggregates")
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generate_transactions_csv(
+            os.path.join(tmp, 'transactions.csv'), args.rows, products=args.products
+        )
+        dataset = Dataset()
+        dataset.ingest_csv_file(path)
+        product_ids = list(dataset.aggregates.product_ids)
+
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(product_ids))
+    stock = rng.integers(0, 500, len(product_ids))
+    cost = rng.uniform(1, 50, len(product_ids)).round(2)
+    data = ("product_id,stock_on_hand,unit_cost\n" + "".join(
+        f"{product_ids[i]},{stock[i]},{cost[i]}\n" for i in order
+    )).encode()
+
+    parse_seconds = _best(args.repeats, lambda: read_stock_csv(data))
+    batch, _ = read_stock_csv(data)
+
+    started = time.perf_counter()
+    matched = dataset.import_stock(batch)
+    first_seconds = time.perf_counter() - started
+    reimport_seconds = _best(args.repeats, lambda: dataset.import_stock(batch))
+
+    def rebuild_table() -> None:
+        dataset._table_version = -1
+        dataset.inventory_table()
+
+    table_seconds = _best(args.repeats, rebuild_table)
+
+    levels = dict(zip(batch.product_ids.tolist(), batch.stock_on_hand.tolist()))
+    dict_seconds = _best(args.repeats, lambda: [levels.get(product_id, 0) for product_id in product_ids])
+
+    print(json.dumps({
+        "products": len(product_ids),
+        "matched_products": matched,
+        "parse_seconds": round(parse_seconds, 3),
+        "first_import_seconds": round(first_seconds, 3),
+        "reimport_seconds": round(reimport_seconds, 3),
+        "inventory_table_seconds": round(table_seconds, 3),
+        "dict_lookup_seconds": round(dict_seconds, 3),
+        "stock_bytes_per_product": round(dataset.stock.memory_bytes() / len(product_ids), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Deterministic synthetic transaction data
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+CSV_HEADER = "transaction_id,product_id,product_name,quantity,unit_price,transaction_date,customer_id\n"
+
+
+def generate_transactions_csv(
+    path: str,
+    rows: int,
+    products: int = 1000,
+    days: int = 365,
+    customers: int = 10000,
+    seed: int = 0,
+    start: datetime = datetime(2024, 1, 1),
+    skew: float = 0.0
+) -> str:
+    """
+    Write a transactions CSV; the same arguments always produce the same file
+
+    Rows are spread over `days` days from `start`. With skew 0 every
+    product is equally likely; otherwise product i is drawn with weight
+    1 / (i + 1) ** skew, so skew 1 gives a Zipf-like long tail.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.datetime64(start, 's')
+    weights = None
+    if skew:
+        weights = 1.0 / np.arange(1, products + 1) ** skew
+        weights /= weights.sum()
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(CSV_HEADER)
+        block = 100_000
+        for first in range(0, rows, block):
+            count = min(block, rows - first)
+            if weights is None:
+                product = rng.integers(0, products, count)
+            else:
+                product = rng.choice(products, count, p=weights)
+            quantity = rng.integers(1, 10, count)
+            price = np.round(rng.uniform(1, 100, count), 2)
+            dates = (base + rng.integers(0, days * 86400, count).astype('timedelta64[s]')).astype(str)
+            customer = rng.integers(0, customers, count)
+            f.writelines(
+                f"T{first + i},P{product[i]},Product {product[i]},{quantity[i]},"
+                f"{price[i]},{dates[i]},C{customer[i]}\n"
+                for i in range(count)
+            )
+    return path
@@ -27,12 +27,91 @@ class Settings(BaseSettings):
     
     # Data Settings
     DATA_DIR: str = "data"
-    UPLOAD_DIR: str = "data/uploads"
+    UPLOAD_DIR: str = "data/uploads"  # CSV files here can be ingested by name
+    
+    # Storage Settings
+    STORAGE_BACKEND: str = "memory"  # "memory" (lost on restart) or "sqlite" (shared by worker processes)
+    STORAGE_PATH: str = "data/transactions.db"  # SQLite database file
+    STORAGE_POOL_SIZE: int = 4  # Pooled SQLite connections per process for reads; each upload opens its own
+    STORAGE_BATCH_SIZE: int = 50000  # Rows per batch when reading stored transactions
+    STORAGE_CACHE_MB: int = 64  # SQLite page cache per connection
+    STORAGE_TIMEOUT_SECONDS: float = 30.0  # Wait for another process's write before failing
+    STORAGE_SYNC_INTERVAL_SECONDS: float = 2.0  # How often to pick up other processes' writes
+    
+    # Snapshot Settings
+    SNAPSHOT_PATH: str = "data/snapshot"  # Directory holding the binary dataset snapshot
+    SNAPSHOT_COMPRESS: bool = False  # Smaller files, but columns are read fully instead of memory-mapped
+    SNAPSHOT_LOAD_ON_STARTUP: bool = False  # Restore the snapshot at startup (memory storage only)
+    
+    # Ingestion Settings
+    INGEST_CHUNK_SIZE: int = 1024 * 1024  # Bytes read from an upload per parsing step
+    INGEST_REJECT_SAMPLE_LIMIT: int = 100  # Rejected rows listed individually in reports
+    HISTORY_RETAIN: bool = False  # Keep a compact in-memory copy of every ingested transaction
+    DEDUP_TRANSACTIONS: bool = False  # Skip rows whose transaction_id was already ingested (8 bytes per id)
+    DEDUP_BLOOM_BITS_PER_ID: int = 0  # Bloom filter bits per id in front of the id index; 0 = no filter
+    INGEST_PARALLEL_WORKERS: int = 0  # Processes parsing one file; 0 = one per CPU
+    INGEST_PARALLEL_MIN_BYTES: int = 64 * 1024 * 1024  # Smaller files are parsed in-process
     
     # Business Logic Settings
     SLOW_MOVING_THRESHOLD_DAYS: int = 90  # Days without sales to be considered slow-moving
     LOW_STOCK_THRESHOLD_PERCENT: float = 0.2  # 20% of average stock level
     REORDER_LEAD_TIME_DAYS: int = 7  # Average lead time for reorders
+    SALES_WINDOW_DAYS: int = 0  # Average daily sales over the newest N days of data; 0 = each product's whole history
+    
+    # Demand Statistics Settings
+    DEMAND_WINDOWS: List[int] = [7, 28, 90]  # Rolling windows (days) of per-product daily sales kept in memory
+    SAFETY_STOCK_METHOD: str = "buffer_days"  # "buffer_days" (14 days of sales) or "demand_variance"
+    SAFETY_STOCK_WINDOW_DAYS: int = 28  # Window whose daily-sales variance sizes safety stock; one of DEMAND_WINDOWS
+    SAFETY_STOCK_Z: float = 1.65  # Standard deviations of lead-time demand to cover (1.65 = 95% service level)
+    
+    # Worker Pool Settings
+    WORKER_THREADS: int = 4  # Concurrent ingestion/analysis jobs per process
+    WORKER_QUEUE_SIZE: int = 8  # Jobs allowed to wait for a worker before returning 429
+    
+    # Tenant Settings
+    TENANT_DIR: str = "data/tenants"  # Snapshots of tenants evicted from memory
+    TENANT_MAX_RESIDENT: int = 64  # Tenants kept in memory before the least recently used are evicted
+    TENANT_MEMORY_BUDGET_MB: int = 2048  # Estimated memory of resident tenants before eviction
+    TENANT_DECISION_CACHE_ENTRIES: int = 16  # Cached analysis results per tenant
+    TENANT_BATCH_MAX: int = 1000  # Tenants evaluated by one batch request
+    
+    # Background Job Settings
+    JOB_DIR: str = ""  # Spooled uploads and persisted job state; empty = DATA_DIR/jobs
+    JOB_PERSIST: bool = True  # Keep job state on disk so queued jobs survive restarts
+    JOB_WORKERS: int = 1  # Background jobs run at once
+    JOB_QUEUE_SIZE: int = 100  # Jobs allowed to wait before submissions return 429
+    JOB_HISTORY_SIZE: int = 100  # Finished jobs kept for status polling
+    
+    # Decision Engine Settings
+    DECISION_ENGINE: str = "vectorized"  # "vectorized" (array-based) or "python" (per-product loop)
+    
+    # Scenario Sweep Settings
+    SCENARIO_MAX_COUNT: int = 1000  # Scenarios evaluated by one sweep request, after expanding grids
+    SCENARIO_BLOCK_CELLS: int = 4_000_000  # Scenario x product cells computed per block; bounds sweep memory
+    
+    # Decision Endpoint Settings
+    DECISION_PAGE_MAX_LIMIT: int = 10000  # Largest page size (limit/top_k) a client may request
+    DECISION_CHANGES_VERSIONS: int = 16  # Data versions whose insight keys are kept for /decisions/changes; 0 disables
+    
+    # Response Settings
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024  # Smaller decision responses are sent uncompressed
+    RESPONSE_COMPRESS_OFFLOAD_BYTES: int = 256 * 1024  # Larger responses are compressed on the worker pool
+    RESPONSE_GZIP_LEVEL: int = 5  # 1 (fastest) to 9 (smallest)
+    RESPONSE_BROTLI_QUALITY: int = 4  # 0 (fastest) to 11 (smallest); used when brotli is installed
+    STREAM_CHUNK_BYTES: int = 65536  # Streamed rows are sent in chunks of about this size
+    
+    # Metrics Settings
+    METRICS_ENABLED: bool = True  # Record stage timings and counters and serve /metrics
+    
+    # Profiling Settings
+    PROFILE_ENABLED: bool = False  # Allow clients to request a cProfile trace of one request
+    PROFILE_DIR: str = "data/profiles"  # Saved traces, readable with pstats or snakeviz
+    PROFILE_TOP_N: int = 20  # Hottest functions summarized in the response
+    PROFILE_MAX_FILES: int = 100  # Older traces are deleted
+    
+    # Decision Cache Settings
+    DECISION_CACHE_MAX_ENTRIES: int = 64  # Cached analysis results kept in memory
+    DECISION_CACHE_TTL_SECONDS: float = 300.0  # Bounds staleness of "days since last sale"
 
 
 settings = Settings()
@@ -3,7 +3,7 @@ Data models and schemas for the Decision Intelligence Platform
 """
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -24,6 +24,28 @@ class DecisionType(str, Enum):
     REVIEW = "review"
 
 
+class DecisionAnalysis(str, Enum):
+    """Result sequence produced by the decision pipeline"""
+    INSIGHTS = "insights"
+    INVENTORY_RISKS = "inventory_risks"
+    SLOW_MOVERS = "slow_movers"
+    REORDER_RECOMMENDATIONS = "reorder_recommendations"
+
+
+class StreamFormat(str, Enum):
+    """Wire format of a streamed result sequence"""
+    NDJSON = "ndjson"
+    SSE = "sse"
+
+
+class JobStatus(str, Enum):
+    """Lifecycle state of a background job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class Transaction(BaseModel):
     """Transaction data model"""
     transaction_id: str
@@ -44,6 +66,7 @@ class ProductInventory(BaseModel):
     last_sale_date: Optional[datetime] = None
     average_daily_sales: float = 0.0
     days_of_stock_remaining: Optional[float] = None
+    daily_sales_std: Optional[float] = None
 
 
 class InventoryRisk(BaseModel):
@@ -89,12 +112,70 @@ class DecisionInsight(BaseModel):
     estimated_impact: Optional[str] = None
 
 
+class ProfileHotspot(BaseModel):
+    """One function's share of a profiled request"""
+    function: str
+    calls: int
+    self_seconds: float
+    cumulative_seconds: float
+
+
+class ProfileSummary(BaseModel):
+    """Where a profiled request spent its time, and where its trace is stored"""
+    profile_id: str
+    path: str
+    elapsed_seconds: float
+    hotspots: List[ProfileHotspot] = []
+
+
 class DecisionResponse(BaseModel):
     """Response containing all decision insights"""
     timestamp: datetime
     total_insights: int
     critical_actions: int
     insights: List[DecisionInsight]
+    next_cursor: Optional[str] = None
+    data_version: Optional[int] = None
+    profile: Optional[ProfileSummary] = None  # Only on profiled requests
+
+
+class ChangedInsight(BaseModel):
+    """An insight whose priority or decision type changed, with the previous values"""
+    previous_priority: RiskLevel
+    previous_decision_type: DecisionType
+    insight: DecisionInsight
+
+
+class RemovedInsight(BaseModel):
+    """An insight no longer present in the current data version"""
+    product_id: str
+    decision_type: DecisionType
+    priority: RiskLevel
+
+
+class DecisionChangesResponse(BaseModel):
+    """Insights added, changed or removed between two data versions"""
+    timestamp: datetime
+    since_version: int
+    data_version: int
+    full_resync: bool = False  # since_version is not retained: added lists every insight
+    total_changes: int
+    added: List[DecisionInsight]
+    changed: List[ChangedInsight]
+    removed: List[RemovedInsight]
+
+
+class RejectedRow(BaseModel):
+    """A CSV row rejected during ingestion"""
+    line_number: int
+    reason: str
+
+
+class IngestionRejectReport(BaseModel):
+    """Rows rejected during ingestion, counted by reason"""
+    total_rejected: int = 0
+    reasons: Dict[str, int] = {}
+    samples: List[RejectedRow] = []
 
 
 class DataIngestionResponse(BaseModel):
@@ -103,3 +184,106 @@ class DataIngestionResponse(BaseModel):
     records_processed: int
     products_identified: int
     message: str
+    records_rejected: int = 0
+    records_duplicate: int = 0
+    reject_report: Optional[IngestionRejectReport] = None
+    rows_per_second: Optional[float] = None
+    peak_rss_mb: Optional[float] = None
+    profile: Optional[ProfileSummary] = None
+
+
+class StockImportResponse(BaseModel):
+    """Response from a stock-on-hand and unit cost import"""
+    success: bool
+    records_processed: int
+    products_with_sales: int
+    stocked_products: int
+    message: str
+    records_rejected: int = 0
+    reject_report: Optional[IngestionRejectReport] = None
+    rows_per_second: Optional[float] = None
+
+
+class JobResponse(BaseModel):
+    """Status, progress and (once finished) result of a background job"""
+    job_id: str
+    kind: str
+    status: JobStatus
+    stage: Optional[str] = None
+    rows_parsed: int = 0
+    bytes_read: int = 0
+    total_bytes: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    elapsed_seconds: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+
+
+class ScenarioParameters(BaseModel):
+    """Decision parameters of one what-if scenario; unset values use the configured ones"""
+    name: Optional[str] = None
+    reorder_lead_time_days: Optional[int] = Field(None, ge=0)
+    slow_moving_threshold_days: Optional[int] = Field(None, ge=0)
+    safety_buffer_days: Optional[int] = Field(None, ge=0)
+
+
+class ScenarioGrid(BaseModel):
+    """Parameter values whose every combination becomes a scenario"""
+    reorder_lead_time_days: List[int] = []
+    slow_moving_threshold_days: List[int] = []
+    safety_buffer_days: List[int] = []
+
+
+class ScenarioSweepRequest(BaseModel):
+    """Scenarios to evaluate: an explicit list, a grid, or both"""
+    scenarios: List[ScenarioParameters] = []
+    grid: Optional[ScenarioGrid] = None
+
+
+class ScenarioResult(BaseModel):
+    """Decision totals under one scenario's parameters"""
+    parameters: ScenarioParameters
+    inventory_risks: int
+    critical_actions: int
+    slow_moving_products: int
+    reorder_recommendations: int
+    reorder_units: int
+    reorder_cost: float
+    capital_tied_up: float = Field(..., description="Estimated value of stock held by slow movers")
+    total_insights: int
+
+
+class ScenarioSweepResponse(BaseModel):
+    """Results of a scenario sweep, in request order (explicit scenarios, then the grid)"""
+    timestamp: datetime
+    data_version: int
+    products: int
+    elapsed_seconds: float
+    scenarios: List[ScenarioResult]
+
+
+class BatchDecisionRequest(BaseModel):
+    """Tenants to evaluate in one batch, with filters applied to each"""
+    tenant_ids: List[str] = Field(..., min_length=1)
+    top_k: int = Field(10, ge=1, description="Highest-priority insights returned per tenant")
+    priority: Optional[RiskLevel] = None
+    decision_type: Optional[DecisionType] = None
+
+
+class TenantDecisions(BaseModel):
+    """Top insights for one tenant in a batch, or why it could not be evaluated"""
+    tenant_id: str
+    data_version: Optional[int] = None
+    total_insights: int = 0
+    critical_actions: int = 0
+    insights: List[DecisionInsight] = []
+    error: Optional[str] = None
+
+
+class BatchDecisionResponse(BaseModel):
+    """Per-tenant results of a batch evaluation, in request order"""
+    timestamp: datetime
+    results: List[TenantDecisions]
+    elapsed_seconds: float
@@ -3,17 +3,48 @@ Decision Intelligence Platform - FastAPI Backend
 Main application entry point
 """
 
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from api.routes import decisions, data_ingestion
+from api.routes import decisions, data_ingestion, jobs, tenants
 from core.config import settings
+from services.dataset import dataset
+from services.executor import executor, ExecutorSaturated
+from services.jobs import job_queue
+from services.metrics import metrics
+from services.parallel_ingest import shutdown_pool
+from services.storage import create_store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reload previously stored transactions before serving requests
+    store = create_store()
+    if store is not None:
+        dataset.attach_store(store)
+        dataset.start_sync()
+    elif settings.SNAPSHOT_LOAD_ON_STARTUP and os.path.isdir(settings.SNAPSHOT_PATH):
+        dataset.load_snapshot()
+    
+    # Routers register their job handlers on import, so persisted jobs
+    # can be resumed as soon as the workers start
+    job_queue.start()
+    yield
+    
+    if store is not None:
+        store.close()
+    shutdown_pool()
+
 
 app = FastAPI(
     title="Decision Intelligence Platform",
     description="A decision-first platform for transactional businesses",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend integration
@@ -25,9 +56,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Shed load when the worker pool and its queue are full"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+
 # Include routers
 app.include_router(data_ingestion.router, prefix="/api/v1", tags=["Data Ingestion"])
 app.include_router(decisions.router, prefix="/api/v1", tags=["Decisions"])
+app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
+app.include_router(tenants.router, prefix="/api/v1", tags=["Tenants"])
 
 
 @app.get("/")
@@ -43,4 +86,20 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "workers": executor.stats()}
+
+
+metrics.gauge('dataset_version', 'Current data version', lambda: dataset.version)
+metrics.gauge('dataset_products', 'Products in the default dataset', lambda: len(dataset))
+metrics.gauge('worker_pool_in_flight', 'Jobs running or queued on the worker pool',
+              lambda: executor.stats()["in_flight"])
+metrics.gauge('worker_pool_rejected', 'Requests shed with 429 since startup',
+              lambda: executor.stats()["rejected"])
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage timings, row and cache counters in Prometheus text format"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
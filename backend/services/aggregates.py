@@ -0,0 +1,348 @@
+"""
+Per-product sales aggregates maintained incrementally
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from services.columnar import (
+    DATETIME_DTYPE,
+    ProductSummary,
+    TransactionColumns,
+    summarize_by_product,
+)
+from services.demand import RollingDemand
+
+
+_DATE_MAX = np.iinfo(np.int64).max
+_DATE_MIN = np.iinfo(np.int64).min
+
+# Daily bucket keys pack (product slot, day number) into one int64
+_DAY_BITS = 32
+_DAY_OFFSET = 1 << (_DAY_BITS - 1)  # Allows days before 1970
+
+
+class DailySalesBuckets:
+    """
+    Units sold per product per calendar day
+
+    New buckets are appended as pre-grouped runs and merged into the
+    sorted key array lazily, so an update costs O(batch) amortized.
+    Date-range totals come from running sums over the sorted buckets,
+    so a query costs O(products * log(buckets)) however many days the
+    range or the history spans.
+    """
+
+    def __init__(self):
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._quantity = np.zeros(0, dtype=np.int64)
+        self._cumulative: Optional[np.ndarray] = None
+        self._pending_keys: List[np.ndarray] = []
+        self._pending_quantity: List[np.ndarray] = []
+        self._pending_size = 0
+        self._last_day: Optional[int] = None
+
+    def __len__(self) -> int:
+        self._compact()
+        return len(self._keys)
+
+    @property
+    def last_day(self) -> Optional[int]:
+        """Newest day with sales, as days since the epoch"""
+        return self._last_day
+
+    def add(self, slots: np.ndarray, dates: np.ndarray, quantity: np.ndarray) -> None:
+        """Add per-row sales given each row's product slot and timestamp"""
+        if len(slots) == 0:
+            return
+
+        days = dates.astype('datetime64[D]').view(np.int64) + _DAY_OFFSET
+        keys, quantity = _group_sum((slots.astype(np.int64) << _DAY_BITS) | days, quantity)
+        self._pending_keys.append(keys)
+        self._pending_quantity.append(quantity)
+        self._pending_size += len(keys)
+        self._see_day(int(days.max()) - _DAY_OFFSET)
+
+        # Merging once pending runs outgrow the merged array keeps the
+        # total merge work linear in the number of updates
+        if self._pending_size > max(len(self._keys), 4096):
+            self._compact()
+
+    def merge(self, other: 'DailySalesBuckets', slot_map: np.ndarray) -> None:
+        """Add another bucket set whose slot i corresponds to slot_map[i] here"""
+        other._compact()
+        if len(other._keys) == 0:
+            return
+
+        day_mask = (1 << _DAY_BITS) - 1
+        slots = slot_map[other._keys >> _DAY_BITS]
+        keys = (slots << _DAY_BITS) | (other._keys & day_mask)
+        self._pending_keys.append(keys)
+        self._pending_quantity.append(other._quantity.copy())
+        self._pending_size += len(keys)
+        self._see_day(other.last_day)
+        if self._pending_size > max(len(self._keys), 4096):
+            self._compact()
+
+    def for_slot(self, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Days (datetime64[D]) and units sold for one product slot"""
+        self._compact()
+        start, end = np.searchsorted(
+            self._keys, [slot << _DAY_BITS, (slot + 1) << _DAY_BITS]
+        )
+        days = (self._keys[start:end] & ((1 << _DAY_BITS) - 1)) - _DAY_OFFSET
+        return days.astype('datetime64[D]'), self._quantity[start:end].copy()
+
+    def sold_after(self, slots: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Units each slot sold on days after its given day number since the epoch"""
+        slots = slots.astype(np.int64)
+        return self._sold_from(slots, days + 1) - self._sold_from(slots + 1, np.iinfo(np.int32).min)
+
+    def sold_between(self, slots: np.ndarray, first_day: int, last_day: int) -> np.ndarray:
+        """Units each slot sold over days first_day..last_day inclusive (days since the epoch)"""
+        slots = slots.astype(np.int64)
+        return self._sold_from(slots, first_day) - self._sold_from(slots, last_day + 1)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        self._compact()
+        return {'keys': self._keys, 'quantity': self._quantity}
+
+    def entries(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Every bucket as (slot, day number since the epoch, units sold)"""
+        self._compact()
+        days = (self._keys & ((1 << _DAY_BITS) - 1)) - _DAY_OFFSET
+        return self._keys >> _DAY_BITS, days, self._quantity
+
+    def memory_bytes(self) -> int:
+        pending = sum(keys.nbytes + quantity.nbytes
+                      for keys, quantity in zip(self._pending_keys, self._pending_quantity))
+        cumulative = self._cumulative.nbytes if self._cumulative is not None else 0
+        return self._keys.nbytes + self._quantity.nbytes + cumulative + pending
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'DailySalesBuckets':
+        buckets = cls()
+        buckets._keys, buckets._quantity = arrays['keys'], arrays['quantity']
+        if len(buckets._keys):
+            days = (buckets._keys & ((1 << _DAY_BITS) - 1)) - _DAY_OFFSET
+            buckets._last_day = int(days.max())
+        return buckets
+
+    def _sold_from(self, slots: np.ndarray, days) -> np.ndarray:
+        """Units in every bucket from (slot, day) on: the slot's sales from that day plus all later slots'"""
+        self._compact()
+        if self._cumulative is None:
+            # Built on the first range query after a change
+            self._cumulative = np.concatenate([[0], np.cumsum(self._quantity)])
+        first_day = np.clip(np.asarray(days, dtype=np.int64) + _DAY_OFFSET, 0, (1 << _DAY_BITS) - 1)
+        starts = np.searchsorted(self._keys, (slots << _DAY_BITS) | first_day)
+        return self._cumulative[-1] - self._cumulative[starts]
+
+    def _see_day(self, day: Optional[int]) -> None:
+        if day is not None and (self._last_day is None or day > self._last_day):
+            self._last_day = day
+
+    def _compact(self) -> None:
+        if not self._pending_keys:
+            return
+        self._keys, self._quantity = _group_sum(
+            np.concatenate([self._keys] + self._pending_keys),
+            np.concatenate([self._quantity] + self._pending_quantity)
+        )
+        self._cumulative = None
+        self._pending_keys, self._pending_quantity = [], []
+        self._pending_size = 0
+
+
+def _group_sum(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum values per distinct key, returning sorted keys"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse.ravel(), weights=values, minlength=len(unique_keys))
+    return unique_keys, sums.astype(np.int64)
+
+
+class ProductAggregates:
+    """
+    Running per-product sales totals
+
+    Each batch is grouped by product and folded into the totals, so
+    memory grows with the number of products rather than the number of
+    transactions, and an update costs O(batch) regardless of how much
+    history has already been folded in.
+    """
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self.product_ids: List[str] = []
+        self.product_names: List[str] = []
+        self.daily_sales = DailySalesBuckets()
+        self.demand = RollingDemand()
+        self._total_sold = np.zeros(0, dtype=np.int64)
+        self._total_revenue = np.zeros(0, dtype=np.float64)
+        self._first_sale = np.zeros(0, dtype=np.int64)
+        self._last_sale = np.zeros(0, dtype=np.int64)
+        self._changed = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def update(self, batch: TransactionColumns) -> None:
+        """Fold a batch of transactions into the running totals"""
+        if len(batch) == 0:
+            return
+
+        slots = self._fold(summarize_by_product(batch))
+        row_slots = slots[batch.product_codes]
+        self.daily_sales.add(row_slots, batch.transaction_date, batch.quantity)
+        self.demand.add(
+            row_slots, batch.transaction_date.astype('datetime64[D]').view(np.int64), batch.quantity
+        )
+
+    def merge(self, other: 'ProductAggregates') -> None:
+        """Fold another set of aggregates (e.g. a parsed upload) into this one"""
+        if len(other) == 0:
+            return
+
+        slots = self._fold(other.summary())
+        self.daily_sales.merge(other.daily_sales, slots)
+        self.demand.merge(other.demand, slots)
+
+    def slot_of(self, product_id: str) -> Optional[int]:
+        """Storage slot of a product, or None if it has no sales"""
+        return self._index.get(product_id)
+
+    def pop_changed(self) -> np.ndarray:
+        """Slots updated since the last call, clearing the change set"""
+        count = len(self)
+        changed = np.flatnonzero(self._changed[:count])
+        self._changed[:count] = False
+        return changed
+
+    def summary(self, slots: Optional[np.ndarray] = None) -> ProductSummary:
+        """Current totals as a ProductSummary, optionally for some slots only"""
+        if slots is None:
+            slots = np.arange(len(self))
+
+        return ProductSummary(
+            product_ids=[self.product_ids[i] for i in slots],
+            product_names=[self.product_names[i] for i in slots],
+            total_sold=self._total_sold[slots],
+            total_revenue=self._total_revenue[slots],
+            first_sale_date=self._first_sale[slots].view(DATETIME_DTYPE),
+            last_sale_date=self._last_sale[slots].view(DATETIME_DTYPE),
+        )
+
+    def to_arrays(self) -> Dict[str, Union[np.ndarray, List[str]]]:
+        """Totals and daily buckets, for snapshots"""
+        count = len(self)
+        daily = self.daily_sales.to_arrays()
+        return {
+            'product_ids': self.product_ids,
+            'product_names': self.product_names,
+            'total_sold': self._total_sold[:count],
+            'total_revenue': self._total_revenue[:count],
+            'first_sale': self._first_sale[:count],
+            'last_sale': self._last_sale[:count],
+            'daily_keys': daily['keys'],
+            'daily_quantity': daily['quantity'],
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Union[np.ndarray, List[str]]]) -> 'ProductAggregates':
+        """Rebuild aggregates from to_arrays() output, with every product marked changed"""
+        aggregates = cls()
+        aggregates.product_ids = list(arrays['product_ids'])
+        aggregates.product_names = list(arrays['product_names'])
+        aggregates._index = {product_id: slot for slot, product_id in enumerate(aggregates.product_ids)}
+
+        count = len(aggregates.product_ids)
+        aggregates._reserve(count)
+        aggregates._total_sold[:count] = arrays['total_sold']
+        aggregates._total_revenue[:count] = arrays['total_revenue']
+        aggregates._first_sale[:count] = arrays['first_sale']
+        aggregates._last_sale[:count] = arrays['last_sale']
+        aggregates._changed[:count] = True
+        aggregates.daily_sales = DailySalesBuckets.from_arrays(
+            {'keys': arrays['daily_keys'], 'quantity': arrays['daily_quantity']}
+        )
+        # Rolling demand windows are rebuilt from the daily buckets, so
+        # snapshots stay valid when DEMAND_WINDOWS changes
+        aggregates.demand = RollingDemand.from_daily_sales(*aggregates.daily_sales.entries())
+        return aggregates
+
+    def recent_daily_sales(self, days: int, slots: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Average units sold per day over the last `days` days of data
+
+        The window ends on the newest day with any sales, so it moves
+        only when data is ingested. Products first sold inside the
+        window are averaged over the days since their first sale.
+        """
+        last_day = self.daily_sales.last_day
+        if slots is None:
+            slots = np.arange(len(self))
+        if last_day is None:
+            return np.zeros(len(slots), dtype=np.float64)
+
+        sold = self.daily_sales.sold_between(slots, last_day - days + 1, last_day)
+
+        first_day = self._first_sale[slots].view(DATETIME_DTYPE).astype('datetime64[D]').view(np.int64)
+        span = np.clip(last_day - first_day + 1, 1, days)
+        return sold / span
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the totals, daily buckets and demand windows"""
+        arrays = (self._total_sold, self._total_revenue, self._first_sale, self._last_sale, self._changed)
+        # Ids and names: string payload plus list slots and an index entry
+        strings = sum(len(value) for value in self.product_ids) + sum(len(value) for value in self.product_names)
+        return (
+            sum(array.nbytes for array in arrays)
+            + strings + 200 * len(self)
+            + self.daily_sales.memory_bytes()
+            + self.demand.memory_bytes()
+        )
+
+    def _fold(self, summary: ProductSummary) -> np.ndarray:
+        """Add per-product totals, returning the slots they were added to"""
+        slots = self._slots_for(summary)
+
+        self._total_sold[slots] += summary.total_sold
+        self._total_revenue[slots] += summary.total_revenue
+        self._first_sale[slots] = np.minimum(
+            self._first_sale[slots], summary.first_sale_date.view(np.int64)
+        )
+        self._last_sale[slots] = np.maximum(
+            self._last_sale[slots], summary.last_sale_date.view(np.int64)
+        )
+        self._changed[slots] = True
+        return slots
+
+    def _slots_for(self, summary: ProductSummary) -> np.ndarray:
+        """Map a summary's products to storage slots, adding new products"""
+        index = self._index
+        slots = np.empty(len(summary), dtype=np.int64)
+        for i, product_id in enumerate(summary.product_ids):
+            slot = index.get(product_id)
+            if slot is None:
+                slot = index[product_id] = len(self.product_ids)
+                self.product_ids.append(product_id)
+                self.product_names.append(summary.product_names[i])
+            slots[i] = slot
+
+        self._reserve(len(self.product_ids))
+        return slots
+
+    def _reserve(self, count: int) -> None:
+        """Grow the backing arrays geometrically to hold count products"""
+        capacity = len(self._total_sold)
+        if count <= capacity:
+            return
+
+        new_capacity = max(count, capacity * 2, 1024)
+        grow = new_capacity - capacity
+        self._total_sold = np.concatenate([self._total_sold, np.zeros(grow, dtype=np.int64)])
+        self._total_revenue = np.concatenate([self._total_revenue, np.zeros(grow, dtype=np.float64)])
+        self._first_sale = np.concatenate([self._first_sale, np.full(grow, _DATE_MAX, dtype=np.int64)])
+        self._last_sale = np.concatenate([self._last_sale, np.full(grow, _DATE_MIN, dtype=np.int64)])
+        self._changed = np.concatenate([self._changed, np.zeros(grow, dtype=bool)])
@@ -0,0 +1,699 @@
+"""
+Columnar transaction representation and vectorized CSV parsing
+
+Transactions are held as typed NumPy arrays instead of one pydantic
+object per row. Identifier columns are dictionary-encoded: each row
+stores an integer code into a list of distinct values.
+"""
+
+import csv
+import io
+import warnings
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.models import Transaction, ProductInventory, RejectedRow, IngestionRejectReport
+
+
+TRANSACTION_COLUMNS = [
+    'transaction_id',
+    'product_id',
+    'product_name',
+    'quantity',
+    'unit_price',
+    'transaction_date',
+    'customer_id',
+]
+
+DATETIME_DTYPE = 'datetime64[us]'
+
+# Reject reasons, in the order they are checked
+REJECT_REASONS = [
+    "malformed row",
+    "invalid quantity",
+    "quantity must be greater than 0",
+    "invalid unit_price",
+    "unit_price must be greater than 0",
+    "invalid transaction_date",
+]
+
+STOCK_COLUMNS = ['product_id', 'stock_on_hand', 'unit_cost']
+
+# Stock import reject reasons, in the order they are checked
+STOCK_REJECT_REASONS = [
+    "malformed row",
+    "missing product_id",
+    "invalid stock_on_hand",
+    "stock_on_hand must not be negative",
+    "invalid unit_cost",
+    "unit_cost must not be negative",
+    "no stock_on_hand or unit_cost",
+]
+
+
+@dataclass
+class TransactionColumns:
+    """Column-oriented batch of validated transactions"""
+    transaction_ids: np.ndarray      # object array of str
+    product_codes: np.ndarray        # int32 codes into product_ids
+    product_ids: List[str]
+    product_name_codes: np.ndarray   # int32 codes into product_names
+    product_names: List[str]
+    quantity: np.ndarray             # int64
+    unit_price: np.ndarray           # float64
+    transaction_date: np.ndarray     # datetime64[us]
+    customer_codes: np.ndarray       # int32 codes into customer_ids, -1 if missing
+    customer_ids: List[str]
+
+    def __len__(self) -> int:
+        return len(self.quantity)
+
+    @classmethod
+    def empty(cls) -> 'TransactionColumns':
+        """Create a batch with no rows"""
+        return cls(
+            transaction_ids=np.empty(0, dtype=object),
+            product_codes=np.empty(0, dtype=np.int32),
+            product_ids=[],
+            product_name_codes=np.empty(0, dtype=np.int32),
+            product_names=[],
+            quantity=np.empty(0, dtype=np.int64),
+            unit_price=np.empty(0, dtype=np.float64),
+            transaction_date=np.empty(0, dtype=DATETIME_DTYPE),
+            customer_codes=np.empty(0, dtype=np.int32),
+            customer_ids=[],
+        )
+
+    def take(self, rows: np.ndarray) -> 'TransactionColumns':
+        """
+        A batch of some rows, in the given order
+
+        Dictionaries are narrowed to the values those rows use and
+        renumbered in first-seen order, as the parser assigns them.
+        """
+        product_codes, product_ids = _reencode(self.product_codes[rows], self.product_ids)
+        name_codes, product_names = _reencode(self.product_name_codes[rows], self.product_names)
+        customer_codes, customer_ids = _reencode(self.customer_codes[rows], self.customer_ids)
+        return TransactionColumns(
+            transaction_ids=self.transaction_ids[rows],
+            product_codes=product_codes,
+            product_ids=product_ids,
+            product_name_codes=name_codes,
+            product_names=product_names,
+            quantity=self.quantity[rows],
+            unit_price=self.unit_price[rows],
+            transaction_date=self.transaction_date[rows],
+            customer_codes=customer_codes,
+            customer_ids=customer_ids,
+        )
+
+    def to_transactions(self, indices: Optional[Sequence[int]] = None) -> List[Transaction]:
+        """
+        Materialize pydantic Transaction objects
+
+        Only call this when a response actually needs row objects; pass
+        indices to build a subset.
+        """
+        if indices is None:
+            indices = range(len(self))
+
+        dates = self.transaction_date.astype(object)
+        transactions = []
+        for i in indices:
+            customer_code = self.customer_codes[i]
+            # Rows were validated during parsing, so skip re-validation
+            transactions.append(Transaction.model_construct(
+                transaction_id=self.transaction_ids[i],
+                product_id=self.product_ids[self.product_codes[i]],
+                product_name=self.product_names[self.product_name_codes[i]],
+                quantity=int(self.quantity[i]),
+                unit_price=float(self.unit_price[i]),
+                transaction_date=dates[i],
+                customer_id=self.customer_ids[customer_code] if customer_code >= 0 else None
+            ))
+
+        return transactions
+
+
+@dataclass
+class StockColumns:
+    """Column-oriented batch of validated stock-on-hand and unit cost rows"""
+    product_ids: np.ndarray          # fixed-width str
+    stock_on_hand: np.ndarray        # int64, -1 where not given
+    unit_cost: np.ndarray            # float64, NaN where not given
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+
+@dataclass
+class ProductSummary:
+    """Per-product totals for one batch of transactions"""
+    product_ids: List[str]
+    product_names: List[str]
+    total_sold: np.ndarray       # int64
+    total_revenue: np.ndarray    # float64
+    first_sale_date: np.ndarray  # datetime64[us]
+    last_sale_date: np.ndarray   # datetime64[us]
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+
+@dataclass
+class InventoryTable:
+    """
+    Column-oriented product inventory
+
+    Row i describes product_ids[i]; missing values are NaT for
+    last_sale_date and NaN for days_of_stock_remaining and
+    daily_sales_std. daily_sales_std is None when it was not computed.
+    """
+    product_ids: List[str]
+    product_names: List[str]
+    current_stock: np.ndarray            # int64
+    unit_cost: np.ndarray                # float64
+    last_sale_date: np.ndarray           # datetime64[us]
+    average_daily_sales: np.ndarray      # float64
+    days_of_stock_remaining: np.ndarray  # float64
+    daily_sales_std: Optional[np.ndarray] = None  # float64
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    @classmethod
+    def from_inventory(cls, inventory: Dict[str, ProductInventory]) -> 'InventoryTable':
+        """Build a table from ProductInventory models"""
+        products = list(inventory.values())
+        has_std = any(p.daily_sales_std is not None for p in products)
+        return cls(
+            product_ids=list(inventory),
+            product_names=[p.product_name for p in products],
+            current_stock=np.array([p.current_stock for p in products], dtype=np.int64),
+            unit_cost=np.array([p.unit_cost for p in products], dtype=np.float64),
+            last_sale_date=np.array(
+                [p.last_sale_date if p.last_sale_date is not None else 'NaT' for p in products],
+                dtype=DATETIME_DTYPE
+            ),
+            average_daily_sales=np.array([p.average_daily_sales for p in products], dtype=np.float64),
+            days_of_stock_remaining=np.array(
+                [p.days_of_stock_remaining if p.days_of_stock_remaining is not None else np.nan
+                 for p in products],
+                dtype=np.float64
+            ),
+            daily_sales_std=np.array(
+                [p.daily_sales_std if p.daily_sales_std is not None else np.nan for p in products],
+                dtype=np.float64
+            ) if has_std else None,
+        )
+
+    def product(self, row: int) -> ProductInventory:
+        """Materialize one row as a ProductInventory model"""
+        return self._build_products([row])[0]
+
+    def to_inventory(self, rows: Optional[Sequence[int]] = None) -> Dict[str, ProductInventory]:
+        """Materialize rows as a product_id -> ProductInventory dict"""
+        if rows is None:
+            rows = range(len(self))
+        return {product.product_id: product for product in self._build_products(rows)}
+
+    def _build_products(self, rows: Sequence[int]) -> List[ProductInventory]:
+        rows = np.asarray(rows, dtype=np.int64)
+        # Convert to Python scalars in bulk; datetime64[us] becomes datetime
+        # and NaT becomes None
+        current_stock = self.current_stock[rows].tolist()
+        unit_cost = self.unit_cost[rows].tolist()
+        last_sale_date = self.last_sale_date[rows].astype(object).tolist()
+        average_daily_sales = self.average_daily_sales[rows].tolist()
+        days_remaining = self.days_of_stock_remaining[rows]
+        has_days = ~np.isnan(days_remaining)
+        days_remaining = days_remaining.tolist()
+        if self.daily_sales_std is not None:
+            std = self.daily_sales_std[rows]
+            std = np.where(np.isnan(std), None, std).tolist()
+        else:
+            std = [None] * len(rows)
+
+        return [
+            ProductInventory(
+                product_id=self.product_ids[row],
+                product_name=self.product_names[row],
+                current_stock=current_stock[i],
+                unit_cost=unit_cost[i],
+                last_sale_date=last_sale_date[i],
+                average_daily_sales=average_daily_sales[i],
+                days_of_stock_remaining=days_remaining[i] if has_days[i] else None,
+                daily_sales_std=std[i]
+            )
+            for i, row in enumerate(rows.tolist())
+        ]
+
+
+def _reencode(codes: np.ndarray, values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Renumber codes (-1 = missing) over only the values they use, in first-seen order"""
+    present = codes >= 0
+    used, first = np.unique(codes[present], return_index=True)
+    order = used[np.argsort(first, kind='stable')]
+    remap = np.full(len(values) + 1, -1, dtype=np.int32)  # The extra entry maps -1 to -1
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    return remap[codes], [values[code] for code in order.tolist()]
+
+
+def dictionary_encode(values: Iterable[str]) -> Tuple[np.ndarray, List[str]]:
+    """Encode values as int32 codes in first-seen order"""
+    index: Dict[str, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(value, len(index)) for value in values),
+        dtype=np.int32
+    )
+    return codes, list(index)
+
+
+def _parse_ints(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse a string column to int64, returning (values, parsed_mask)"""
+    try:
+        return np.array(values).astype(np.int64), np.ones(len(values), dtype=bool)
+    except (ValueError, OverflowError):
+        pass
+
+    # Slow path: at least one value is not an integer
+    parsed = np.zeros(len(values), dtype=np.int64)
+    ok = np.ones(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = int(value)
+        except (ValueError, TypeError, OverflowError):
+            ok[i] = False
+    return parsed, ok
+
+
+def _parse_floats(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse a string column to float64, returning (values, parsed_mask)"""
+    try:
+        return np.array(values).astype(np.float64), np.ones(len(values), dtype=bool)
+    except ValueError:
+        pass
+
+    parsed = np.zeros(len(values), dtype=np.float64)
+    ok = np.ones(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = float(value)
+        except (ValueError, TypeError):
+            ok[i] = False
+    return parsed, ok
+
+
+def _parse_dates(values: Sequence[str]) -> np.ndarray:
+    """
+    Parse an ISO-8601 string column to datetime64, NaT where invalid
+
+    NumPy also reads "now", "today", partial dates ("2024", "2024-01")
+    and years beyond 9999, which datetime.fromisoformat rejects. Values
+    shorter than a full date or outside those years are re-checked with
+    fromisoformat, as is every value when NumPy rejects any of them.
+    """
+    with warnings.catch_warnings():
+        # Timezone offsets are converted to UTC
+        warnings.simplefilter("ignore")
+        try:
+            parsed = np.array(values, dtype=DATETIME_DTYPE)
+        except ValueError:
+            parsed = None
+
+    if parsed is None:
+        parsed = np.full(len(values), np.datetime64('NaT'), dtype=DATETIME_DTYPE)
+        slow = range(len(values))
+    else:
+        lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        years = parsed.astype('datetime64[Y]').astype(np.int64) + 1970
+        slow = np.flatnonzero((lengths < 10) | (years < 1) | (years > 9999)).tolist()
+
+    for i in slow:
+        try:
+            value = datetime.fromisoformat(values[i])
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            parsed[i] = np.datetime64(value, 'us')
+        except (ValueError, TypeError):
+            parsed[i] = np.datetime64('NaT')
+    return parsed
+
+
+def read_records(reader) -> Tuple[List[List[str]], np.ndarray]:
+    """
+    The remaining records of a csv.reader, with the line each starts on
+
+    Blank lines are skipped, as csv.DictReader does. Line numbers count
+    physical lines from the reader's first, so a quoted field spanning
+    lines moves the following records down.
+    """
+    rows = []
+    line_numbers = []
+    previous = reader.line_num
+    for row in reader:
+        if row:
+            rows.append(row)
+            line_numbers.append(previous + 1)
+        previous = reader.line_num
+    return rows, np.array(line_numbers, dtype=np.int64)
+
+
+def build_reject_report(
+    reason_codes: np.ndarray,
+    line_numbers: np.ndarray,
+    reasons: Sequence[str] = REJECT_REASONS
+) -> IngestionRejectReport:
+    """Build a reject report from per-row reason codes (-1 = accepted)"""
+    rejected = np.flatnonzero(reason_codes >= 0)
+    counts = np.bincount(reason_codes[rejected], minlength=len(reasons))
+
+    samples = [
+        RejectedRow(
+            line_number=int(line_numbers[i]),
+            reason=reasons[reason_codes[i]]
+        )
+        for i in rejected[:settings.INGEST_REJECT_SAMPLE_LIMIT]
+    ]
+
+    return IngestionRejectReport(
+        total_rejected=len(rejected),
+        reasons={
+            reasons[code]: int(count)
+            for code, count in enumerate(counts) if count
+        },
+        samples=samples
+    )
+
+
+def merge_reject_reports(reports: Iterable[IngestionRejectReport]) -> IngestionRejectReport:
+    """Combine reject reports from several batches"""
+    merged = IngestionRejectReport()
+    for report in reports:
+        merged.total_rejected += report.total_rejected
+        for reason, count in report.reasons.items():
+            merged.reasons[reason] = merged.reasons.get(reason, 0) + count
+        room = settings.INGEST_REJECT_SAMPLE_LIMIT - len(merged.samples)
+        if room > 0:
+            merged.samples.extend(report.samples[:room])
+    return merged
+
+
+def parse_transaction_rows(
+    header: Sequence[str],
+    rows: List[List[str]],
+    line_numbers: Optional[np.ndarray] = None
+) -> Tuple[TransactionColumns, IngestionRejectReport]:
+    """
+    Parse raw CSV rows into validated columns
+
+    Validation runs over whole columns: quantity and unit_price must
+    parse and be greater than 0, and transaction_date must be a valid
+    ISO-8601 timestamp. Rows failing any check go to the reject report,
+    under their line_numbers (by default consecutive lines from 2).
+    """
+    positions = {name: i for i, name in enumerate(header)}
+    missing = [
+        name for name in TRANSACTION_COLUMNS
+        if name not in positions and name != 'customer_id'
+    ]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    row_count = len(rows)
+    if line_numbers is None:
+        line_numbers = np.arange(2, row_count + 2)
+    if row_count == 0:
+        return TransactionColumns.empty(), IngestionRejectReport()
+
+    # Short rows cannot be split into columns
+    width = len(header)
+    well_formed = np.fromiter((len(row) >= width for row in rows), dtype=bool, count=row_count)
+    if not well_formed.all():
+        rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+
+    columns = list(zip(*rows))
+    quantity, quantity_ok = _parse_ints(columns[positions['quantity']])
+    unit_price, price_ok = _parse_floats(columns[positions['unit_price']])
+    transaction_date = _parse_dates(columns[positions['transaction_date']])
+
+    reason_codes = np.select(
+        [
+            ~well_formed,
+            ~quantity_ok,
+            quantity <= 0,
+            ~price_ok,
+            ~(unit_price > 0),
+            np.isnat(transaction_date),
+        ],
+        np.arange(len(REJECT_REASONS)),
+        default=-1
+    )
+    report = build_reject_report(reason_codes, line_numbers)
+
+    keep = np.flatnonzero(reason_codes < 0)
+    all_valid = len(keep) == row_count
+
+    def select(name: str) -> Sequence[str]:
+        column = columns[positions[name]]
+        return column if all_valid else [column[i] for i in keep]
+
+    product_codes, product_ids = dictionary_encode(select('product_id'))
+    name_codes, product_names = dictionary_encode(select('product_name'))
+    if 'customer_id' in positions:
+        customer_codes, customer_ids = dictionary_encode(select('customer_id'))
+    else:
+        customer_codes, customer_ids = np.full(len(keep), -1, dtype=np.int32), []
+
+    transaction_ids = np.empty(len(keep), dtype=object)
+    transaction_ids[:] = select('transaction_id')
+
+    batch = TransactionColumns(
+        transaction_ids=transaction_ids,
+        product_codes=product_codes,
+        product_ids=product_ids,
+        product_name_codes=name_codes,
+        product_names=product_names,
+        quantity=quantity if all_valid else quantity[keep],
+        unit_price=unit_price if all_valid else unit_price[keep],
+        transaction_date=transaction_date if all_valid else transaction_date[keep],
+        customer_codes=customer_codes,
+        customer_ids=customer_ids,
+    )
+    return batch, report
+
+
+def parse_stock_rows(
+    header: Sequence[str],
+    rows: List[List[str]],
+    line_numbers: Optional[np.ndarray] = None
+) -> Tuple[StockColumns, IngestionRejectReport]:
+    """
+    Parse raw stock CSV rows into validated columns
+
+    product_id is required, plus at least one of stock_on_hand and
+    unit_cost; a blank value leaves that field as it was. Stock must be
+    a whole number and both must be at least 0.
+    """
+    positions = {name: i for i, name in enumerate(header)}
+    if 'product_id' not in positions:
+        raise ValueError("CSV is missing required columns: product_id")
+    if 'stock_on_hand' not in positions and 'unit_cost' not in positions:
+        raise ValueError("CSV needs a stock_on_hand or unit_cost column")
+
+    row_count = len(rows)
+    if line_numbers is None:
+        line_numbers = np.arange(2, row_count + 2)
+    empty = StockColumns(np.zeros(0, dtype=str), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+    if row_count == 0:
+        return empty, IngestionRejectReport()
+
+    width = len(header)
+    well_formed = np.fromiter((len(row) >= width for row in rows), dtype=bool, count=row_count)
+    if not well_formed.all():
+        rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+    columns = list(zip(*rows))
+
+    def optional(name: str, parse) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(values, given, parsed) of a column where blank means not given"""
+        if name not in positions:
+            return np.zeros(row_count), np.zeros(row_count, dtype=bool), np.ones(row_count, dtype=bool)
+        raw = np.char.strip(np.array(columns[positions[name]], dtype=str))
+        given = np.char.str_len(raw) > 0
+        values, parsed = parse(np.where(given, raw, '0'))
+        return values, given, parsed
+
+    product_ids = np.char.strip(np.array(columns[positions['product_id']], dtype=str))
+    stock_on_hand, stock_given, stock_ok = optional('stock_on_hand', _parse_ints)
+    unit_cost, cost_given, cost_ok = optional('unit_cost', _parse_floats)
+
+    reason_codes = np.select(
+        [
+            ~well_formed,
+            np.char.str_len(product_ids) == 0,
+            ~stock_ok,
+            stock_on_hand < 0,
+            ~cost_ok,
+            ~((unit_cost >= 0) & np.isfinite(unit_cost)),
+            ~(stock_given | cost_given),
+        ],
+        np.arange(len(STOCK_REJECT_REASONS)),
+        default=-1
+    )
+    report = build_reject_report(reason_codes, line_numbers, STOCK_REJECT_REASONS)
+
+    keep = np.flatnonzero(reason_codes < 0)
+    batch = StockColumns(
+        product_ids=product_ids[keep],
+        stock_on_hand=np.where(stock_given, stock_on_hand, -1).astype(np.int64)[keep],
+        unit_cost=np.where(cost_given, unit_cost, np.nan)[keep],
+    )
+    return batch, report
+
+
+def read_stock_csv(data: bytes) -> Tuple[StockColumns, IngestionRejectReport]:
+    """Parse a whole stock CSV upload"""
+    reader = csv.reader(io.StringIO(data.decode('utf-8-sig'), newline=''))
+    header = [name.strip() for name in next(reader, [])]
+    return parse_stock_rows(header, *read_records(reader))
+
+
+def summarize_by_product(batch: TransactionColumns) -> ProductSummary:
+    """Group a batch by product and compute per-product totals"""
+    product_count = len(batch.product_ids)
+    codes = batch.product_codes
+
+    # Codes are assigned in first-seen order, so this also gives each
+    # product's first row
+    _, first_rows = np.unique(codes, return_index=True)
+
+    total_sold = np.bincount(codes, weights=batch.quantity, minlength=product_count)
+    total_revenue = np.bincount(
+        codes,
+        weights=batch.quantity * batch.unit_price,
+        minlength=product_count
+    )
+
+    dates = batch.transaction_date.view(np.int64)
+    first_sale = np.full(product_count, np.iinfo(np.int64).max, dtype=np.int64)
+    last_sale = np.full(product_count, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(first_sale, codes, dates)
+    np.maximum.at(last_sale, codes, dates)
+
+    return ProductSummary(
+        product_ids=list(batch.product_ids),
+        product_names=[batch.product_names[batch.product_name_codes[i]] for i in first_rows],
+        total_sold=total_sold.astype(np.int64),
+        total_revenue=total_revenue,
+        first_sale_date=first_sale.view(DATETIME_DTYPE),
+        last_sale_date=last_sale.view(DATETIME_DTYPE),
+    )
+
+
+def record_windows(
+    buffer,
+    start: int = 0,
+    end: Optional[int] = None,
+    window: Optional[int] = None
+) -> Iterator[memoryview]:
+    """
+    Split buffer[start:end] into zero-copy views of whole CSV records
+
+    buffer may be any bytes-like object, including an mmap. Each view
+    is about `window` bytes (default INGEST_CHUNK_SIZE) and ends just
+    after a newline that is outside quoted fields; start must be at a
+    record boundary. Scanning uses a NumPy view of the buffer, so no
+    bytes are copied.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    view = memoryview(buffer)
+    end = len(data) if end is None else end
+    window = window or settings.INGEST_CHUNK_SIZE
+
+    position = start
+    while position < end:
+        stop = min(position + window, end)
+        while stop < end:
+            block = data[position:stop]
+            newlines = np.flatnonzero(block == ord('\n'))
+            is_quote = block == ord('"')
+            if len(newlines) and is_quote.any():
+                # Keep only newlines preceded by an even number of quotes
+                parity = np.cumsum(is_quote, dtype=np.int64)[newlines] & 1
+                newlines = newlines[parity == 0]
+            if len(newlines):
+                stop = position + int(newlines[-1]) + 1
+                break
+            # A single record longer than the window
+            stop = min(stop + window, end)
+
+        yield view[position:stop]
+        position = stop
+
+
+class CsvStreamParser:
+    """
+    Incremental CSV parser for transaction uploads
+
+    Bytes are fed in arbitrary chunks; each call parses the complete
+    records seen so far and returns them as a batch. Only the trailing
+    partial record is kept between calls.
+    """
+
+    def __init__(self):
+        self.header: Optional[List[str]] = None
+        self.rows_parsed = 0
+        self.product_ids: Set[str] = set()
+        self.reject_report = IngestionRejectReport()
+        self._pending = b''
+        self.lines_read = 0  # Physical lines parsed so far, the header's included
+
+    def feed(self, chunk: bytes) -> TransactionColumns:
+        """Parse the complete records available after adding chunk"""
+        data = self._pending + chunk if self._pending else chunk
+        cut = data.rfind(b'\n') + 1
+
+        # Do not split inside a quoted field that spans lines
+        while cut > 0 and data.count(b'"', 0, cut) % 2:
+            cut = data.rfind(b'\n', 0, cut - 1) + 1
+
+        self._pending = data[cut:]
+        return self._parse(data[:cut])
+
+    def feed_records(self, records) -> TransactionColumns:
+        """
+        Parse a bytes-like view that holds only whole records
+
+        Used with record_windows: the view is decoded straight from the
+        underlying buffer, without copying it into a bytes object first.
+        """
+        if self._pending:
+            raise ValueError("feed_records cannot follow a partial feed()")
+        return self._parse(records)
+
+    def close(self) -> TransactionColumns:
+        """Parse whatever remains after the last newline"""
+        data, self._pending = self._pending, b''
+        return self._parse(data)
+
+    def _parse(self, data) -> TransactionColumns:
+        if not data:
+            return TransactionColumns.empty()
+
+        reader = csv.reader(io.StringIO(str(data, 'utf-8'), newline=''))
+        if self.header is None:
+            self.header = next(reader, None)
+            if self.header is None:
+                return TransactionColumns.empty()
+
+        rows, line_numbers = read_records(reader)
+        batch, report = parse_transaction_rows(self.header, rows, line_numbers + self.lines_read)
+        self.lines_read += reader.line_num
+        self.rows_parsed += len(batch)
+        self.product_ids.update(batch.product_ids)
+        self.reject_report = merge_reject_reports([self.reject_report, report])
+        return batch
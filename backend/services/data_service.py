@@ -3,14 +3,123 @@ Data ingestion and management service
 """
 
 import csv
+import mmap
 import os
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, Iterable, List, Dict, Optional, Tuple
 from pathlib import Path
-from pydantic import ValidationError
+
+import numpy as np
 
 from core.config import settings
-from core.models import Transaction, ProductInventory
+from core.models import Transaction, ProductInventory, IngestionRejectReport
+from services.aggregates import ProductAggregates
+from services.history import TransactionHistory
+from services.metrics import metrics
+from services.parallel_ingest import parse_csv_file_parallel
+from services.columnar import (
+    CsvStreamParser,
+    InventoryTable,
+    TransactionColumns,
+    ProductSummary,
+    parse_transaction_rows,
+    read_records,
+    record_windows,
+)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, if the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def mapped_file(source):
+    """
+    Read-only memory map of a file path or open binary file
+
+    Yields empty bytes for an empty file, since those cannot be mapped.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f, mapped_file(f) as mapped:
+            yield mapped
+        return
+
+    fileno = source.fileno()
+    if os.fstat(fileno).st_size == 0:
+        yield b''
+        return
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # Views are still held by an exception's traceback; the
+            # mapping is released once they are garbage collected
+            pass
+
+
+@dataclass
+class StreamIngestResult:
+    """Outcome of a streaming ingestion"""
+    aggregates: ProductAggregates
+    rows_processed: int
+    products_identified: int
+    reject_report: IngestionRejectReport
+    elapsed_seconds: float
+    peak_rss_bytes: Optional[int] = None
+    history: Optional[TransactionHistory] = None
+    duplicate_rows: int = 0  # Rows skipped as already ingested
+    
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_processed / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+class _StageTimings:
+    """Parse and aggregate time summed over an ingestion's batches, for metrics"""
+    
+    def __init__(self, parse: float = 0.0):
+        self.parse = parse
+        self.aggregate = 0.0
+        self._mark = 0.0
+    
+    def start(self) -> None:
+        self._mark = time.perf_counter()
+    
+    def parsed(self) -> None:
+        now = time.perf_counter()
+        self.parse += now - self._mark
+        self._mark = now
+    
+    def aggregated(self) -> None:
+        now = time.perf_counter()
+        self.aggregate += now - self._mark
+        self._mark = now
+    
+    def record(self, result: StreamIngestResult) -> None:
+        if not metrics.enabled:
+            return
+        metrics.record_stage('parse', self.parse, result.rows_processed)
+        if self.aggregate:
+            metrics.record_stage('aggregate', self.aggregate, result.rows_processed)
+        for reason, count in result.reject_report.reasons.items():
+            metrics.rejected_rows.inc(count, reason=reason)
 
 
 class DataService:
@@ -27,38 +136,177 @@ class DataService:
         
         Expected CSV format:
         transaction_id,product_id,product_name,quantity,unit_price,transaction_date,customer_id
+        
+        Invalid rows are skipped; use ingest_transactions_columnar to
+        get the reject report and avoid building one object per row.
+        """
+        columns, _ = self.ingest_transactions_columnar(file_path)
+        return columns.to_transactions()
+    
+    def ingest_transactions_columnar(
+        self,
+        file_path: str
+    ) -> Tuple[TransactionColumns, IngestionRejectReport]:
         """
-        transactions = []
+        Ingest transactions from a CSV file into typed columns
         
+        Returns the validated rows and a report of the rejected ones.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                
-                for row in reader:
-                    try:
-                        transaction = Transaction(
-                            transaction_id=row.get('transaction_id', ''),
-                            product_id=row.get('product_id', ''),
-                            product_name=row.get('product_name', ''),
-                            quantity=int(row.get('quantity', 0)),
-                            unit_price=float(row.get('unit_price', 0)),
-                            transaction_date=datetime.fromisoformat(
-                                row.get('transaction_date', datetime.now().isoformat())
-                            ),
-                            customer_id=row.get('customer_id')
-                        )
-                        transactions.append(transaction)
-                    except (ValueError, KeyError, ValidationError) as e:
-                        # Skip invalid rows but continue processing
-                        print(f"Warning: Skipping invalid row: {e}")
-                        continue
+            with open(file_path, 'r', encoding='utf-8', newline='') as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if header is None:
+                    return TransactionColumns.empty(), IngestionRejectReport()
+                return parse_transaction_rows(header, *read_records(reader))
         
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file not found: {file_path}")
         except Exception as e:
             raise Exception(f"Error reading CSV file: {str(e)}")
+    
+    def ingest_csv_stream(
+        self,
+        chunks: Iterable[bytes],
+        aggregates: Optional[ProductAggregates] = None,
+        progress: Optional[Callable[[int], None]] = None,
+        sink: Optional[Callable[[TransactionColumns], None]] = None,
+        row_filter: Optional[Callable[[TransactionColumns], TransactionColumns]] = None
+    ) -> StreamIngestResult:
+        """
+        Ingest CSV bytes chunk by chunk into per-product aggregates
+        
+        Rows are folded into the aggregates as they are parsed and then
+        dropped, so memory is bounded by the chunk size and the number
+        of products rather than the number of rows. If given, progress
+        is called with the number of rows parsed so far after each chunk,
+        row_filter may drop rows from each parsed batch (e.g. duplicates)
+        before it is used, and sink receives every resulting batch (e.g.
+        to persist it).
+        """
+        if aggregates is None:
+            aggregates = ProductAggregates()
+        
+        parser = CsvStreamParser()
+        started = time.perf_counter()
+        timings = _StageTimings()
         
-        return transactions
+        def fold(batch: TransactionColumns) -> None:
+            timings.parsed()
+            if row_filter is not None:
+                batch = row_filter(batch)
+            aggregates.update(batch)
+            if sink is not None and len(batch):
+                sink(batch)
+            timings.aggregated()
+        
+        for chunk in chunks:
+            timings.start()
+            fold(parser.feed(chunk))
+            if progress is not None:
+                progress(parser.rows_parsed)
+        timings.start()
+        fold(parser.close())
+        if progress is not None:
+            progress(parser.rows_parsed)
+        
+        result = StreamIngestResult(
+            aggregates=aggregates,
+            rows_processed=parser.rows_parsed,
+            products_identified=len(parser.product_ids),
+            reject_report=parser.reject_report,
+            elapsed_seconds=time.perf_counter() - started,
+            peak_rss_bytes=peak_rss_bytes()
+        )
+        timings.record(result)
+        return result
+    
+    def ingest_csv_buffer(
+        self,
+        buffer,
+        progress: Optional[Callable[[int], None]] = None,
+        sink: Optional[Callable[[TransactionColumns], None]] = None,
+        row_filter: Optional[Callable[[TransactionColumns], TransactionColumns]] = None
+    ) -> StreamIngestResult:
+        """
+        Ingest CSV data that is already in memory or memory-mapped
+        
+        buffer may be bytes, bytearray, memoryview or mmap. Records are
+        parsed from zero-copy views of it, so no copy of the data is
+        made beyond decoding one window at a time. progress, sink and
+        row_filter are as for ingest_csv_stream.
+        """
+        aggregates = ProductAggregates()
+        parser = CsvStreamParser()
+        started = time.perf_counter()
+        timings = _StageTimings()
+        
+        for records in record_windows(buffer):
+            timings.start()
+            batch = parser.feed_records(records)
+            timings.parsed()
+            if row_filter is not None:
+                batch = row_filter(batch)
+            aggregates.update(batch)
+            if sink is not None and len(batch):
+                sink(batch)
+            timings.aggregated()
+            if progress is not None:
+                progress(parser.rows_parsed)
+        
+        result = StreamIngestResult(
+            aggregates=aggregates,
+            rows_processed=parser.rows_parsed,
+            products_identified=len(parser.product_ids),
+            reject_report=parser.reject_report,
+            elapsed_seconds=time.perf_counter() - started,
+            peak_rss_bytes=peak_rss_bytes()
+        )
+        timings.record(result)
+        return result
+    
+    def ingest_csv_file(
+        self,
+        file_path: str,
+        workers: Optional[int] = None,
+        keep_history: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> StreamIngestResult:
+        """
+        Ingest a CSV file on disk into per-product aggregates
+        
+        Files of at least INGEST_PARALLEL_MIN_BYTES are split into byte
+        ranges parsed by a pool of `workers` processes (default
+        INGEST_PARALLEL_WORKERS); the result is the same as a serial parse.
+        With keep_history, the parsed rows are returned as result.history.
+        """
+        workers = workers or settings.INGEST_PARALLEL_WORKERS or os.cpu_count() or 1
+        started = time.perf_counter()
+        
+        if workers > 1 and os.path.getsize(file_path) >= settings.INGEST_PARALLEL_MIN_BYTES:
+            parsed = parse_csv_file_parallel(file_path, workers, keep_history, progress)
+            result = StreamIngestResult(
+                aggregates=parsed.aggregates,
+                rows_processed=parsed.rows_parsed,
+                products_identified=len(parsed.product_ids),
+                reject_report=parsed.reject_report,
+                elapsed_seconds=time.perf_counter() - started,
+                peak_rss_bytes=peak_rss_bytes(),  # This process only, not the workers
+                history=parsed.history
+            )
+            # Workers parse and aggregate their shards together
+            _StageTimings(parse=result.elapsed_seconds).record(result)
+            return result
+        
+        history = TransactionHistory() if keep_history else None
+        with mapped_file(file_path) as buffer:
+            result = self.ingest_csv_buffer(
+                buffer,
+                progress=progress,
+                sink=history.append if history is not None else None
+            )
+        result.history = history
+        return result
     
     def calculate_product_inventory(
         self, 
@@ -84,15 +332,13 @@ class DataService:
                     'total_sold': 0,
                     'last_sale_date': transaction.transaction_date,
                     'first_sale_date': transaction.transaction_date,
-                    'total_revenue': 0.0,
-                    'sale_dates': []
+                    'total_revenue': 0.0
                 }
             
             product_data[product_id]['total_sold'] += transaction.quantity
             product_data[product_id]['total_revenue'] += (
                 transaction.quantity * transaction.unit_price
             )
-            product_data[product_id]['sale_dates'].append(transaction.transaction_date)
             
             if transaction.transaction_date > product_data[product_id]['last_sale_date']:
                 product_data[product_id]['last_sale_date'] = transaction.transaction_date
@@ -132,6 +378,76 @@ class DataService:
         
         return inventory_dict
     
+    def inventory_from_summary(
+        self,
+        summary: ProductSummary,
+        initial_inventory: Optional[Dict[str, int]] = None,
+        average_daily_sales: Optional[np.ndarray] = None,
+        daily_sales_std: Optional[np.ndarray] = None,
+        current_stock: Optional[np.ndarray] = None,
+        unit_cost: Optional[np.ndarray] = None
+    ) -> Dict[str, ProductInventory]:
+        """Derive inventory metrics from per-product sales totals"""
+        return self.inventory_table_from_summary(
+            summary, initial_inventory, average_daily_sales, daily_sales_std, current_stock, unit_cost
+        ).to_inventory()
+    
+    def inventory_table_from_summary(
+        self,
+        summary: ProductSummary,
+        initial_inventory: Optional[Dict[str, int]] = None,
+        average_daily_sales: Optional[np.ndarray] = None,
+        daily_sales_std: Optional[np.ndarray] = None,
+        current_stock: Optional[np.ndarray] = None,
+        unit_cost: Optional[np.ndarray] = None
+    ) -> InventoryTable:
+        """
+        Derive columnar inventory metrics from per-product sales totals
+        
+        Average daily sales default to each product's whole sales span;
+        pass them to use another basis, e.g. a recent window. Standard
+        deviations of daily sales, when given, are kept for safety stock.
+        Known current stock (negative where unknown) replaces the estimate
+        from initial_inventory, and unit costs default to 0.0 (unknown).
+        """
+        if average_daily_sales is None:
+            days_span = (
+                (summary.last_sale_date - summary.first_sale_date) // np.timedelta64(1, 'D')
+            ) + 1
+            days_span = np.maximum(days_span, 1)  # Avoid division by zero
+            average_daily_sales = summary.total_sold / days_span
+        
+        if initial_inventory:
+            initial_stock = np.array(
+                [initial_inventory.get(product_id, 0) for product_id in summary.product_ids],
+                dtype=np.int64
+            )
+        else:
+            initial_stock = np.zeros(len(summary), dtype=np.int64)
+        estimated_stock = np.maximum(0, initial_stock - summary.total_sold)
+        if current_stock is not None:
+            estimated_stock = np.where(current_stock >= 0, current_stock, estimated_stock)
+        if unit_cost is None:
+            unit_cost = np.zeros(len(summary), dtype=np.float64)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_remaining = np.where(
+                average_daily_sales > 0,
+                estimated_stock / average_daily_sales,
+                np.nan
+            )
+        
+        return InventoryTable(
+            product_ids=summary.product_ids,
+            product_names=summary.product_names,
+            current_stock=estimated_stock,
+            unit_cost=unit_cost,
+            last_sale_date=summary.last_sale_date,
+            average_daily_sales=average_daily_sales,
+            days_of_stock_remaining=days_remaining,
+            daily_sales_std=daily_sales_std
+        )
+    
     def save_transactions(self, transactions: List[Transaction], filename: str = None):
         """Save transactions to a CSV file"""
         if filename is None:
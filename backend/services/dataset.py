@@ -0,0 +1,570 @@
+"""
+Shared transaction dataset backing the API
+"""
+
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.models import ProductInventory
+from services.aggregates import ProductAggregates
+from services.columnar import InventoryTable, StockColumns
+from services.data_service import DataService, StreamIngestResult, mapped_file
+from services.dedup import TransactionIdIndex, UploadDeduplicator, fingerprint_ids
+from services.history import TransactionHistory
+from services.metrics import metrics
+from services.snapshot import Snapshot, SnapshotError, load_snapshot, save_snapshot
+from services.stock import StockLevels
+from services.storage import StoreState, TransactionStore
+
+# Approximate sizes of one ProductInventory model in the inventory dict,
+# and of one row of the columnar InventoryTable
+_INVENTORY_ENTRY_BYTES = 1300
+_TABLE_ROW_BYTES = 150
+
+
+class DataVersion(NamedTuple):
+    """A dataset version and the epoch its numbering belongs to"""
+    epoch: str
+    number: int
+
+
+def _new_epoch() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+class Dataset:
+    """
+    Per-product aggregates and derived inventory for all ingested data
+
+    Uploads are folded into the aggregates incrementally. The columnar
+    inventory table is rebuilt once per version; the dict of inventory
+    models used by the python engine is only built when first read, and
+    then only for products changed since it was last read.
+    
+    Writers and readers that need a consistent view hold `lock`; an
+    upload is parsed outside the lock and merged in afterwards.
+
+    With a transaction store attached, uploads are also written to the
+    store, the in-memory state is rebuilt from it on startup, and writes
+    committed by other processes are picked up by sync(). The version
+    then follows the store's version, so it means the same data in
+    every process sharing the store.
+
+    With history retention enabled, every transaction is also kept in a
+    compact TransactionHistory for analyses that need individual rows.
+
+    With deduplication enabled, a TransactionIdIndex of every ingested
+    transaction_id is kept and rows whose id was already ingested are
+    skipped, so overlapping uploads can be appended safely. With a
+    shared store, ids are checked again against the stored rows when an
+    upload is committed, so rows another process committed while it was
+    being parsed are skipped too.
+
+    Imported stock levels give products their current stock (the count
+    less units sold after it was taken) and unit cost. They are kept in
+    memory and in snapshots and, with a store attached, in the store,
+    where they survive replacing the transactions and are picked up by
+    other processes like their writes.
+
+    Version numbers are only comparable within an epoch. A new dataset,
+    or one restored from a snapshot (which brings back the snapshot's
+    version), starts a new epoch; a dataset backed by a store takes the
+    store's, so its versions name the same data in every process.
+    """
+
+    def __init__(
+        self,
+        data_service: Optional[DataService] = None,
+        retain_history: Optional[bool] = None,
+        deduplicate: Optional[bool] = None
+    ):
+        self.data_service = data_service or DataService()
+        self.aggregates = ProductAggregates()
+        if retain_history is None:
+            retain_history = settings.HISTORY_RETAIN
+        self.history: Optional[TransactionHistory] = TransactionHistory() if retain_history else None
+        if deduplicate is None:
+            deduplicate = settings.DEDUP_TRANSACTIONS
+        self.transaction_ids: Optional[TransactionIdIndex] = TransactionIdIndex() if deduplicate else None
+        self.initial_inventory: Optional[Dict[str, int]] = None
+        self.stock = StockLevels()
+        self.version = 0
+        self.epoch = _new_epoch()
+        self.store: Optional[TransactionStore] = None
+        self._store_state: Optional[StoreState] = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._table: Optional[InventoryTable] = None
+        self._table_version = -1
+        self._inventory: Dict[str, ProductInventory] = {}
+        self._stale_slots: List[np.ndarray] = []
+        self._window_end: Optional[int] = None
+        self.lock = threading.RLock()
+
+    def __bool__(self) -> bool:
+        return len(self.aggregates) > 0
+
+    def __len__(self) -> int:
+        """Number of products"""
+        return len(self.aggregates)
+
+    @property
+    def data_version(self) -> DataVersion:
+        return DataVersion(self.epoch, self.version)
+
+    @property
+    def inventory(self) -> Dict[str, ProductInventory]:
+        """Inventory models by product_id, brought up to date on access"""
+        with self.lock:
+            if self._stale_slots:
+                stale = np.unique(np.concatenate(self._stale_slots))
+                self._stale_slots = []
+                with metrics.stage('inventory') as stage:
+                    self._inventory.update(self.data_service.inventory_from_summary(
+                        self.aggregates.summary(stale),
+                        self.initial_inventory,
+                        self._average_daily_sales(stale),
+                        self._daily_sales_std(stale),
+                        *self._stock_columns(stale)
+                    ))
+                    stage.rows = len(stale)
+            return self._inventory
+
+    def ingest_csv_stream(
+        self,
+        chunks: Iterable[bytes],
+        replace: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> StreamIngestResult:
+        """
+        Ingest an upload into the dataset
+
+        By default the upload is treated as a delta and added to the
+        existing history; with replace=True it becomes the whole dataset.
+        """
+        return self._ingest(
+            lambda sink, row_filter: self.data_service.ingest_csv_stream(
+                chunks, progress=progress, sink=sink, row_filter=row_filter
+            ),
+            replace
+        )
+
+    def ingest_csv_buffer(
+        self,
+        buffer,
+        replace: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> StreamIngestResult:
+        """Ingest CSV data from a bytes-like object or mmap without copying it"""
+        return self._ingest(
+            lambda sink, row_filter: self.data_service.ingest_csv_buffer(
+                buffer, progress=progress, sink=sink, row_filter=row_filter
+            ),
+            replace
+        )
+
+    def ingest_csv_mapped(
+        self,
+        source,
+        replace: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> StreamIngestResult:
+        """Memory-map a file path or open binary file and ingest it in this process"""
+        with mapped_file(source) as buffer:
+            return self.ingest_csv_buffer(buffer, replace, progress)
+
+    def ingest_csv_file(
+        self,
+        path: str,
+        replace: bool = False,
+        progress: Optional[Callable[[int], None]] = None
+    ) -> StreamIngestResult:
+        """
+        Ingest a CSV file on disk, memory-mapped and parsed in parallel if large
+
+        With a store attached or deduplication enabled the file is parsed
+        in this process, since every batch has to pass through the store
+        writer or the transaction id index.
+        """
+        if self.store is not None or self.transaction_ids is not None:
+            return self.ingest_csv_mapped(path, replace, progress)
+
+        result = self.data_service.ingest_csv_file(
+            path, keep_history=self.history is not None, progress=progress
+        )
+        with self.lock:
+            self._apply(result, result.history, replace)
+            if self._refresh_changed() or replace:
+                self.version += 1
+        return result
+
+    def _ingest(
+        self,
+        parse: Callable[[Optional[Callable], Optional[Callable]], StreamIngestResult],
+        replace: bool
+    ) -> StreamIngestResult:
+        """Run parse(sink, row_filter) outside the lock, then merge its result in"""
+        # Rows of this upload, kept apart until it is merged in
+        staged = TransactionHistory() if self.history is not None else None
+        dedup = self._deduplicator(replace)
+
+        try:
+            if self.store is None:
+                result = parse(staged.append if staged is not None else None, dedup)
+                with self.lock:
+                    self._apply(result, staged, replace, dedup)
+                    if self._refresh_changed() or replace:
+                        self.version += 1
+                return result
+
+            with self.store.writer(replace=replace, skip_existing_ids=dedup is not None) as writer:
+                def sink(batch) -> None:
+                    writer.add(batch)
+                    if staged is not None:
+                        staged.append(batch)
+
+                result = parse(sink, dedup)
+                with self.lock:
+                    # No other process can commit between begin() and commit(),
+                    # so after catching up only our own rows are missing
+                    base = writer.begin()
+                    if not replace:
+                        self._catch_up(writer, base)
+                    state = writer.commit()
+                    if writer.rows_skipped:
+                        # Another process stored some of these ids after they
+                        # were checked, so the parsed totals overcount: fold in
+                        # the rows that were committed instead
+                        self._catch_up(writer, state)
+                        result.duplicate_rows = dedup.duplicates + writer.rows_skipped
+                    else:
+                        self._apply(result, staged, replace, dedup)
+                    self._store_state = state
+                    self._refresh(version=state.version)
+            return result
+        except BaseException:
+            if dedup is not None:
+                dedup.rollback()
+            raise
+
+    def _deduplicator(self, replace: bool) -> Optional[UploadDeduplicator]:
+        """Duplicate filter for one upload; a replacing upload starts a fresh index"""
+        if self.transaction_ids is None:
+            return None
+        return UploadDeduplicator(TransactionIdIndex() if replace else self.transaction_ids)
+
+    def _apply(
+        self,
+        result: StreamIngestResult,
+        staged: Optional[TransactionHistory],
+        replace: bool,
+        dedup: Optional[UploadDeduplicator] = None
+    ) -> None:
+        if dedup is not None:
+            result.duplicate_rows = dedup.duplicates
+            if replace:
+                self.transaction_ids = dedup.index
+            elif dedup.index is not self.transaction_ids:
+                # The index was reset while this upload was being parsed
+                self.transaction_ids.add(dedup.fingerprints())
+
+        if replace:
+            # A fresh aggregate store already marks every product as changed
+            self.aggregates = result.aggregates
+            self._inventory = {}
+            self._stale_slots = []
+            if staged is not None:
+                self.history = staged
+        else:
+            self.aggregates.merge(result.aggregates)
+            if staged is not None:
+                self.history.extend(staged)
+
+    def attach_store(self, store: TransactionStore) -> None:
+        """Back the dataset with a store, loading everything already in it"""
+        with self.lock:
+            self.store = store
+            self.epoch = store.epoch()
+            self._store_state = None
+            self.sync()
+
+    def sync(self) -> bool:
+        """Pick up writes committed by other processes; True if anything changed"""
+        if self.store is None:
+            return False
+
+        # Read before taking the lock, so the lock is never held waiting
+        # for a pooled connection. An upload of ours may commit in between;
+        # store versions only increase, so an older target is skipped
+        target = self.store.state()
+        with self.lock:
+            if self._store_state is not None and target.version <= self._store_state.version:
+                return False
+            self._catch_up(self.store, target)
+            self._refresh(version=target.version)
+            return True
+
+    def start_sync(self, interval: Optional[float] = None) -> None:
+        """Poll the store for other processes' writes in a background thread"""
+        if self.store is None or self._sync_thread is not None:
+            return
+        interval = interval or settings.STORAGE_SYNC_INTERVAL_SECONDS
+
+        def poll() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except Exception:
+                    # A locked or briefly unavailable database is retried next round
+                    pass
+
+        self._sync_thread = threading.Thread(target=poll, name="dataset-sync", daemon=True)
+        self._sync_thread.start()
+
+    def _catch_up(self, source, target: StoreState) -> None:
+        """Fold stored rows up to target into the aggregates (lock held)"""
+        current = self._store_state
+        if current is not None and current.generation == target.generation:
+            after = current.last_row_id
+        else:
+            # First load, or the data was replaced elsewhere: rebuild
+            after = 0
+            self._clear()
+
+        for batch in source.read_rows(after, target.last_row_id):
+            self.aggregates.update(batch)
+            if self.history is not None:
+                self.history.append(batch)
+            if self.transaction_ids is not None:
+                self.transaction_ids.add(fingerprint_ids(batch.transaction_ids))
+
+        if current is None or current.stock_version != target.stock_version:
+            self.stock = StockLevels.from_arrays(source.read_stock())
+            self._stale_slots.append(np.arange(len(self.aggregates)))
+        self._store_state = target
+
+    def _refresh(self, version: int) -> None:
+        """Mark changed inventory stale and move to a version set by the store"""
+        self._refresh_changed()
+        self.version = version
+
+    def _refresh_changed(self) -> bool:
+        changed = self.aggregates.pop_changed()
+        window_end = self.aggregates.daily_sales.last_day
+        windowed = settings.SALES_WINDOW_DAYS or settings.SAFETY_STOCK_METHOD == "demand_variance"
+        if windowed and window_end != self._window_end:
+            # The sales window moved, so every product's statistics change
+            changed = np.arange(len(self.aggregates))
+            self._window_end = window_end
+        if len(changed) == 0:
+            return False
+        self._stale_slots.append(changed)
+        return True
+
+    def _average_daily_sales(self, slots: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Windowed averages when SALES_WINDOW_DAYS is set, else None for the default"""
+        window = settings.SALES_WINDOW_DAYS
+        if not window:
+            return None
+        if window in self.aggregates.demand.windows:
+            return self.aggregates.demand.mean(window, slots)
+        return self.aggregates.recent_daily_sales(window, slots)
+
+    def _daily_sales_std(self, slots: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Daily sales variability for demand-variance safety stock, else None"""
+        if settings.SAFETY_STOCK_METHOD != "demand_variance":
+            return None
+        return self.aggregates.demand.std(settings.SAFETY_STOCK_WINDOW_DAYS, slots)
+
+    def _stock_columns(self, slots: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Current stock (-1 if unknown) and unit cost of slots from imported levels"""
+        if len(self.stock) == 0:
+            return None, None
+        rows = self.stock.slot_rows(self.aggregates.product_ids, slots)
+        matched = rows >= 0
+        current_stock = np.full(len(slots), -1, dtype=np.int64)
+        unit_cost = np.zeros(len(slots), dtype=np.float64)
+
+        counted = np.flatnonzero(matched)
+        counted = counted[self.stock.stock_on_hand[rows[counted]] >= 0]
+        if len(counted):
+            counted_rows = rows[counted]
+            sold_since = self.aggregates.daily_sales.sold_after(
+                slots[counted], self.stock.as_of_day[counted_rows]
+            )
+            current_stock[counted] = np.maximum(0, self.stock.stock_on_hand[counted_rows] - sold_since)
+
+        costs = self.stock.unit_cost[rows[matched]]
+        unit_cost[matched] = np.where(np.isnan(costs), 0.0, costs)
+        return current_stock, unit_cost
+
+    def import_stock(self, batch: StockColumns, as_of: Optional[date] = None) -> int:
+        """
+        Merge stock-on-hand and unit cost rows into the stock levels
+
+        Counts hold at the end of the as_of day, by default the newest day
+        with sales (or today). Inventory of the affected products that
+        have sales is marked stale; returns how many there are.
+        """
+        if self.store is not None:
+            return self._import_stored_stock(batch, as_of)
+
+        with self.lock:
+            as_of_day = self._as_of_day(as_of)
+            with metrics.stage('stock') as stage:
+                touched = self.stock.upsert(batch, as_of_day)
+                slot_rows = self.stock.slot_rows(self.aggregates.product_ids, np.arange(len(self.aggregates)))
+                changed = np.flatnonzero(np.isin(slot_rows, touched))
+                stage.rows = len(batch)
+            if len(changed):
+                self._stale_slots.append(changed)
+            self.version += 1
+            return len(changed)
+
+    def _import_stored_stock(self, batch: StockColumns, as_of: Optional[date]) -> int:
+        """Commit an import to the store, then pick it up like another process's write"""
+        with self.lock:
+            as_of_day = self._as_of_day(as_of)
+        with metrics.stage('stock') as stage:
+            # Committed outside the lock, which is never held waiting on the store
+            state = self.store.import_stock(batch, as_of_day)
+            stage.rows = len(batch)
+
+        with self.lock:
+            if self._store_state is None or state.version > self._store_state.version:
+                self._catch_up(self.store, state)
+                self._refresh(version=state.version)
+            touched = self.stock.rows_for(np.unique(batch.product_ids))
+            slot_rows = self.stock.slot_rows(self.aggregates.product_ids, np.arange(len(self.aggregates)))
+            return int(np.count_nonzero(np.isin(slot_rows, touched[touched >= 0])))
+
+    def _as_of_day(self, as_of: Optional[date]) -> int:
+        """Day a stock count holds at: as_of, else the newest day with sales, else today"""
+        if as_of is not None:
+            return int(np.datetime64(as_of, 'D').view(np.int64))
+        if self.aggregates.daily_sales.last_day is not None:
+            return self.aggregates.daily_sales.last_day
+        return int(np.datetime64(date.today(), 'D').view(np.int64))
+
+    def inventory_table(self) -> InventoryTable:
+        """Columnar inventory for the current version"""
+        with self.lock:
+            if self._table_version != self.version:
+                self._table = self.data_service.inventory_table_from_summary(
+                    self.aggregates.summary(),
+                    self.initial_inventory,
+                    self._average_daily_sales(),
+                    self._daily_sales_std(),
+                    *self._stock_columns(np.arange(len(self.aggregates)))
+                )
+                self._table_version = self.version
+            return self._table
+    
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the aggregates, inventory and history"""
+        with self.lock:
+            total = self.aggregates.memory_bytes() + _INVENTORY_ENTRY_BYTES * len(self._inventory)
+            if self._table is not None:
+                total += _TABLE_ROW_BYTES * len(self._table)
+            if self.history is not None:
+                total += self.history.memory_bytes()
+            if self.transaction_ids is not None:
+                total += self.transaction_ids.memory_bytes()
+            return total + self.stock.memory_bytes()
+
+    def save_snapshot(self, path: Optional[str] = None, compress: Optional[bool] = None) -> Dict:
+        """
+        Write aggregates, inventory and any retained history to a snapshot
+
+        Holds the lock while writing, so uploads merge after it finishes.
+        Returns the snapshot manifest.
+        """
+        with self.lock:
+            return save_snapshot(
+                path or settings.SNAPSHOT_PATH,
+                self.aggregates,
+                self.inventory_table(),
+                self.history,
+                self.version,
+                compress,
+                self.transaction_ids,
+                self.stock if len(self.stock) else None
+            )
+
+    def load_snapshot(self, path: Optional[str] = None) -> Snapshot:
+        """
+        Replace all in-memory data with a snapshot
+
+        Not available with a transaction store attached, since the store
+        is then the source of truth. With history retention enabled the
+        snapshot must include the transaction history. With deduplication
+        enabled, a snapshot without a transaction id index has one built
+        from its history, if it has one.
+        """
+        if self.store is not None:
+            raise SnapshotError("Snapshots cannot be loaded while a transaction store is attached")
+
+        snapshot = load_snapshot(path or settings.SNAPSHOT_PATH, with_history=self.history is not None)
+        if self.history is not None and snapshot.history is None:
+            raise SnapshotError("Snapshot has no transaction history to retain")
+        transaction_ids = None
+        if self.transaction_ids is not None:
+            transaction_ids = snapshot.transaction_ids
+            if transaction_ids is None:
+                if snapshot.history is None:
+                    raise SnapshotError("Snapshot has no transaction id index to deduplicate against")
+                transaction_ids = TransactionIdIndex()
+                transaction_ids.add(fingerprint_ids(snapshot.history.to_columns().transaction_ids))
+
+        with self.lock:
+            self._clear()
+            self.aggregates = snapshot.aggregates
+            if snapshot.history is not None:
+                self.history = snapshot.history
+            if transaction_ids is not None:
+                self.transaction_ids = transaction_ids
+            self.stock = snapshot.stock if snapshot.stock is not None else StockLevels()
+            self._refresh_changed()
+            # Versions after the snapshot's may already have named other data
+            self.epoch = _new_epoch()
+            self.version = snapshot.version
+        return snapshot
+
+    def reset(self) -> None:
+        """Drop all ingested data, including any stored transactions"""
+        if self.store is not None:
+            with self.store.writer(replace=True) as writer:
+                with self.lock:
+                    writer.begin()
+                    writer.clear_stock()
+                    state = writer.commit()
+                    self._clear()
+                    self.stock = StockLevels()
+                    self._store_state = state
+                    self.version = state.version
+            return
+
+        with self.lock:
+            self._clear()
+            self.stock = StockLevels()
+            self.version += 1
+
+    def _clear(self) -> None:
+        """Drop the transactions and what is derived from them; imported stock is kept"""
+        self.aggregates = ProductAggregates()
+        self._inventory = {}
+        self._stale_slots = []
+        self._window_end = None
+        if self.history is not None:
+            self.history = TransactionHistory()
+        if self.transaction_ids is not None:
+            self.transaction_ids = TransactionIdIndex()
+
+
+dataset = Dataset()
@@ -0,0 +1,321 @@
+"""
+Memoization of decision analyses per dataset version
+"""
+
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Hashable, Optional, Sequence, Tuple, TypeVar
+
+from core.config import settings
+from core.models import (
+    DecisionInsight,
+    InventoryRisk,
+    ReorderRecommendation,
+    RiskLevel,
+    SlowMovingProduct,
+)
+from services.dataset import Dataset, DataVersion
+from services.decision_changes import InsightDiff, InsightHistory, InsightKeys, diff_insights
+from services.decision_index import ResultIndex, build_index
+from services.decision_service import DecisionService
+from services.metrics import metrics
+from services.vectorized_decisions import VectorizedDecisionEngine
+
+
+T = TypeVar('T')
+
+
+class _VersionMoved(Exception):
+    """The dataset version changed between taking a cache key and locking"""
+
+
+class DecisionCache:
+    """
+    LRU cache with per-entry time-to-live
+
+    Keys include the dataset version, so ingesting new data makes old
+    entries unreachable; they age out through LRU/TTL eviction.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.DECISION_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.DECISION_CACHE_TTL_SECONDS
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """Return the cached value for key, computing and storing it on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_requests.inc(result='hit')
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+        metrics.cache_requests.inc(result='miss')
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        return value
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def count_by_level(rows: Sequence, attribute: str) -> Dict[RiskLevel, int]:
+    """Count result rows per risk level without materializing lazy rows"""
+    if hasattr(rows, 'count_by_level'):
+        return rows.count_by_level()
+
+    counts = {level: 0 for level in RiskLevel}
+    for row in rows:
+        counts[getattr(row, attribute)] += 1
+    return counts
+
+
+class DecisionPipeline:
+    """
+    Decision analyses over a dataset, computed at most once per version
+
+    Results are keyed by the dataset version and the decision settings,
+    so they are served from memory until new data is ingested, the
+    settings change or the entry expires. Cached sequences are shared
+    between requests and must not be mutated.
+
+    With the vectorized engine, results are lazy sequences over the
+    columnar inventory; the Python engine returns plain lists.
+
+    Each indexing of a version's insights is also recorded in an
+    InsightHistory, so changes since a recent version can be listed.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        decision_service: DecisionService,
+        cache: Optional[DecisionCache] = None,
+        engine: Optional[VectorizedDecisionEngine] = None
+    ):
+        self.dataset = dataset
+        self.decision_service = decision_service
+        self.cache = cache or DecisionCache()
+        if engine is None and settings.DECISION_ENGINE == "vectorized":
+            engine = VectorizedDecisionEngine()
+        self.engine = engine
+        self.insight_history = InsightHistory()
+        # Keys of each live insights index, so diffs use that index's row positions
+        self._index_keys: "weakref.WeakKeyDictionary[ResultIndex, InsightKeys]" = weakref.WeakKeyDictionary()
+
+    def _key(self, analysis: str, version: Optional[DataVersion] = None) -> Tuple:
+        service = self.engine or self.decision_service
+        return (
+            analysis,
+            self.dataset.data_version if version is None else version,
+            service.slow_moving_threshold,
+            service.low_stock_threshold,
+            service.reorder_lead_time,
+        )
+
+    def _cached(self, analysis: str, compute: Callable[[], T]) -> T:
+        return self._versioned(analysis, compute)[1]
+
+    def _versioned(self, analysis: str, compute: Callable[[], T]) -> Tuple[DataVersion, T]:
+        """
+        Serve an analysis from the cache with the data version it is from
+
+        Hits do not lock. On a miss the key is checked again under the
+        dataset lock, so a value is only stored under the version it was
+        computed from; if an ingest got in between, the lookup restarts.
+        """
+        while True:
+            key = self._key(analysis)
+
+            def locked_compute() -> T:
+                with self.dataset.lock:
+                    if self._key(analysis) != key:
+                        raise _VersionMoved
+                    return compute()
+
+            try:
+                return key[1], self.cache.get_or_compute(key, locked_compute)
+            except _VersionMoved:
+                continue
+
+    def inventory_risks(self) -> Sequence[InventoryRisk]:
+        return self._cached('inventory_risks', self._compute_risks)
+
+    def slow_movers(self) -> Sequence[SlowMovingProduct]:
+        return self._cached('slow_movers', self._compute_slow_movers)
+
+    def reorder_recommendations(self) -> Sequence[ReorderRecommendation]:
+        return self._cached('reorder_recommendations', self._compute_reorders)
+
+    def insights(self) -> Sequence[DecisionInsight]:
+        return self._cached('insights', self._compute_insights)
+
+    def summary(self) -> Dict[str, Any]:
+        return self._cached('summary', self._build_summary)
+
+    def versioned_summary(self) -> Tuple[DataVersion, Dict[str, Any]]:
+        """The summary and the data version it was computed from"""
+        return self._versioned('summary', self._build_summary)
+
+    def index(self, analysis: str) -> ResultIndex:
+        """Filter/pagination index over one analysis's results"""
+        return self.versioned_index(analysis)[1]
+
+    def versioned_index(self, analysis: str) -> Tuple[DataVersion, ResultIndex]:
+        """An analysis's index and the data version it was built from"""
+        return self._versioned(f'{analysis}:index', lambda: self._build_index(analysis))
+
+    def etag(self, analysis: str, query: str = '', version: Optional[DataVersion] = None) -> str:
+        """
+        Weak entity tag for responses built from an analysis (or the summary)
+
+        Derived from the data version and its epoch, the decision settings
+        and the request's query only, so every worker names the same
+        response alike however often it was recomputed. Today's date is
+        included because slow movers age without new data; a client's copy
+        may lag their ages by at most a day. version defaults to the current one.
+        """
+        key = self._key(analysis, version) + (query,)
+        digest = zlib.crc32(repr(key).encode())
+        epoch, number = key[1]
+        return f'W/"{epoch}-{number}-{date.today():%Y%m%d}-{digest:08x}"'
+
+    def changes(self, since_version: int) -> Tuple[DataVersion, ResultIndex, InsightKeys, InsightDiff, bool]:
+        """
+        Insights added, changed or removed since an earlier data version
+
+        Returns the current version, its insights index, the earlier
+        version's keys, the diff and whether it is a full resync: when
+        the earlier version's insights are no longer (or were never)
+        recorded, as for version 0, every current insight is added. since_version
+        is a version number of the current epoch.
+        """
+        with self.dataset.lock:
+            version = self.dataset.data_version
+            index = self.index('insights')
+            current = self._index_keys.get(index)
+            if current is None:
+                current = InsightKeys.from_index(index)
+                self._index_keys[index] = current
+        if since_version == version.number:
+            previous = current
+        else:
+            previous = self.insight_history.get(DataVersion(version.epoch, since_version))
+        full_resync = previous is None
+        if full_resync:
+            previous = InsightKeys.empty()
+        return version, index, previous, diff_insights(previous, current), full_resync
+
+    def _build_index(self, analysis: str) -> ResultIndex:
+        index = build_index(analysis, getattr(self, analysis)())
+        if analysis == 'insights':
+            keys = self.insight_history.record(self.dataset.data_version, index)
+            if keys is not None:
+                self._index_keys[index] = keys
+        return index
+
+    # Inputs from other analyses are fetched before a stage's timer starts,
+    # so each stage's metrics cover only its own work
+
+    def _compute_risks(self):
+        table = self.dataset.inventory_table() if self.engine else None
+        with metrics.stage('risks') as stage:
+            if self.engine:
+                risks = self.engine.identify_inventory_risks(table)
+            else:
+                risks = self.decision_service.identify_inventory_risks(self.dataset.inventory)
+            stage.rows = len(risks)
+        return risks
+
+    def _compute_slow_movers(self):
+        table = self.dataset.inventory_table() if self.engine else None
+        with metrics.stage('slow_movers') as stage:
+            if self.engine:
+                slow_movers = self.engine.identify_slow_moving_products(table)
+            else:
+                slow_movers = self.decision_service.identify_slow_moving_products(self.dataset.inventory)
+            stage.rows = len(slow_movers)
+        return slow_movers
+
+    def _compute_reorders(self):
+        table = self.dataset.inventory_table() if self.engine else None
+        risks = self.inventory_risks()
+        with metrics.stage('reorders') as stage:
+            if self.engine:
+                reorders = self.engine.generate_reorder_recommendations(table, risks)
+            else:
+                reorders = self.decision_service.generate_reorder_recommendations(self.dataset.inventory, risks)
+            stage.rows = len(reorders)
+        return reorders
+
+    def _compute_insights(self):
+        risks, slow_movers, reorders = self.inventory_risks(), self.slow_movers(), self.reorder_recommendations()
+        with metrics.stage('insights') as stage:
+            if self.engine:
+                insights = self.engine.generate_decision_insights(risks, slow_movers, reorders)
+            else:
+                insights = self.decision_service.generate_decision_insights(
+                    self.dataset.inventory, risks, slow_movers, reorders
+                )
+            stage.rows = len(insights)
+        return insights
+
+    def _build_summary(self) -> Dict[str, Any]:
+        risks = self.inventory_risks()
+        risk_counts = count_by_level(risks, 'risk_level')
+
+        return {
+            "inventory_risks": {
+                "total": len(risks),
+                "critical": risk_counts[RiskLevel.CRITICAL],
+                "high": risk_counts[RiskLevel.HIGH],
+                "medium": risk_counts[RiskLevel.MEDIUM],
+                "low": risk_counts[RiskLevel.LOW]
+            },
+            "slow_moving_products": len(self.slow_movers()),
+            "reorder_recommendations": len(self.reorder_recommendations()),
+            "total_products": len(self.dataset)
+        }
@@ -0,0 +1,143 @@
+"""
+Changes in decision insights between data versions
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from core.config import settings
+from core.models import DecisionType
+from services.dataset import DataVersion
+from services.decision_index import ResultIndex
+from services.dedup import fingerprint_ids
+from services.vectorized_decisions import DECISION_TYPE_CODES
+
+
+_REORDER = DECISION_TYPE_CODES[DecisionType.REORDER]
+
+
+@dataclass
+class InsightKeys:
+    """
+    One version's insights as sorted keys with their priorities
+
+    A product has at most one risk insight (decision type reorder) and
+    one slow-mover insight, so the key is the product id's 64-bit
+    fingerprint with its low bit replaced by which of the two it is. A
+    slow mover moving from review to discontinue is then a change, not
+    a removal and an addition.
+    """
+    keys: np.ndarray            # uint64, sorted
+    positions: np.ndarray       # int64 row of each key in the version's results
+    priorities: np.ndarray      # int8
+    decision_types: np.ndarray  # int8
+    product_ids: np.ndarray     # str, in key order
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_index(cls, index: ResultIndex) -> 'InsightKeys':
+        product_ids = index.product_ids()
+        slow_mover = (index.decision_types != _REORDER).astype(np.uint64)
+        keys = (fingerprint_ids(product_ids) & ~np.uint64(1)) | slow_mover
+        order = np.argsort(keys, kind='stable')
+        return cls(
+            keys=keys[order],
+            positions=order,
+            priorities=index.priorities[order],
+            decision_types=index.decision_types[order],
+            product_ids=product_ids[order]
+        )
+
+    @classmethod
+    def empty(cls) -> 'InsightKeys':
+        """Keys of no insights, for diffing everything as added"""
+        return cls(
+            keys=np.empty(0, dtype=np.uint64),
+            positions=np.empty(0, dtype=np.int64),
+            priorities=np.empty(0, dtype=np.int8),
+            decision_types=np.empty(0, dtype=np.int8),
+            product_ids=np.empty(0, dtype=str)
+        )
+
+    def memory_bytes(self) -> int:
+        return (
+            self.keys.nbytes + self.positions.nbytes + self.priorities.nbytes
+            + self.decision_types.nbytes + self.product_ids.nbytes
+        )
+
+
+@dataclass
+class InsightDiff:
+    """Rows added, changed and removed between two versions' insights"""
+    added: np.ndarray      # positions in the current results, in priority order
+    changed: np.ndarray    # positions in the current results, in priority order
+    changed_from: np.ndarray  # matching entries of the previous keys
+    removed: np.ndarray    # entries of the previous keys
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.changed) + len(self.removed)
+
+
+def diff_insights(previous: InsightKeys, current: InsightKeys) -> InsightDiff:
+    """Compare two versions' insights by key, in one sorted intersection"""
+    _, previous_common, current_common = np.intersect1d(
+        previous.keys, current.keys, assume_unique=True, return_indices=True
+    )
+    differs = (
+        (previous.priorities[previous_common] != current.priorities[current_common])
+        | (previous.decision_types[previous_common] != current.decision_types[current_common])
+    )
+
+    added = np.ones(len(current), dtype=bool)
+    added[current_common] = False
+    removed = np.ones(len(previous), dtype=bool)
+    removed[previous_common] = False
+
+    changed_positions = current.positions[current_common[differs]]
+    order = np.argsort(changed_positions, kind='stable')
+    return InsightDiff(
+        added=np.sort(current.positions[added]),
+        changed=changed_positions[order],
+        changed_from=previous_common[differs][order],
+        removed=np.flatnonzero(removed)
+    )
+
+
+class InsightHistory:
+    """
+    Insight keys of the most recent data versions
+
+    Recorded whenever a version's insights are indexed, keeping the last
+    max_versions, so clients can ask what changed since the version of
+    their last full fetch.
+    """
+
+    def __init__(self, max_versions: Optional[int] = None):
+        self.max_versions = max_versions if max_versions is not None else settings.DECISION_CHANGES_VERSIONS
+        self._versions: "OrderedDict[DataVersion, InsightKeys]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, version: DataVersion, index: ResultIndex) -> Optional[InsightKeys]:
+        if not self.max_versions:
+            return None
+        keys = InsightKeys.from_index(index)
+        with self._lock:
+            self._versions[version] = keys
+            self._versions.move_to_end(version)
+            while len(self._versions) > self.max_versions:
+                self._versions.popitem(last=False)
+        return keys
+
+    def get(self, version: DataVersion) -> Optional[InsightKeys]:
+        with self._lock:
+            return self._versions.get(version)
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(keys.memory_bytes() for keys in self._versions.values())
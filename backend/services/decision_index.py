@@ -0,0 +1,233 @@
+"""
+Filtering and cursor pagination over priority-ordered decision results
+"""
+
+import base64
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from core.models import DecisionType, RiskLevel
+from services.dataset import DataVersion
+from services.decision_service import RISK_PRIORITY
+from services.metrics import metrics
+from services.serialization import JsonRows
+from services.vectorized_decisions import DECISION_TYPE_CODES, slow_mover_priorities
+
+
+@dataclass
+class ResultFilter:
+    """Row filters shared by the decision endpoints"""
+    priority: Optional[RiskLevel] = None
+    decision_type: Optional[DecisionType] = None
+    product_id_prefix: Optional[str] = None
+
+
+@dataclass
+class ResultPage:
+    """One page of a filtered result sequence"""
+    items: list
+    total: int
+    next_offset: Optional[int] = None
+
+
+@dataclass
+class JsonPage:
+    """One page of a filtered result sequence, as an encoded JSON array"""
+    body: bytes
+    total: int
+    next_offset: Optional[int] = None
+
+
+@dataclass
+class JsonStream:
+    """Rows of a filtered result sequence, encoded one by one as they are consumed"""
+    rows: Iterator[bytes]
+    total: int
+    next_offset: Optional[int] = None
+
+
+class ResultIndex:
+    """
+    Index over one result sequence, which is already in priority order
+
+    Holds each row's priority, decision type and product id as arrays,
+    plus the product ids in sorted order so a prefix filter becomes a
+    binary-search range. Pages are slices of the matching positions, so
+    only the rows on the requested page are materialized.
+    """
+
+    def __init__(
+        self,
+        rows: Sequence,
+        priorities: np.ndarray,
+        decision_types: np.ndarray,
+        product_ids: List[str]
+    ):
+        self.rows = rows
+        self.priorities = priorities
+        self.decision_types = decision_types
+        self._sorted_ids = np.array(product_ids, dtype=str)
+        self._id_order = np.argsort(self._sorted_ids, kind='stable')
+        self._sorted_ids = self._sorted_ids[self._id_order]
+        self._json: Optional[JsonRows] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def product_ids(self) -> np.ndarray:
+        """Each row's product id, in result order"""
+        product_ids = np.empty_like(self._sorted_ids)
+        product_ids[self._id_order] = self._sorted_ids
+        return product_ids
+
+    def encoded_rows(self, positions: Iterable[int]) -> Iterator[bytes]:
+        """Encoded rows at positions, sharing the per-row encodings used by page_json"""
+        return self._json_rows().iter_rows(positions)
+
+    def select(self, result_filter: ResultFilter) -> Optional[np.ndarray]:
+        """Positions matching the filter in result order, or None for all rows"""
+        mask = None
+
+        if result_filter.priority is not None:
+            mask = self.priorities == RISK_PRIORITY[result_filter.priority]
+
+        if result_filter.decision_type is not None:
+            type_mask = self.decision_types == DECISION_TYPE_CODES[result_filter.decision_type]
+            mask = type_mask if mask is None else mask & type_mask
+
+        if result_filter.product_id_prefix:
+            prefix = result_filter.product_id_prefix
+            start, end = np.searchsorted(self._sorted_ids, [prefix, prefix + '\U0010ffff'])
+            prefix_mask = np.zeros(len(self), dtype=bool)
+            prefix_mask[self._id_order[start:end]] = True
+            mask = prefix_mask if mask is None else mask & prefix_mask
+
+        return None if mask is None else np.flatnonzero(mask)
+
+    def count_by_level(self, result_filter: ResultFilter) -> Dict[RiskLevel, int]:
+        """Number of matching rows at each priority"""
+        positions = self.select(result_filter)
+        priorities = self.priorities if positions is None else self.priorities[positions]
+        counts = np.bincount(priorities, minlength=len(RISK_PRIORITY))
+        return {level: int(counts[code]) for level, code in RISK_PRIORITY.items()}
+
+    def page(
+        self,
+        result_filter: ResultFilter,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> ResultPage:
+        """Materialize one page of the rows matching the filter"""
+        positions, total, next_offset = self._page_positions(result_filter, offset, limit)
+        if isinstance(positions, range):
+            items = self.rows[positions.start:positions.stop]
+        else:
+            items = [self.rows[position] for position in positions]
+
+        return ResultPage(items=list(items), total=total, next_offset=next_offset)
+
+    def page_json(
+        self,
+        result_filter: ResultFilter,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> JsonPage:
+        """
+        One page of the rows matching the filter, encoded as JSON
+
+        Each row is serialized the first time any page includes it and
+        reused afterwards, so repeated requests only join bytes.
+        """
+        positions, total, next_offset = self._page_positions(result_filter, offset, limit)
+        with metrics.stage('serialize') as stage:
+            body = self._json_rows().array(positions)
+            stage.rows = len(positions)
+        return JsonPage(body=body, total=total, next_offset=next_offset)
+
+    def stream_json(
+        self,
+        result_filter: ResultFilter,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> JsonStream:
+        """
+        The rows matching the filter as a lazy sequence of encoded rows
+
+        Rows are materialized and encoded only as the stream is consumed,
+        sharing the per-row encodings used by page_json.
+        """
+        positions, total, next_offset = self._page_positions(result_filter, offset, limit)
+        return JsonStream(rows=self._json_rows().iter_rows(positions), total=total, next_offset=next_offset)
+
+    def _json_rows(self) -> JsonRows:
+        if self._json is None:
+            self._json = JsonRows(self.rows)
+        return self._json
+
+    def _page_positions(self, result_filter: ResultFilter, offset: int, limit: Optional[int]):
+        """Row positions on a page, the number of matches, and the next offset"""
+        positions = self.select(result_filter)
+        total = len(self) if positions is None else len(positions)
+
+        end = total if limit is None else min(offset + limit, total)
+        page = range(offset, max(offset, end)) if positions is None else positions[offset:end].tolist()
+        return page, total, end if end < total else None
+
+
+def build_index(analysis: str, rows: Sequence) -> ResultIndex:
+    """
+    Index a result sequence produced by either decision engine
+
+    Lazy result rows provide their index columns directly; plain lists
+    of models are scanned once.
+    """
+    if hasattr(rows, 'index_columns'):
+        return ResultIndex(rows, *rows.index_columns())
+
+    reorder = DECISION_TYPE_CODES[DecisionType.REORDER]
+    if analysis == 'slow_movers':
+        priorities, decision_types = slow_mover_priorities(
+            np.array([row.days_since_last_sale for row in rows], dtype=np.int64)
+        )
+    elif analysis == 'insights':
+        priorities = np.array([RISK_PRIORITY[row.priority] for row in rows], dtype=np.int8)
+        decision_types = np.array(
+            [DECISION_TYPE_CODES[row.decision_type] for row in rows], dtype=np.int8
+        )
+    else:
+        level_attribute = 'urgency' if analysis == 'reorder_recommendations' else 'risk_level'
+        priorities = np.array(
+            [RISK_PRIORITY[getattr(row, level_attribute)] for row in rows], dtype=np.int8
+        )
+        decision_types = np.full(len(rows), reorder, dtype=np.int8)
+
+    return ResultIndex(rows, priorities, decision_types, [row.product_id for row in rows])
+
+
+def encode_cursor(version: DataVersion, offset: int) -> str:
+    """Opaque cursor for the page starting at offset in a data version"""
+    text = f"{version.epoch}:{version.number}:{offset}"
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, version: DataVersion) -> int:
+    """
+    Offset encoded in a cursor
+
+    Raises ValueError if the cursor is malformed or was issued for a
+    different data version.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        epoch, number, offset = base64.urlsafe_b64decode(padded).decode().split(':')
+        cursor_version, offset = DataVersion(epoch, int(number)), int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if cursor_version != version:
+        raise ValueError("Cursor has expired because the data has changed")
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
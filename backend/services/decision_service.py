@@ -2,8 +2,9 @@
 Business logic for generating decision insights
 """
 
+import math
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
 
 from core.models import (
@@ -18,6 +19,189 @@ from core.models import (
 from core.config import settings
 
 
+# Sort order for risk levels (critical first)
+RISK_PRIORITY = {RiskLevel.CRITICAL: 0, RiskLevel.HIGH: 1, RiskLevel.MEDIUM: 2, RiskLevel.LOW: 3}
+
+# Upper bounds (inclusive) on days of stock for each risk tier
+STOCKOUT_RISK_TIERS = [
+    (3, RiskLevel.CRITICAL),
+    (7, RiskLevel.HIGH),
+    (14, RiskLevel.MEDIUM),
+]
+
+OUT_OF_STOCK_REASON = "Out of stock - immediate action required"
+OUT_OF_STOCK_ACTION = "Urgent reorder - product is currently unavailable"
+
+SAFETY_BUFFER_DAYS = 14  # 2 weeks safety buffer
+TRIAL_ORDER_QUANTITY = 20
+ORDER_QUANTITY_STEP = 10
+MIN_ORDER_QUANTITY = 10
+
+# Reorder quantity multipliers for urgent items
+URGENCY_MULTIPLIERS = {RiskLevel.CRITICAL: 1.5, RiskLevel.HIGH: 1.3}
+
+# Value per unit of stock held for products without an imported unit cost
+STOCK_UNIT_VALUE = 10.0  # Placeholder
+
+# Days without a sale at which slow movers are escalated
+DISCONTINUE_AFTER_DAYS = 180
+PROMOTE_AFTER_DAYS = 120
+
+
+def stockout_risk_level(days_until_stockout: float) -> RiskLevel:
+    """Risk tier for a given number of days of stock remaining"""
+    for max_days, risk_level in STOCKOUT_RISK_TIERS:
+        if days_until_stockout <= max_days:
+            return risk_level
+    return RiskLevel.LOW
+
+
+def stockout_risk_message(risk_level: RiskLevel, days_until_stockout: float) -> Tuple[str, str]:
+    """Risk reason and recommended action for a stockout risk tier"""
+    if risk_level == RiskLevel.CRITICAL:
+        return (
+            f"Critical: Only {days_until_stockout:.1f} days of stock remaining",
+            "Urgent reorder required immediately"
+        )
+    if risk_level == RiskLevel.HIGH:
+        return (
+            f"High risk: {days_until_stockout:.1f} days of stock remaining",
+            "Reorder within 24 hours"
+        )
+    if risk_level == RiskLevel.MEDIUM:
+        return (
+            f"Medium risk: {days_until_stockout:.1f} days of stock remaining",
+            "Plan reorder within the week"
+        )
+    return (
+        f"Low risk: {days_until_stockout:.1f} days of stock remaining",
+        "Monitor stock levels"
+    )
+
+
+def slow_mover_action(days_since_last_sale: int, current_stock: int) -> str:
+    """Recommended action for a slow-moving product"""
+    if current_stock > 0:
+        if days_since_last_sale >= DISCONTINUE_AFTER_DAYS:
+            return "Consider discontinuing or deep discounting"
+        elif days_since_last_sale >= PROMOTE_AFTER_DAYS:
+            return "Run promotional campaign to clear inventory"
+        else:
+            return "Review pricing and marketing strategy"
+    return "No action needed - already out of stock"
+
+
+def stock_unit_value(unit_cost: float) -> float:
+    """Value of one unit held: its unit cost when imported, else STOCK_UNIT_VALUE"""
+    return unit_cost if unit_cost > 0 else STOCK_UNIT_VALUE
+
+
+def demand_safety_stock(daily_sales_std: Optional[float], lead_time_days: int) -> Optional[float]:
+    """
+    Safety stock sized from daily sales variability, in units
+
+    Covers SAFETY_STOCK_Z standard deviations of demand over the lead
+    time. None unless SAFETY_STOCK_METHOD is "demand_variance" and the
+    product's variability is known, meaning the safety buffer days apply.
+    """
+    if settings.SAFETY_STOCK_METHOD != "demand_variance":
+        return None
+    if daily_sales_std is None or math.isnan(daily_sales_std):
+        return None
+    return settings.SAFETY_STOCK_Z * daily_sales_std * math.sqrt(lead_time_days)
+
+
+def reorder_reasoning(
+    average_daily_sales: float,
+    current_stock: int,
+    lead_time_days: int,
+    safety_buffer_days: int,
+    safety_stock: Optional[float] = None
+) -> str:
+    """Explanation of a reorder quantity for a product with sales history"""
+    if safety_stock is not None:
+        return (
+            f"Based on average daily sales of {average_daily_sales:.1f} units, "
+            f"you need {lead_time_days} days of stock to cover the lead time "
+            f"plus {safety_stock:.1f} units of safety stock for demand variability. "
+            f"Current stock: {current_stock} units."
+        )
+    total_days_needed = lead_time_days + safety_buffer_days
+    return (
+        f"Based on average daily sales of {average_daily_sales:.1f} units, "
+        f"you need {total_days_needed} days of stock (including {lead_time_days} day lead time "
+        f"and {safety_buffer_days} day safety buffer). "
+        f"Current stock: {current_stock} units."
+    )
+
+
+def trial_order_reasoning(current_stock: int) -> str:
+    """Explanation of a trial order for a product without sales history"""
+    return (
+        f"This product has no sales history. Recommended trial order of {TRIAL_ORDER_QUANTITY} units "
+        f"to establish demand patterns. Current stock: {current_stock} units."
+    )
+
+
+def risk_insight(
+    risk: InventoryRisk,
+    reorder_rec: Optional[ReorderRecommendation]
+) -> DecisionInsight:
+    """Decision insight for a product at risk of stockout"""
+    summary = f"{risk.product_name} needs immediate attention"
+    reasoning = risk.risk_reason
+    
+    if reorder_rec:
+        reasoning += f" Recommended order quantity: {reorder_rec.recommended_quantity} units. {reorder_rec.reasoning}"
+    
+    estimated_impact = (
+        f"Prevents stockout and potential lost sales. "
+        f"Estimated impact: {risk.days_until_stockout:.0f} days until out of stock."
+        if risk.days_until_stockout else "Prevents stockout."
+    )
+    
+    return DecisionInsight(
+        product_id=risk.product_id,
+        product_name=risk.product_name,
+        decision_type=DecisionType.REORDER,
+        priority=risk.risk_level,
+        summary=summary,
+        reasoning=reasoning,
+        recommended_action=risk.recommended_action,
+        estimated_impact=estimated_impact
+    )
+
+
+def slow_mover_insight(slow_mover: SlowMovingProduct) -> DecisionInsight:
+    """Decision insight for a slow-moving product"""
+    days = slow_mover.days_since_last_sale
+    decision_type = DecisionType.DISCONTINUE if days >= DISCONTINUE_AFTER_DAYS else DecisionType.REVIEW
+    
+    summary = f"{slow_mover.product_name} has not sold in {days} days"
+    reasoning = (
+        f"This product has been sitting in inventory for {days} days "
+        f"without a sale, tying up ${slow_mover.total_value:.2f} in cash."
+    )
+    
+    estimated_impact = (
+        f"Freeing up ${slow_mover.total_value:.2f} in working capital. "
+        f"Consider alternative products with better turnover."
+    )
+    
+    priority = RiskLevel.HIGH if days >= DISCONTINUE_AFTER_DAYS else RiskLevel.MEDIUM
+    
+    return DecisionInsight(
+        product_id=slow_mover.product_id,
+        product_name=slow_mover.product_name,
+        decision_type=decision_type,
+        priority=priority,
+        summary=summary,
+        reasoning=reasoning,
+        recommended_action=slow_mover.recommended_action,
+        estimated_impact=estimated_impact
+    )
+
+
 class DecisionService:
     """Service for generating business decisions and insights"""
     
@@ -51,28 +235,14 @@ class DecisionService:
                 days_until_stockout = product.days_of_stock_remaining
                 
                 # Determine risk level
-                if days_until_stockout <= 3:
-                    risk_level = RiskLevel.CRITICAL
-                    risk_reason = f"Critical: Only {days_until_stockout:.1f} days of stock remaining"
-                    recommended_action = "Urgent reorder required immediately"
-                elif days_until_stockout <= 7:
-                    risk_level = RiskLevel.HIGH
-                    risk_reason = f"High risk: {days_until_stockout:.1f} days of stock remaining"
-                    recommended_action = "Reorder within 24 hours"
-                elif days_until_stockout <= 14:
-                    risk_level = RiskLevel.MEDIUM
-                    risk_reason = f"Medium risk: {days_until_stockout:.1f} days of stock remaining"
-                    recommended_action = "Plan reorder within the week"
-                else:
-                    risk_level = RiskLevel.LOW
-                    risk_reason = f"Low risk: {days_until_stockout:.1f} days of stock remaining"
-                    recommended_action = "Monitor stock levels"
+                risk_level = stockout_risk_level(days_until_stockout)
+                risk_reason, recommended_action = stockout_risk_message(risk_level, days_until_stockout)
             
             # Check for zero stock
             if product.current_stock == 0:
                 risk_level = RiskLevel.CRITICAL
-                risk_reason = "Out of stock - immediate action required"
-                recommended_action = "Urgent reorder - product is currently unavailable"
+                risk_reason = OUT_OF_STOCK_REASON
+                recommended_action = OUT_OF_STOCK_ACTION
                 days_until_stockout = 0
             
             risks.append(InventoryRisk(
@@ -86,8 +256,7 @@ class DecisionService:
             ))
         
         # Sort by risk level (critical first)
-        risk_priority = {RiskLevel.CRITICAL: 0, RiskLevel.HIGH: 1, RiskLevel.MEDIUM: 2, RiskLevel.LOW: 3}
-        risks.sort(key=lambda x: risk_priority[x.risk_level])
+        risks.sort(key=lambda x: RISK_PRIORITY[x.risk_level])
         
         return risks
     
@@ -108,19 +277,9 @@ class DecisionService:
             days_since_last_sale = (current_date - product.last_sale_date).days
             
             if days_since_last_sale >= self.slow_moving_threshold:
-                # Estimate total value (would need unit_cost in production)
-                total_value = product.current_stock * 10.0  # Placeholder
+                total_value = product.current_stock * stock_unit_value(product.unit_cost)
                 
-                recommended_action = ""
-                if product.current_stock > 0:
-                    if days_since_last_sale >= 180:
-                        recommended_action = "Consider discontinuing or deep discounting"
-                    elif days_since_last_sale >= 120:
-                        recommended_action = "Run promotional campaign to clear inventory"
-                    else:
-                        recommended_action = "Review pricing and marketing strategy"
-                else:
-                    recommended_action = "No action needed - already out of stock"
+                recommended_action = slow_mover_action(days_since_last_sale, product.current_stock)
                 
                 slow_movers.append(SlowMovingProduct(
                     product_id=product_id,
@@ -161,45 +320,49 @@ class DecisionService:
                 continue
             
             # Calculate recommended quantity
-            safety_buffer_days = 14  # 2 weeks safety buffer
+            safety_buffer_days = SAFETY_BUFFER_DAYS
             
             if product.average_daily_sales > 0:
-                # Calculate days of stock needed (lead time + safety buffer)
-                total_days_needed = self.reorder_lead_time + safety_buffer_days
-                
-                # Calculate quantity needed
-                quantity_needed = product.average_daily_sales * total_days_needed
+                safety_stock = demand_safety_stock(product.daily_sales_std, self.reorder_lead_time)
+                if safety_stock is not None:
+                    # Lead-time demand plus variance-based safety stock
+                    quantity_needed = product.average_daily_sales * self.reorder_lead_time + safety_stock
+                else:
+                    # Calculate days of stock needed (lead time + safety buffer)
+                    total_days_needed = self.reorder_lead_time + safety_buffer_days
+                    
+                    # Calculate quantity needed
+                    quantity_needed = product.average_daily_sales * total_days_needed
                 
-                # Adjust based on risk level
-                if risk.risk_level == RiskLevel.CRITICAL:
-                    quantity_needed *= 1.5  # Increase for critical items
-                elif risk.risk_level == RiskLevel.HIGH:
-                    quantity_needed *= 1.3
+                # Adjust based on risk level (increase for critical items)
+                if risk.risk_level in URGENCY_MULTIPLIERS:
+                    quantity_needed *= URGENCY_MULTIPLIERS[risk.risk_level]
                 
                 # Round up to nearest reasonable quantity
-                recommended_quantity = int(quantity_needed) + (10 - int(quantity_needed) % 10)
+                recommended_quantity = (
+                    int(quantity_needed)
+                    + (ORDER_QUANTITY_STEP - int(quantity_needed) % ORDER_QUANTITY_STEP)
+                )
                 
                 # Minimum order quantity
-                if recommended_quantity < 10:
-                    recommended_quantity = 10
+                if recommended_quantity < MIN_ORDER_QUANTITY:
+                    recommended_quantity = MIN_ORDER_QUANTITY
                 
                 # Generate reasoning for products with sales history
-                reasoning = (
-                    f"Based on average daily sales of {product.average_daily_sales:.1f} units, "
-                    f"you need {total_days_needed} days of stock (including {self.reorder_lead_time} day lead time "
-                    f"and {safety_buffer_days} day safety buffer). "
-                    f"Current stock: {product.current_stock} units."
+                reasoning = reorder_reasoning(
+                    product.average_daily_sales,
+                    product.current_stock,
+                    self.reorder_lead_time,
+                    safety_buffer_days,
+                    safety_stock
                 )
             else:
                 # For products with no sales history, suggest a small trial order
-                recommended_quantity = 20
+                recommended_quantity = TRIAL_ORDER_QUANTITY
                 total_days_needed = 30
                 
                 # Generate reasoning for products without sales history
-                reasoning = (
-                    f"This product has no sales history. Recommended trial order of {recommended_quantity} units "
-                    f"to establish demand patterns. Current stock: {product.current_stock} units."
-                )
+                reasoning = trial_order_reasoning(product.current_stock)
             
             recommendations.append(ReorderRecommendation(
                 product_id=product_id,
@@ -211,8 +374,7 @@ class DecisionService:
             ))
         
         # Sort by urgency
-        urgency_priority = {RiskLevel.CRITICAL: 0, RiskLevel.HIGH: 1, RiskLevel.MEDIUM: 2, RiskLevel.LOW: 3}
-        recommendations.sort(key=lambda x: urgency_priority[x.urgency])
+        recommendations.sort(key=lambda x: RISK_PRIORITY[x.urgency])
         
         return recommendations
     
@@ -236,62 +398,13 @@ class DecisionService:
             if not product:
                 continue
             
-            reorder_rec = reorder_lookup.get(risk.product_id)
-            
-            decision_type = DecisionType.REORDER
-            summary = f"{risk.product_name} needs immediate attention"
-            reasoning = risk.risk_reason
-            
-            if reorder_rec:
-                reasoning += f" Recommended order quantity: {reorder_rec.recommended_quantity} units. {reorder_rec.reasoning}"
-            
-            estimated_impact = (
-                f"Prevents stockout and potential lost sales. "
-                f"Estimated impact: {risk.days_until_stockout:.0f} days until out of stock."
-                if risk.days_until_stockout else "Prevents stockout."
-            )
-            
-            insights.append(DecisionInsight(
-                product_id=risk.product_id,
-                product_name=risk.product_name,
-                decision_type=decision_type,
-                priority=risk.risk_level,
-                summary=summary,
-                reasoning=reasoning,
-                recommended_action=risk.recommended_action,
-                estimated_impact=estimated_impact
-            ))
+            insights.append(risk_insight(risk, reorder_lookup.get(risk.product_id)))
         
         # Process slow-moving products
         for slow_mover in slow_movers:
-            decision_type = DecisionType.DISCONTINUE if slow_mover.days_since_last_sale >= 180 else DecisionType.REVIEW
-            
-            summary = f"{slow_mover.product_name} has not sold in {slow_mover.days_since_last_sale} days"
-            reasoning = (
-                f"This product has been sitting in inventory for {slow_mover.days_since_last_sale} days "
-                f"without a sale, tying up ${slow_mover.total_value:.2f} in cash."
-            )
-            
-            estimated_impact = (
-                f"Freeing up ${slow_mover.total_value:.2f} in working capital. "
-                f"Consider alternative products with better turnover."
-            )
-            
-            priority = RiskLevel.HIGH if slow_mover.days_since_last_sale >= 180 else RiskLevel.MEDIUM
-            
-            insights.append(DecisionInsight(
-                product_id=slow_mover.product_id,
-                product_name=slow_mover.product_name,
-                decision_type=decision_type,
-                priority=priority,
-                summary=summary,
-                reasoning=reasoning,
-                recommended_action=slow_mover.recommended_action,
-                estimated_impact=estimated_impact
-            ))
+            insights.append(slow_mover_insight(slow_mover))
         
         # Sort by priority
-        priority_order = {RiskLevel.CRITICAL: 0, RiskLevel.HIGH: 1, RiskLevel.MEDIUM: 2, RiskLevel.LOW: 3}
-        insights.sort(key=lambda x: (priority_order[x.priority], x.product_name))
+        insights.sort(key=lambda x: (RISK_PRIORITY[x.priority], x.product_name))
         
         return insights
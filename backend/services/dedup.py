@@ -0,0 +1,279 @@
+"""
+Transaction id index for skipping rows that were already ingested
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.config import settings
+from services.columnar import TransactionColumns
+from services.metrics import metrics
+
+
+_FINGERPRINT_SEED = 0x9E3779B97F4A7C15
+
+# Pending fingerprints are merged into the main sorted array once they
+# outgrow this share of it (or the floor), keeping inserts amortized linear
+_PENDING_SHARE = 8
+_PENDING_FLOOR = 65536
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, in place: a bijective scramble of each uint64"""
+    h ^= h >> 30
+    h *= 0xBF58476D1CE4E5B9
+    h ^= h >> 27
+    h *= 0x94D049BB133111EB
+    h ^= h >> 31
+    return h
+
+
+def fingerprint_ids(transaction_ids: np.ndarray) -> np.ndarray:
+    """
+    64-bit fingerprints of transaction ids (uint64)
+
+    Each id's UTF-8 bytes are zero-padded to whole 8-byte words and
+    hashed word by word, one vectorized step per word of the longest id;
+    ids stop taking part after their own last word. Fingerprints depend
+    only on the id, so they can be persisted.
+    """
+    count = len(transaction_ids)
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64)
+    values = transaction_ids.tolist()
+    try:
+        raw = np.array(values, dtype=np.bytes_)
+    except UnicodeEncodeError:
+        raw = np.array([value.encode('utf-8') for value in values], dtype=np.bytes_)
+
+    width = -(-raw.dtype.itemsize // 8) * 8
+    words = raw.astype(f'S{width}').view('<u8').reshape(count, width // 8)
+    word_counts = np.maximum((np.char.str_len(raw) + 7) // 8, 1)
+    h = np.full(count, _FINGERPRINT_SEED, dtype=np.uint64)
+    h ^= words[:, 0]
+    _mix(h)
+    for column in range(1, words.shape[1]):
+        longer = np.flatnonzero(word_counts > column)
+        h[longer] = _mix(h[longer] ^ words[longer, column])
+    return h
+
+
+def _merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Union of two sorted fingerprint arrays (with no common values)"""
+    merged = np.concatenate([a, b])
+    # Timsort finds the two runs, so this is a linear merge
+    merged.sort(kind='stable')
+    return merged
+
+
+def _isin_sorted(sorted_values: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Which queries occur in sorted_values"""
+    if len(sorted_values) == 0:
+        return np.zeros(len(queries), dtype=bool)
+    positions = np.searchsorted(sorted_values, queries)
+    found = positions < len(sorted_values)
+    found[found] = sorted_values[positions[found]] == queries[found]
+    return found
+
+
+class BloomFilter:
+    """
+    Bit array answering "possibly seen" or "definitely not seen"
+
+    With bits_per_item bits per expected item and the matching number of
+    hash probes, about 0.6185 ** bits_per_item of unseen fingerprints
+    are false positives (1% at 10 bits). Probes are derived from the
+    fingerprint's two 32-bit halves (double hashing).
+    """
+
+    def __init__(self, capacity: int, bits_per_item: int):
+        self.capacity = capacity
+        self.bits_per_item = bits_per_item
+        self.size = max(capacity * bits_per_item, 64)
+        self.probes = max(round(bits_per_item * math.log(2)), 1)
+        self._words = np.zeros(-(-self.size // 64), dtype=np.uint64)
+
+    def add(self, fingerprints: np.ndarray) -> None:
+        for words, masks in self._positions(fingerprints):
+            np.bitwise_or.at(self._words, words, masks)
+
+    def might_contain(self, fingerprints: np.ndarray) -> np.ndarray:
+        result = np.ones(len(fingerprints), dtype=bool)
+        for words, masks in self._positions(fingerprints):
+            result &= (self._words[words] & masks) != 0
+        return result
+
+    def memory_bytes(self) -> int:
+        return self._words.nbytes
+
+    def _positions(self, fingerprints: np.ndarray):
+        """(word index, bit mask) of each probe"""
+        low = fingerprints & 0xFFFFFFFF
+        high = (fingerprints >> 32) | 1
+        size = np.uint64(self.size)
+        for probe in range(self.probes):
+            bits = (low + np.uint64(probe) * high) % size
+            yield (bits >> 6).astype(np.int64), np.left_shift(np.uint64(1), bits & 63)
+
+
+class TransactionIdIndex:
+    """
+    Set of ingested transaction ids, as 64-bit fingerprints
+
+    Fingerprints are held in one sorted array plus a smaller sorted
+    array of recent inserts that is merged in lazily, so memory is 8
+    bytes per id (plus the optional Bloom filter) and a batch of k ids
+    is checked with k binary searches. Two distinct ids share a
+    fingerprint with probability about n / 2**64 per new id, which
+    would make the newer row be treated as a duplicate.
+
+    With bloom_bits_per_id set, a Bloom filter in front answers most
+    lookups for new ids without touching the sorted arrays; it is
+    rebuilt at twice the size whenever the index outgrows it.
+    """
+
+    def __init__(self, bloom_bits_per_id: Optional[int] = None):
+        if bloom_bits_per_id is None:
+            bloom_bits_per_id = settings.DEDUP_BLOOM_BITS_PER_ID
+        self.bloom_bits_per_id = bloom_bits_per_id
+        self._fingerprints = np.zeros(0, dtype=np.uint64)
+        self._pending = np.zeros(0, dtype=np.uint64)
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        if bloom_bits_per_id:
+            self._bloom = BloomFilter(_PENDING_FLOOR, bloom_bits_per_id)
+
+    def __len__(self) -> int:
+        return len(self._fingerprints) + len(self._pending)
+
+    def contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Which fingerprints are in the index"""
+        with self._lock:
+            return self._contains(fingerprints)
+
+    def add_new(self, fingerprints: np.ndarray) -> np.ndarray:
+        """
+        Add fingerprints not yet in the index
+
+        Returns a mask of the entries that were added: the first
+        occurrence of each fingerprint the index did not already hold.
+        Checking and adding happen atomically, so concurrent uploads
+        never both claim the same id.
+        """
+        unique, first = np.unique(fingerprints, return_index=True)
+        with self._lock:
+            new = ~self._contains(unique)
+            self._insert(unique[new])
+        added = np.zeros(len(fingerprints), dtype=bool)
+        added[first[new]] = True
+        return added
+
+    def add(self, fingerprints: np.ndarray) -> None:
+        """Add fingerprints, ignoring those already present"""
+        self.add_new(fingerprints)
+
+    def remove(self, fingerprints: np.ndarray) -> None:
+        """Drop fingerprints, e.g. those claimed by an upload that failed"""
+        if len(fingerprints) == 0:
+            return
+        with self._lock:
+            self._compact()
+            self._fingerprints = self._fingerprints[~np.isin(self._fingerprints, fingerprints)]
+            # Bloom bits cannot be cleared; the exact check still rejects them
+
+    def memory_bytes(self) -> int:
+        bloom = self._bloom.memory_bytes() if self._bloom is not None else 0
+        return self._fingerprints.nbytes + self._pending.nbytes + bloom
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            self._compact()
+            return {'fingerprints': self._fingerprints}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], bloom_bits_per_id: Optional[int] = None) -> 'TransactionIdIndex':
+        index = cls(bloom_bits_per_id)
+        index._fingerprints = np.asarray(arrays['fingerprints'], dtype=np.uint64)
+        index._rebuild_bloom()
+        return index
+
+    def _contains(self, fingerprints: np.ndarray) -> np.ndarray:
+        if self._bloom is None:
+            return _isin_sorted(self._fingerprints, fingerprints) | _isin_sorted(self._pending, fingerprints)
+
+        found = self._bloom.might_contain(fingerprints)
+        candidates = fingerprints[found]
+        found[found] = _isin_sorted(self._fingerprints, candidates) | _isin_sorted(self._pending, candidates)
+        return found
+
+    def _insert(self, fingerprints: np.ndarray) -> None:
+        """Add sorted fingerprints known to be absent (lock held)"""
+        if len(fingerprints) == 0:
+            return
+        self._pending = _merge(self._pending, fingerprints)
+        if len(self._pending) > max(len(self._fingerprints) // _PENDING_SHARE, _PENDING_FLOOR):
+            self._compact()
+
+        if self._bloom is not None:
+            if len(self) > self._bloom.capacity:
+                self._rebuild_bloom()
+            else:
+                self._bloom.add(fingerprints)
+
+    def _compact(self) -> None:
+        if len(self._pending):
+            self._fingerprints = _merge(self._fingerprints, self._pending)
+            self._pending = np.zeros(0, dtype=np.uint64)
+
+    def _rebuild_bloom(self) -> None:
+        """Size the Bloom filter for twice the current ids and refill it"""
+        if not self.bloom_bits_per_id:
+            return
+        self._bloom = BloomFilter(max(2 * len(self), _PENDING_FLOOR), self.bloom_bits_per_id)
+        self._bloom.add(self._fingerprints)
+        self._bloom.add(self._pending)
+
+
+class UploadDeduplicator:
+    """
+    Drops rows of one upload whose transaction_id is already indexed
+
+    Used as a batch filter during parsing: each batch's new ids are
+    claimed in the index immediately, so duplicates within the upload
+    and against concurrent uploads are caught too. If the upload fails,
+    rollback() releases its claims.
+    """
+
+    def __init__(self, index: TransactionIdIndex):
+        self.index = index
+        self.duplicates = 0
+        self._claimed: List[np.ndarray] = []
+
+    def __call__(self, batch: TransactionColumns) -> TransactionColumns:
+        if len(batch) == 0:
+            return batch
+
+        with metrics.stage('dedup') as stage:
+            fingerprints = fingerprint_ids(batch.transaction_ids)
+            added = self.index.add_new(fingerprints)
+            stage.rows = len(batch)
+        self._claimed.append(fingerprints[added])
+
+        duplicates = len(batch) - int(np.count_nonzero(added))
+        if duplicates == 0:
+            return batch
+        self.duplicates += duplicates
+        return batch.take(np.flatnonzero(added))
+
+    def fingerprints(self) -> np.ndarray:
+        """Fingerprints of every row this upload kept"""
+        if not self._claimed:
+            return np.zeros(0, dtype=np.uint64)
+        return np.concatenate(self._claimed)
+
+    def rollback(self) -> None:
+        self.index.remove(self.fingerprints())
+        self._claimed = []
@@ -0,0 +1,196 @@
+"""
+Rolling per-product demand statistics over fixed day windows
+"""
+
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+
+_NO_SALE = np.iinfo(np.int64).max
+
+# Grouping keys pack (product slot, day number) into one int64
+_DAY_BITS = 32
+_DAY_OFFSET = 1 << (_DAY_BITS - 1)  # Allows days before 1970
+
+
+class RollingDemand:
+    """
+    Rolling mean and variance of units sold per day, for each product
+
+    Each product has a ring buffer of its last `capacity` daily sales
+    buckets, capacity being the longest window. For every window the sum
+    and sum of squares of the buckets inside it are kept up to date:
+    adding sales to a day adjusts them in O(1) per (product, day), and
+    rolling to a new day subtracts the bucket that leaves each window,
+    O(products) per day no matter how much history there is.
+
+    Windows end on the newest day with any sales (like
+    ProductAggregates.recent_daily_sales), so they only move when data
+    is ingested. Statistics for products first sold inside a window are
+    taken over the days since their first sale. Sums are integers, so
+    they never drift however many days roll over.
+    """
+
+    def __init__(self, windows: Optional[Iterable[int]] = None):
+        windows = sorted(set(windows if windows is not None else settings.DEMAND_WINDOWS))
+        if not windows or windows[0] < 1:
+            raise ValueError("Demand windows must be positive numbers of days")
+        self.windows: Tuple[int, ...] = tuple(windows)
+        self.capacity = windows[-1]
+        # One row per day of the ring, so rolling a day touches contiguous memory
+        self._ring = np.zeros((self.capacity, 0), dtype=np.int32)
+        self._sums = np.zeros((len(windows), 0), dtype=np.int64)
+        self._squares = np.zeros((len(windows), 0), dtype=np.int64)
+        self._first_day = np.zeros(0, dtype=np.int64)
+        self._count = 0
+        self.end_day: Optional[int] = None  # Newest day with sales, as days since the epoch
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, slots: np.ndarray, days: np.ndarray, quantity: np.ndarray) -> None:
+        """Add units sold given each entry's product slot and day number"""
+        if len(slots) == 0:
+            return
+
+        slots, days, quantity = _group_by_slot_day(
+            slots.astype(np.int64), days.astype(np.int64), quantity.astype(np.int64)
+        )
+        self._reserve(int(slots.max()) + 1)
+        np.minimum.at(self._first_day, slots, days)
+
+        newest = int(days.max())
+        if self.end_day is None or newest > self.end_day:
+            self._roll(newest)
+
+        keep = days > self.end_day - self.capacity
+        slots, days, quantity = slots[keep], days[keep], quantity[keep]
+        if len(slots) == 0:
+            return
+
+        columns = days % self.capacity
+        previous = self._ring[columns, slots].astype(np.int64)
+        # (x + q)^2 - x^2: the change in a bucket's square
+        square_change = quantity * (2 * previous + quantity)
+        for i, window in enumerate(self.windows):
+            inside = days > self.end_day - window
+            np.add.at(self._sums[i], slots[inside], quantity[inside])
+            np.add.at(self._squares[i], slots[inside], square_change[inside])
+        # (slot, day) pairs are unique after grouping
+        self._ring[columns, slots] += quantity.astype(np.int32)
+
+    def merge(self, other: 'RollingDemand', slot_map: np.ndarray) -> None:
+        """Add another instance whose slot i corresponds to slot_map[i] here"""
+        if other._count == 0:
+            return
+
+        if self.end_day is None or other.end_day > self.end_day:
+            self._roll(other.end_day)
+        columns, rows = np.nonzero(other._ring[:, :other._count])
+        days = other.end_day - (other.end_day - columns) % other.capacity
+        self.add(slot_map[rows], days, other._ring[columns, rows])
+
+        # Products whose sales all predate the ring still have a first sale
+        slots = slot_map[:other._count]
+        first_day = other._first_day[:other._count]
+        sold = first_day != _NO_SALE
+        self._reserve(int(slots.max()) + 1)
+        np.minimum.at(self._first_day, slots[sold], first_day[sold])
+
+    @classmethod
+    def from_daily_sales(
+        cls,
+        slots: np.ndarray,
+        days: np.ndarray,
+        quantity: np.ndarray,
+        windows: Optional[Iterable[int]] = None
+    ) -> 'RollingDemand':
+        """Build from per-(product, day) totals, e.g. DailySalesBuckets"""
+        demand = cls(windows)
+        demand.add(slots, days, quantity)
+        return demand
+
+    def mean(self, window: int, slots: Optional[np.ndarray] = None) -> np.ndarray:
+        """Average units sold per day over the window"""
+        sums, _, days = self._window(window, slots)
+        return sums / days
+
+    def std(self, window: int, slots: Optional[np.ndarray] = None) -> np.ndarray:
+        """Standard deviation of units sold per day over the window (days without sales count as 0)"""
+        sums, squares, days = self._window(window, slots)
+        mean = sums / days
+        return np.sqrt(np.maximum(squares / days - mean * mean, 0.0))
+
+    def memory_bytes(self) -> int:
+        return self._ring.nbytes + self._sums.nbytes + self._squares.nbytes + self._first_day.nbytes
+
+    def _window(self, window: int, slots: Optional[np.ndarray]):
+        """Sums, sums of squares and day counts of one window for some slots"""
+        if window not in self.windows:
+            raise ValueError(f"No {window}-day demand window; configured windows are {self.windows}")
+        if slots is None:
+            slots = np.arange(self._count)
+        slots = np.asarray(slots, dtype=np.int64)
+        if self.end_day is None:
+            zeros = np.zeros(len(slots), dtype=np.float64)
+            return zeros, zeros, np.ones(len(slots), dtype=np.int64)
+
+        # Slots beyond those seen have no sales yet
+        known = slots < self._count
+        i = self.windows.index(window)
+        sums = np.zeros(len(slots), dtype=np.float64)
+        squares = np.zeros(len(slots), dtype=np.float64)
+        sums[known] = self._sums[i, slots[known]]
+        squares[known] = self._squares[i, slots[known]]
+        first_day = np.full(len(slots), self.end_day, dtype=np.int64)
+        first_day[known] = np.minimum(self._first_day[slots[known]], self.end_day)
+        days = np.clip(self.end_day - first_day + 1, 1, window)
+        return sums, squares, days
+
+    def _roll(self, new_end: int) -> None:
+        """Advance the windows to end on new_end, dropping buckets that leave them"""
+        if self.end_day is None:
+            self.end_day = new_end
+            return
+
+        count = self._count
+        if new_end - self.end_day >= self.capacity:
+            self._ring[:, :count] = 0
+            self._sums[:, :count] = 0
+            self._squares[:, :count] = 0
+        else:
+            for day in range(self.end_day + 1, new_end + 1):
+                for i, window in enumerate(self.windows):
+                    leaving = self._ring[(day - window) % self.capacity, :count].astype(np.int64)
+                    self._sums[i, :count] -= leaving
+                    self._squares[i, :count] -= leaving * leaving
+                # The column for the new day held the bucket from capacity days ago
+                self._ring[day % self.capacity, :count] = 0
+        self.end_day = new_end
+
+    def _reserve(self, count: int) -> None:
+        """Grow the per-product arrays geometrically to hold count products"""
+        if count <= self._count:
+            return
+        capacity = len(self._first_day)
+        if count > capacity:
+            new_capacity = max(count, capacity * 2, 1024)
+            grow = new_capacity - capacity
+            self._ring = np.concatenate([self._ring, np.zeros((self.capacity, grow), dtype=np.int32)], axis=1)
+            self._sums = np.concatenate([self._sums, np.zeros((len(self.windows), grow), dtype=np.int64)], axis=1)
+            self._squares = np.concatenate(
+                [self._squares, np.zeros((len(self.windows), grow), dtype=np.int64)], axis=1
+            )
+            self._first_day = np.concatenate([self._first_day, np.full(grow, _NO_SALE, dtype=np.int64)])
+        self._count = count
+
+
+def _group_by_slot_day(slots: np.ndarray, days: np.ndarray, quantity: np.ndarray):
+    """Sum quantities per distinct (slot, day)"""
+    keys = (slots << _DAY_BITS) | (days + _DAY_OFFSET)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=quantity, minlength=len(unique)).astype(np.int64)
+    return unique >> _DAY_BITS, (unique & ((1 << _DAY_BITS) - 1)) - _DAY_OFFSET, totals
@@ -0,0 +1,80 @@
+"""
+Bounded worker pool for CPU-bound request work
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from core.config import settings
+
+
+T = TypeVar('T')
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the worker pool and its queue are full"""
+
+
+class BoundedExecutor:
+    """
+    Runs blocking work on a thread pool without blocking the event loop
+
+    At most max_workers jobs run at once and at most max_queue more wait
+    for a worker. Submissions beyond that are rejected immediately with
+    ExecutorSaturated so callers can shed load instead of piling up.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or settings.WORKER_THREADS
+        self.max_queue = max_queue if max_queue is not None else settings.WORKER_QUEUE_SIZE
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="decision-worker"
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on a worker and await its result"""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(
+                    f"Server is busy: {self._in_flight} jobs running or queued"
+                )
+            self._in_flight += 1
+
+        try:
+            future = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is freed when the work ends, not when the caller stops
+        # waiting: a cancelled request (client disconnect) leaves its job
+        # running on the worker until it finishes
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, _future: Optional[Future]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Current load and lifetime counters"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+executor = BoundedExecutor()
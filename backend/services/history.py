@@ -0,0 +1,285 @@
+"""
+Compact in-memory transaction history
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from services.columnar import DATETIME_DTYPE, TransactionColumns
+
+_INT32_MAX = np.iinfo(np.int32).max
+_EPOCH = datetime(1970, 1, 1)
+
+
+class TransactionRow:
+    """
+    Lightweight read-only view of one stored transaction
+
+    Has the attributes DataService.calculate_product_inventory reads
+    from a Transaction, without pydantic's per-instance overhead.
+    """
+    __slots__ = (
+        'transaction_id', 'product_id', 'product_name', 'quantity',
+        'unit_price', 'transaction_date', 'customer_id'
+    )
+
+    def __init__(self, transaction_id, product_id, product_name, quantity,
+                 unit_price, transaction_date, customer_id):
+        self.transaction_id = transaction_id
+        self.product_id = product_id
+        self.product_name = product_name
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.transaction_date = transaction_date
+        self.customer_id = customer_id
+
+
+class _Column:
+    """Append-only typed array with geometric growth"""
+
+    def __init__(self, dtype):
+        self._data = np.zeros(0, dtype=dtype)
+        self.size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._data[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def extend(self, values: np.ndarray) -> None:
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = np.zeros(max(end, 2 * len(self._data), 1024), dtype=self._data.dtype)
+            grown[:self.size] = self.values
+            self._data = grown
+        self._data[self.size:end] = values
+        self.size = end
+
+    def widen(self, dtype) -> None:
+        self._data = self._data.astype(dtype)
+
+    @classmethod
+    def wrap(cls, values: np.ndarray) -> '_Column':
+        """Column backed by an existing array (copied on the next extend)"""
+        column = cls(values.dtype)
+        column._data = values
+        column.size = len(values)
+        return column
+
+
+class _Interned:
+    """Distinct strings with stable integer codes"""
+
+    def __init__(self, values: Optional[List[str]] = None):
+        self.values: List[str] = list(values or [])
+        self.codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def remap(self, values: List[str]) -> np.ndarray:
+        """Codes in this table for a batch's own dictionary"""
+        codes = self.codes
+        mapping = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping
+
+    def nbytes(self) -> int:
+        # Approximate: UTF-8 payload plus a list slot and dict entry per value
+        return sum(len(value) for value in self.values) + 100 * len(self.values)
+
+
+class TransactionHistory:
+    """
+    Every ingested transaction, stored column-wise in contiguous arrays
+
+    Product ids, names and customer ids are interned once for the whole
+    history; quantities are int32 (widened only if a value needs it),
+    prices float64 and timestamps int64 seconds since the epoch, UTC.
+    Transaction ids share one UTF-8 buffer addressed by offsets.
+    Sub-second parts of timestamps are dropped.
+    """
+
+    def __init__(self):
+        self._product_ids = _Interned()
+        self._product_names = _Interned()
+        self._customer_ids = _Interned()
+        self._product_codes = _Column(np.int32)
+        self._name_codes = _Column(np.int32)
+        self._customer_codes = _Column(np.int32)
+        self._quantity = _Column(np.int32)
+        self._unit_price = _Column(np.float64)
+        self._timestamp = _Column(np.int64)
+        self._id_bytes = _Column(np.uint8)
+        self._id_offsets = _Column(np.int64)
+        self._id_offsets.extend(np.zeros(1, dtype=np.int64))
+        self._product_rows: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return self._quantity.size
+
+    def append(self, batch: TransactionColumns) -> None:
+        """Add a parsed batch to the end of the history"""
+        if len(batch) == 0:
+            return
+
+        self._product_codes.extend(self._product_ids.remap(batch.product_ids)[batch.product_codes])
+        self._name_codes.extend(self._product_names.remap(batch.product_names)[batch.product_name_codes])
+
+        customer_map = np.append(self._customer_ids.remap(batch.customer_ids), np.int32(-1))
+        # -1 (no customer) indexes the trailing -1 entry
+        self._customer_codes.extend(customer_map[batch.customer_codes])
+
+        if self._quantity.values.dtype == np.int32 and len(batch) and batch.quantity.max() > _INT32_MAX:
+            self._quantity.widen(np.int64)
+        self._quantity.extend(batch.quantity)
+        self._unit_price.extend(batch.unit_price)
+        self._timestamp.extend(batch.transaction_date.astype('datetime64[s]').view(np.int64))
+
+        encoded = [transaction_id.encode('utf-8') for transaction_id in batch.transaction_ids]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        self._id_offsets.extend(self._id_bytes.size + np.cumsum(lengths))
+        self._id_bytes.extend(np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+        self._product_rows = None
+
+    def extend(self, other: 'TransactionHistory') -> None:
+        """Add all of another history's transactions (e.g. one staged upload)"""
+        if len(other) == 0:
+            return
+
+        self._product_codes.extend(
+            self._product_ids.remap(other._product_ids.values)[other._product_codes.values]
+        )
+        self._name_codes.extend(
+            self._product_names.remap(other._product_names.values)[other._name_codes.values]
+        )
+        customer_map = np.append(self._customer_ids.remap(other._customer_ids.values), np.int32(-1))
+        self._customer_codes.extend(customer_map[other._customer_codes.values])
+
+        if other._quantity.values.dtype != self._quantity.values.dtype:
+            self._quantity.widen(np.int64)
+        self._quantity.extend(other._quantity.values)
+        self._unit_price.extend(other._unit_price.values)
+        self._timestamp.extend(other._timestamp.values)
+
+        self._id_offsets.extend(self._id_bytes.size + other._id_offsets.values[1:])
+        self._id_bytes.extend(other._id_bytes.values)
+
+        self._product_rows = None
+
+    def __getitem__(self, row: int) -> TransactionRow:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("transaction row out of range")
+
+        offsets = self._id_offsets.values
+        customer_code = int(self._customer_codes.values[row])
+        return TransactionRow(
+            transaction_id=self._id_bytes.values[offsets[row]:offsets[row + 1]].tobytes().decode('utf-8'),
+            product_id=self._product_ids.values[self._product_codes.values[row]],
+            product_name=self._product_names.values[self._name_codes.values[row]],
+            quantity=int(self._quantity.values[row]),
+            unit_price=float(self._unit_price.values[row]),
+            transaction_date=_EPOCH + timedelta(seconds=int(self._timestamp.values[row])),
+            customer_id=self._customer_ids.values[customer_code] if customer_code >= 0 else None
+        )
+
+    def __iter__(self) -> Iterator[TransactionRow]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def rows_for_product(self, product_id: str) -> np.ndarray:
+        """Row numbers of one product's transactions, in ingestion order"""
+        code = self._product_ids.codes.get(product_id)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+
+        if self._product_rows is None:
+            # Built on first lookup after a change: rows grouped by product
+            codes = self._product_codes.values
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(self._product_ids.values) + 1))
+            self._product_rows = (order, bounds)
+
+        order, bounds = self._product_rows
+        return order[bounds[code]:bounds[code + 1]]
+
+    def product_transactions(self, product_id: str) -> List[TransactionRow]:
+        return [self[row] for row in self.rows_for_product(product_id)]
+
+    def to_columns(self) -> TransactionColumns:
+        """The whole history as one columnar batch (arrays are copied)"""
+        offsets = self._id_offsets.values
+        id_bytes = self._id_bytes.values.tobytes()
+        transaction_ids = np.empty(len(self), dtype=object)
+        transaction_ids[:] = [
+            id_bytes[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(self))
+        ]
+
+        return TransactionColumns(
+            transaction_ids=transaction_ids,
+            product_codes=self._product_codes.values.copy(),
+            product_ids=list(self._product_ids.values),
+            product_name_codes=self._name_codes.values.copy(),
+            product_names=list(self._product_names.values),
+            quantity=self._quantity.values.astype(np.int64),
+            unit_price=self._unit_price.values.copy(),
+            transaction_date=self._timestamp.values.view('datetime64[s]').astype(DATETIME_DTYPE),
+            customer_codes=self._customer_codes.values.copy(),
+            customer_ids=list(self._customer_ids.values),
+        )
+
+    def to_arrays(self) -> Dict[str, Union[np.ndarray, List[str]]]:
+        """Internal columns and string tables, for snapshots (arrays are not copied)"""
+        return {
+            'product_ids': self._product_ids.values,
+            'product_names': self._product_names.values,
+            'customer_ids': self._customer_ids.values,
+            'product_codes': self._product_codes.values,
+            'name_codes': self._name_codes.values,
+            'customer_codes': self._customer_codes.values,
+            'quantity': self._quantity.values,
+            'unit_price': self._unit_price.values,
+            'timestamp': self._timestamp.values,
+            'id_bytes': self._id_bytes.values,
+            'id_offsets': self._id_offsets.values,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Union[np.ndarray, List[str]]]) -> 'TransactionHistory':
+        """
+        Rebuild a history from to_arrays() output
+
+        Arrays are used as-is, so memory-mapped arrays stay on disk until
+        the history is next appended to.
+        """
+        history = cls()
+        history._product_ids = _Interned(arrays['product_ids'])
+        history._product_names = _Interned(arrays['product_names'])
+        history._customer_ids = _Interned(arrays['customer_ids'])
+        for name in ('product_codes', 'name_codes', 'customer_codes', 'quantity',
+                     'unit_price', 'timestamp', 'id_bytes', 'id_offsets'):
+            setattr(history, '_' + name, _Column.wrap(arrays[name]))
+        return history
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the history"""
+        columns = (
+            self._product_codes, self._name_codes, self._customer_codes,
+            self._quantity, self._unit_price, self._timestamp, self._id_offsets, self._id_bytes
+        )
+        return (
+            sum(column.nbytes for column in columns)
+            + self._product_ids.nbytes()
+            + self._product_names.nbytes()
+            + self._customer_ids.nbytes()
+        )
@@ -0,0 +1,373 @@
+"""
+Background jobs with progress reporting and optional on-disk persistence
+"""
+
+import json
+import os
+import queue
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.models import JobResponse, JobStatus
+from services.executor import ExecutorSaturated
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+FINISHED_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+# Each queue keeps its files in a directory of its own under job_dir,
+# holding an exclusive lock on the lock file in it while it runs
+_QUEUE_DIR_PREFIX = "queue-"
+_LOCK_FILE = "owner.lock"
+
+
+def _try_lock(handle: BinaryIO) -> bool:
+    """Lock an open file exclusively without waiting; False if it is already locked"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+@dataclass
+class Job:
+    """
+    One unit of background work
+
+    Progress fields are written by the worker running the job and read
+    by status requests; each is a single attribute assignment.
+    """
+    job_id: str
+    kind: str
+    params: Dict[str, Any]
+    upload_path: Optional[str] = None
+    total_bytes: Optional[int] = None
+    status: JobStatus = JobStatus.QUEUED
+    stage: Optional[str] = None
+    rows_parsed: int = 0
+    bytes_read: int = 0
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def record_rows(self, rows_parsed: int) -> None:
+        """Progress callback for ingestion"""
+        self.rows_parsed = rows_parsed
+
+    def to_response(self) -> JobResponse:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+
+        return JobResponse(
+            job_id=self.job_id,
+            kind=self.kind,
+            status=self.status,
+            stage=self.stage,
+            rows_parsed=self.rows_parsed,
+            bytes_read=self.bytes_read,
+            total_bytes=self.total_bytes,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            elapsed_seconds=elapsed,
+            result=self.result,
+            error=self.error
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        """JSON-serializable state for persistence"""
+        record = self.to_response().model_dump(mode='json', exclude={'elapsed_seconds'})
+        record.update(params=self.params, upload_path=self.upload_path)
+        return record
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'Job':
+        def parse_time(value: Optional[str]) -> Optional[datetime]:
+            return datetime.fromisoformat(value) if value else None
+
+        return cls(
+            job_id=record['job_id'],
+            kind=record['kind'],
+            params=record.get('params') or {},
+            upload_path=record.get('upload_path'),
+            total_bytes=record.get('total_bytes'),
+            status=JobStatus(record['status']),
+            stage=record.get('stage'),
+            rows_parsed=record.get('rows_parsed', 0),
+            bytes_read=record.get('bytes_read', 0),
+            created_at=parse_time(record['created_at']),
+            started_at=parse_time(record.get('started_at')),
+            finished_at=parse_time(record.get('finished_at')),
+            result=record.get('result'),
+            error=record.get('error')
+        )
+
+
+JobHandler = Callable[[Job], Optional[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    In-process job queue served by a fixed set of worker threads
+
+    Handlers are registered per job kind. Uploads are spooled to disk
+    so they outlive the request that submitted them. With persistence
+    enabled each job's state is also written there on every status
+    change, and start() re-queues jobs that were queued or running when
+    the process stopped.
+
+    Several processes can share job_dir: each queue works in its own
+    subdirectory, locked for as long as the process lives. start() only
+    takes over the subdirectories of processes that are gone, whose
+    lock it can acquire, so it never deletes another live process's
+    uploads or runs its jobs a second time.
+    """
+
+    def __init__(
+        self,
+        job_dir: Optional[str] = None,
+        persist: Optional[bool] = None,
+        workers: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        history_size: Optional[int] = None
+    ):
+        # Absolute, so the queue directory does not depend on the working directory
+        self.job_dir = os.path.abspath(
+            job_dir or settings.JOB_DIR or os.path.join(settings.DATA_DIR, "jobs")
+        )
+        self.persist = settings.JOB_PERSIST if persist is None else persist
+        self.workers = workers or settings.JOB_WORKERS
+        self.max_queued = max_queued or settings.JOB_QUEUE_SIZE
+        self.history_size = history_size or settings.JOB_HISTORY_SIZE
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._queue_dir: Optional[str] = None
+        self._owner_lock: Optional[BinaryIO] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Set the function that runs jobs of a kind and returns their result"""
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Restore persisted jobs and start the workers"""
+        if self._threads:
+            return
+
+        self._claim()
+        self._adopt_abandoned()
+        if self.persist:
+            self._restore()
+        self._remove_orphaned_uploads()
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind: str, params: Dict[str, Any], upload: Optional[BinaryIO] = None) -> Job:
+        """
+        Queue a job, spooling its upload to disk first
+
+        Raises ExecutorSaturated if too many jobs are already waiting.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self.queued() >= self.max_queued:
+            raise ExecutorSaturated(f"Job queue is full: {self.max_queued} jobs waiting")
+
+        job = Job(job_id=uuid.uuid4().hex, kind=kind, params=params)
+        if upload is not None:
+            job.upload_path = os.path.join(self._claim(), f"{job.job_id}.csv")
+            with open(job.upload_path, 'wb') as f:
+                shutil.copyfileobj(upload, f, settings.INGEST_CHUNK_SIZE)
+            job.total_bytes = os.path.getsize(job.upload_path)
+
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._save(job)
+        self._queue.put(job.job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self, status: Optional[JobStatus] = None) -> List[Job]:
+        """Known jobs, newest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if status is not None:
+            jobs = [job for job in jobs if job.status == status]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def queued(self) -> int:
+        with self._lock:
+            return sum(job.status == JobStatus.QUEUED for job in self._jobs.values())
+
+    def _work(self) -> None:
+        while True:
+            job = self.get(self._queue.get())
+            if job is not None and job.status == JobStatus.QUEUED:
+                self._run(job)
+
+    def _run(self, job: Job) -> None:
+        job.status = JobStatus.RUNNING
+        job.started_at = datetime.now()
+        self._save(job)
+
+        try:
+            job.result = self._handlers[job.kind](job)
+            job.status = JobStatus.SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = datetime.now()
+            self._discard_upload(job)
+            self._save(job)
+            self._prune()
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history size"""
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.status in FINISHED_STATUSES),
+                key=lambda job: job.finished_at
+            )
+            expired = finished[:max(len(finished) - self.history_size, 0)]
+            for job in expired:
+                del self._jobs[job.job_id]
+
+        for job in expired:
+            self._remove(self._record_path(job.job_id))
+
+    def _claim(self) -> str:
+        """This queue's own directory, created and locked on first use"""
+        if self._queue_dir is not None:
+            return self._queue_dir
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        name = f"{_QUEUE_DIR_PREFIX}{uuid.uuid4().hex}"
+        # Locked under a name other queues skip, then moved into place, so
+        # no other queue can find it unlocked and take it over
+        staging = os.path.join(self.job_dir, f".{name}")
+        os.makedirs(staging)
+        handle = open(os.path.join(staging, _LOCK_FILE), 'wb')
+        _try_lock(handle)
+        path = os.path.join(self.job_dir, name)
+        os.rename(staging, path)
+        self._owner_lock, self._queue_dir = handle, path
+        return path
+
+    def _adopt_abandoned(self) -> None:
+        """Move jobs and uploads of queues whose process is gone into this queue's directory"""
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            if not name.startswith(_QUEUE_DIR_PREFIX) or path == self._queue_dir:
+                continue
+            try:
+                handle = open(os.path.join(path, _LOCK_FILE), 'ab')
+            except OSError:
+                # Taken over and removed by another queue meanwhile
+                continue
+            with handle:
+                if not _try_lock(handle):
+                    continue
+                for entry in os.listdir(path):
+                    if entry == _LOCK_FILE:
+                        continue
+                    if self.persist:
+                        os.replace(os.path.join(path, entry), os.path.join(self._queue_dir, entry))
+                    else:
+                        self._remove(os.path.join(path, entry))
+            self._remove(os.path.join(path, _LOCK_FILE))
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+
+    def _restore(self) -> None:
+        """Load persisted jobs, re-queueing any that had not finished"""
+        jobs = []
+        for name in os.listdir(self._queue_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self._queue_dir, name)) as f:
+                    jobs.append(Job.from_record(json.load(f)))
+            except (OSError, ValueError, KeyError):
+                continue
+
+        for job in sorted(jobs, key=lambda job: job.created_at):
+            if job.upload_path:
+                # Adopted uploads now sit in this queue's directory
+                job.upload_path = os.path.join(self._queue_dir, os.path.basename(job.upload_path))
+            if job.status not in FINISHED_STATUSES:
+                if job.upload_path and not os.path.exists(job.upload_path):
+                    job.status = JobStatus.FAILED
+                    job.error = "Upload was lost before the job could run"
+                    job.finished_at = datetime.now()
+                else:
+                    # Interrupted jobs start over; in-memory data did not survive
+                    job.status = JobStatus.QUEUED
+                    job.stage, job.rows_parsed, job.bytes_read = None, 0, 0
+                    job.started_at = None
+                    self._queue.put(job.job_id)
+                self._save(job)
+            self._jobs[job.job_id] = job
+
+        self._prune()
+
+    def _remove_orphaned_uploads(self) -> None:
+        with self._lock:
+            live = {job.upload_path for job in self._jobs.values() if job.status not in FINISHED_STATUSES}
+        for name in os.listdir(self._queue_dir):
+            path = os.path.join(self._queue_dir, name)
+            if name.endswith('.csv') and path not in live:
+                self._remove(path)
+
+    def _discard_upload(self, job: Job) -> None:
+        if job.upload_path:
+            self._remove(job.upload_path)
+            job.upload_path = None
+
+    def _save(self, job: Job) -> None:
+        if not self.persist:
+            return
+        path = self._record_path(job.job_id)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(job.to_record(), f)
+        os.replace(path + '.tmp', path)
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self._claim(), f"{job_id}.json")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+job_queue = JobQueue()
@@ -0,0 +1,262 @@
+"""
+Counters and latency histograms for the pipeline, in Prometheus text format
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+
+
+# Seconds; spans a cached page lookup through a multi-million-row ingest
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, labels: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination"""
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value read from a callback at scrape time"""
+    kind = 'gauge'
+
+    def __init__(self, *args, function: Callable[[], float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function = function
+
+    def _samples(self) -> List[str]:
+        try:
+            value = float(self.function())
+        except Exception:
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Stage:
+    """Times one pipeline stage; set rows to the number of rows it handled"""
+    __slots__ = ('registry', 'name', 'rows', 'started')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str):
+        self.registry = registry
+        self.name = name
+        self.rows: Optional[int] = None
+
+    def __enter__(self) -> '_Stage':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.registry.record_stage(self.name, time.perf_counter() - self.started, self.rows, exc_type is not None)
+
+
+class _NullStage:
+    """Stand-in used while metrics are disabled; ignores everything"""
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+    def __setattr__(self, name, value) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics, rendered in the Prometheus text exposition format
+
+    When disabled, updates return immediately and stage() hands out a
+    shared no-op timer, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+        self.stage_seconds = self.histogram(
+            'pipeline_stage_seconds', 'Time spent in each pipeline stage', ['stage']
+        )
+        self.stage_rows = self.counter(
+            'pipeline_stage_rows_total', 'Rows (or products) handled by each pipeline stage', ['stage']
+        )
+        self.stage_errors = self.counter(
+            'pipeline_stage_errors_total', 'Pipeline stage runs that raised', ['stage']
+        )
+        self.rejected_rows = self.counter(
+            'ingest_rejected_rows_total', 'CSV rows rejected during ingestion', ['reason']
+        )
+        self.cache_requests = self.counter(
+            'decision_cache_requests_total', 'Decision cache lookups', ['result']
+        )
+        self.response_bytes = self.counter(
+            'response_bytes_total', 'Bytes of encoded decision responses sent', ['encoding']
+        )
+        self.not_modified = self.counter(
+            'not_modified_responses_total', 'Conditional requests answered with 304', ['endpoint']
+        )
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labels, buckets=buckets))
+
+    def gauge(self, name: str, help_text: str, function: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(self, name, help_text, function=function))
+
+    def stage(self, name: str):
+        """Context manager timing one run of a pipeline stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record_stage(self, name: str, seconds: float, rows: Optional[int] = None, failed: bool = False) -> None:
+        """Record a stage run timed elsewhere (e.g. summed over a loop)"""
+        if not self.enabled:
+            return
+        self.stage_seconds.observe(seconds, stage=name)
+        if rows:
+            self.stage_rows.inc(rows, stage=name)
+        if failed:
+            self.stage_errors.inc(stage=name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
@@ -0,0 +1,284 @@
+"""
+Parallel CSV ingestion over newline-aligned byte ranges
+"""
+
+import csv
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+from core.models import IngestionRejectReport, RejectedRow
+from services.aggregates import ProductAggregates
+from services.columnar import CsvStreamParser, merge_reject_reports, record_windows
+from services.history import TransactionHistory
+
+# Bytes scanned at a time when counting quotes
+_SCAN_BLOCK = 16 * 1024 * 1024
+
+# String tables of a TransactionHistory; its other columns are arrays
+_HISTORY_STRINGS = ('product_ids', 'product_names', 'customer_ids')
+
+# Parse workers, started on first use and shared by every parallel parse
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class CsvParseResult:
+    """Aggregates parsed from a CSV file, or from one byte range of it"""
+    aggregates: ProductAggregates
+    lines: int  # Physical lines read, blank and rejected ones included
+    rows_parsed: int
+    product_ids: Set[str]
+    reject_report: IngestionRejectReport
+    history: Optional[TransactionHistory] = None
+
+
+def read_header(path: str) -> Tuple[List[str], int]:
+    """Header fields and the byte offset where the first record starts"""
+    with open(path, 'rb') as f:
+        line = f.readline()
+    if not line:
+        return [], 0
+    return next(csv.reader([line.decode('utf-8').rstrip('\r\n')])), len(line)
+
+
+def shard_boundaries(path: str, start: int, shards: int) -> List[int]:
+    """
+    Split [start, end of file) into about `shards` ranges of whole records
+
+    Each cut is moved forward to just after a newline that is outside
+    any quoted field, found by tracking quote parity from `start`, so a
+    record containing an embedded newline is never split.
+    """
+    size = os.path.getsize(path)
+    if size <= start or shards <= 1:
+        return [start, max(size, start)]
+
+    targets = [start + (size - start) * i // shards for i in range(1, shards)]
+    cuts = [start]
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        position, quotes = start, 0
+        for target in targets:
+            if target <= cuts[-1]:
+                continue
+            # Quote parity up to the target
+            while position < target:
+                block_end = min(position + _SCAN_BLOCK, target)
+                quotes += data[position:block_end].count(b'"')
+                position = block_end
+
+            # Advance to a newline that ends a record
+            cut = None
+            while position < size:
+                newline = data.find(b'\n', position)
+                if newline < 0:
+                    break
+                quotes += data[position:newline].count(b'"')
+                position = newline + 1
+                if quotes % 2 == 0:
+                    cut = position
+                    break
+            if cut is None:
+                break
+            if cut < size:
+                cuts.append(cut)
+
+    cuts.append(size)
+    return cuts
+
+
+def parse_shard(
+    path: str,
+    header: List[str],
+    start: int,
+    end: int,
+    history_dir: Optional[str] = None
+) -> CsvParseResult:
+    """
+    Parse one byte range into partial aggregates (runs in a worker process)
+
+    With history_dir, the shard's rows are written there as .npy files
+    for the parent to map, rather than pickled back with the result.
+    """
+    parser = CsvStreamParser()
+    parser.header = header
+    aggregates = ProductAggregates()
+    history = TransactionHistory() if history_dir is not None else None
+
+    def fold(batch) -> None:
+        aggregates.update(batch)
+        if history is not None:
+            history.append(batch)
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for records in record_windows(data, start, end):
+            fold(parser.feed_records(records))
+            del records  # The map cannot close while views of it exist
+
+    if history is not None:
+        _write_history(history, history_dir)
+
+    return CsvParseResult(
+        aggregates=aggregates,
+        lines=parser.lines_read,
+        rows_parsed=parser.rows_parsed,
+        product_ids=parser.product_ids,
+        reject_report=parser.reject_report
+    )
+
+
+def parse_csv_file_parallel(
+    path: str,
+    workers: int,
+    keep_history: bool = False,
+    progress: Optional[Callable[[int], None]] = None
+) -> CsvParseResult:
+    """
+    Parse a CSV file in a process pool and reduce the partial aggregates
+
+    Shards are merged in file order, so products get the same slots,
+    and rejected rows the same line numbers, as in a serial parse.
+    Shard histories pass through memory-mapped files in a temporary
+    directory, removed once they are merged.
+    """
+    header, start = read_header(path)
+    if not header:
+        return CsvParseResult(
+            ProductAggregates(), 0, 0, set(), IngestionRejectReport(),
+            TransactionHistory() if keep_history else None
+        )
+
+    cuts = shard_boundaries(path, start, workers)
+    shards: List[Optional[CsvParseResult]] = [None] * (len(cuts) - 1)
+    pool = _worker_pool(workers)
+
+    with tempfile.TemporaryDirectory(prefix='parallel-ingest-') as spool:
+        history_dirs = [
+            os.path.join(spool, str(i)) if keep_history else None for i in range(len(shards))
+        ]
+        try:
+            futures = {
+                pool.submit(parse_shard, path, header, cuts[i], cuts[i + 1], history_dirs[i]): i
+                for i in range(len(shards))
+            }
+            rows_done = 0
+            for future in as_completed(futures):
+                shard = shards[futures[future]] = future.result()
+                rows_done += shard.rows_parsed
+                if progress is not None:
+                    progress(rows_done)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+
+        merged = CsvParseResult(
+            ProductAggregates(), 0, 0, set(), IngestionRejectReport(),
+            TransactionHistory() if keep_history else None
+        )
+        merged.lines = 1  # The header
+        reports = []
+        for shard, history_dir in zip(shards, history_dirs):
+            merged.aggregates.merge(shard.aggregates)
+            if merged.history is not None:
+                merged.history.extend(_map_history(history_dir))
+            merged.product_ids |= shard.product_ids
+            reports.append(_shift_line_numbers(shard.reject_report, merged.lines))
+            merged.lines += shard.lines
+            merged.rows_parsed += shard.rows_parsed
+
+    merged.reject_report = merge_reject_reports(reports)
+    return merged
+
+
+def shutdown_pool() -> None:
+    """Stop the parse workers, if any were started"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        pool, _pool, _pool_workers = _pool, None, 0
+    if pool is not None:
+        pool.shutdown()
+
+
+def _worker_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    The shared pool, started on first use
+
+    A call wanting more workers than the pool has replaces it; parses
+    already submitted to the old pool finish there.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a pool whose worker died, so the next parse starts a new one"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_workers = None, 0
+
+
+def _write_history(history: TransactionHistory, directory: str) -> None:
+    os.makedirs(directory)
+    for name, values in history.to_arrays().items():
+        if name in _HISTORY_STRINGS:
+            values = np.array(values, dtype=str)
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+
+
+def _map_history(directory: str) -> TransactionHistory:
+    """A shard's history, with its columns memory-mapped from directory"""
+    arrays: Dict = {}
+    for name in _HISTORY_STRINGS:
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy")).tolist()
+    for name in ('product_codes', 'name_codes', 'customer_codes', 'quantity',
+                 'unit_price', 'timestamp', 'id_bytes', 'id_offsets'):
+        arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+    return TransactionHistory.from_arrays(arrays)
+
+
+def _context():
+    """
+    Start method for parse workers
+
+    Forking a process that runs other threads can copy held locks, so
+    workers start from a clean forkserver where available; it imports
+    this module once so each worker does not pay for NumPy's import.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _shift_line_numbers(report: IngestionRejectReport, lines_before: int) -> IngestionRejectReport:
+    """Make a shard's line numbers relative to the whole file"""
+    if lines_before == 0:
+        return report
+    return IngestionRejectReport(
+        total_rejected=report.total_rejected,
+        reasons=report.reasons,
+        samples=[
+            RejectedRow(line_number=sample.line_number + lines_before, reason=sample.reason)
+            for sample in report.samples
+        ]
+    )
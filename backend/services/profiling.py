@@ -0,0 +1,97 @@
+"""
+Opt-in cProfile traces of individual requests
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional, TypeVar
+
+from core.config import settings
+from core.models import ProfileHotspot, ProfileSummary
+
+T = TypeVar('T')
+
+
+class RequestProfile:
+    """
+    One request's profile, collected across the worker threads it uses
+
+    The work a request hands to the executor is run through run(), which
+    enables the profiler on whichever thread executes it. A request's
+    steps run one after another, so the profiler is never active on two
+    threads at once.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profile_id = f"{datetime.now():%Y%m%d-%H%M%S}-{name}-{uuid.uuid4().hex[:8]}"
+        self._profile = cProfile.Profile()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            self._profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._profile.disable()
+
+    def save(self, top_n: Optional[int] = None) -> ProfileSummary:
+        """Write the trace under PROFILE_DIR and summarize its hottest functions"""
+        top_n = top_n or settings.PROFILE_TOP_N
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, f"{self.profile_id}.prof")
+        self._profile.dump_stats(path)
+        _prune(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+
+        # Entries are (primitive calls, calls, self time, cumulative time, callers)
+        stats = pstats.Stats(self._profile).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+        return ProfileSummary(
+            profile_id=self.profile_id,
+            path=path,
+            elapsed_seconds=round(time.perf_counter() - self._started, 4),
+            hotspots=[
+                ProfileHotspot(
+                    function=f"{filename}:{line}({function})",
+                    calls=calls,
+                    self_seconds=round(self_time, 6),
+                    cumulative_seconds=round(cumulative, 6),
+                )
+                for (filename, line, function), (_, calls, self_time, cumulative, _) in hottest
+            ]
+        )
+
+
+def start_profile(name: str, requested: bool) -> Optional[RequestProfile]:
+    """A profile for the request if one was asked for and PROFILE_ENABLED allows it"""
+    if not (requested and settings.PROFILE_ENABLED):
+        return None
+    return RequestProfile(name)
+
+
+def profiled(profile: Optional[RequestProfile], fn: Callable[..., T]) -> Callable[..., T]:
+    """fn, run under the request's profile when there is one"""
+    if profile is None:
+        return fn
+    return functools.partial(profile.run, fn)
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Delete all but the newest keep traces"""
+    traces = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.prof')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in traces[:max(len(traces) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,173 @@
+"""
+What-if sweeps of decision parameters over one inventory table
+"""
+
+import itertools
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from core.models import RiskLevel, ScenarioGrid, ScenarioParameters, ScenarioResult
+from services.columnar import InventoryTable
+from services.decision_service import (
+    MIN_ORDER_QUANTITY,
+    ORDER_QUANTITY_STEP,
+    RISK_PRIORITY,
+    SAFETY_BUFFER_DAYS,
+    STOCK_UNIT_VALUE,
+    TRIAL_ORDER_QUANTITY,
+    URGENCY_MULTIPLIERS,
+)
+from services.vectorized_decisions import VectorizedDecisionEngine
+
+
+def expand_grid(grid: ScenarioGrid) -> List[ScenarioParameters]:
+    """Every combination of the grid's values; empty axes keep the configured value"""
+    axes = [
+        getattr(grid, name) or [None]
+        for name in ('reorder_lead_time_days', 'slow_moving_threshold_days', 'safety_buffer_days')
+    ]
+    return [
+        ScenarioParameters(
+            reorder_lead_time_days=lead_time,
+            slow_moving_threshold_days=threshold,
+            safety_buffer_days=buffer_days
+        )
+        for lead_time, threshold, buffer_days in itertools.product(*axes)
+    ]
+
+
+class ScenarioSweep:
+    """
+    Decision totals for many parameter sets over the same inventory
+
+    Everything that does not depend on the parameters is computed once:
+    stockout risks, the reorder candidates with their urgency, and days
+    since each product's last sale, sorted with running stock values.
+    A slow-moving threshold is then a binary search, and reorder
+    quantities for all scenarios are computed together as a (scenario x
+    product) array, once per distinct lead time and buffer, in blocks of
+    SCENARIO_BLOCK_CELLS. Each scenario matches what
+    VectorizedDecisionEngine reports with the same settings.
+    """
+
+    def __init__(self, table: InventoryTable, current_date: Optional[datetime] = None):
+        self.table = table
+        engine = VectorizedDecisionEngine()
+        risks = engine.identify_inventory_risks(table)
+        self.inventory_risks = len(risks)
+        self.critical_actions = int(np.count_nonzero(risks.priorities == RISK_PRIORITY[RiskLevel.CRITICAL]))
+
+        # Reorder candidates, as in generate_reorder_recommendations
+        rows, priorities = risks.rows, risks.priorities
+        keep = ~((table.current_stock[rows] == 0) & (table.average_daily_sales[rows] == 0))
+        rows, priorities = rows[keep], priorities[keep]
+        self.reorder_rows = rows
+        self.average_daily_sales = table.average_daily_sales[rows]
+        self.multipliers = np.ones(len(rows), dtype=np.float64)
+        for risk_level, multiplier in URGENCY_MULTIPLIERS.items():
+            self.multipliers[priorities == RISK_PRIORITY[risk_level]] = multiplier
+        self.urgent = self.multipliers != 1.0
+        self.unit_cost = table.unit_cost[rows]
+        self.daily_sales_std = None
+        if settings.SAFETY_STOCK_METHOD == "demand_variance" and table.daily_sales_std is not None:
+            self.daily_sales_std = table.daily_sales_std[rows]
+
+        # Days since last sale, ascending, with stock value held at or beyond each
+        now = np.datetime64(current_date or datetime.now(), 'us')
+        sold = np.flatnonzero(~np.isnat(table.last_sale_date))
+        days_since = (now - table.last_sale_date[sold]) // np.timedelta64(1, 'D')
+        order = np.argsort(days_since, kind='stable')
+        self.days_since = days_since[order]
+        unit_cost = table.unit_cost[sold[order]]
+        values = table.current_stock[sold[order]] * np.where(unit_cost > 0, unit_cost, STOCK_UNIT_VALUE)
+        self.value_at_or_beyond = np.concatenate([np.cumsum(values[::-1])[::-1], [0.0]])
+
+    def evaluate(self, scenarios: Sequence[ScenarioParameters]) -> List[ScenarioResult]:
+        """Totals for each scenario, in order"""
+        resolved = [self._resolve(scenario) for scenario in scenarios]
+        if not resolved:
+            return []
+
+        lead_times = np.array([s.reorder_lead_time_days for s in resolved], dtype=np.int64)
+        buffer_days = np.array([s.safety_buffer_days for s in resolved], dtype=np.int64)
+        thresholds = np.array([s.slow_moving_threshold_days for s in resolved], dtype=np.int64)
+
+        # Without variance-based safety stock only lead time + buffer matters
+        if self.daily_sales_std is None:
+            keys = np.stack([lead_times + buffer_days, np.zeros_like(lead_times)], axis=1)
+        else:
+            keys = np.stack([lead_times, buffer_days], axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        units, cost = self._reorder_totals(unique_keys)
+        inverse = inverse.ravel()
+
+        first_slow = np.searchsorted(self.days_since, thresholds, side='left')
+        slow_counts = len(self.days_since) - first_slow
+        capital = self.value_at_or_beyond[first_slow]
+
+        return [
+            ScenarioResult(
+                parameters=scenario,
+                inventory_risks=self.inventory_risks,
+                critical_actions=self.critical_actions,
+                slow_moving_products=int(slow_counts[i]),
+                reorder_recommendations=len(self.reorder_rows),
+                reorder_units=int(units[inverse[i]]),
+                reorder_cost=round(float(cost[inverse[i]]), 2),
+                capital_tied_up=float(capital[i]),
+                total_insights=self.inventory_risks + int(slow_counts[i])
+            )
+            for i, scenario in enumerate(resolved)
+        ]
+
+    def _reorder_totals(self, keys: np.ndarray):
+        """Total units and cost of reorders for each (days, buffer) key"""
+        units = np.zeros(len(keys), dtype=np.int64)
+        cost = np.zeros(len(keys), dtype=np.float64)
+        products = max(len(self.reorder_rows), 1)
+        block = max(settings.SCENARIO_BLOCK_CELLS // products, 1)
+        for start in range(0, len(keys), block):
+            quantities = self._reorder_quantities(keys[start:start + block])
+            units[start:start + block] = quantities.sum(axis=1)
+            cost[start:start + block] = quantities @ self.unit_cost
+        return units, cost
+
+    def _reorder_quantities(self, keys: np.ndarray) -> np.ndarray:
+        """
+        (key x product) reorder quantities
+
+        Follows VectorizedDecisionEngine.generate_reorder_recommendations
+        operation for operation, so the floats round identically.
+        """
+        average_daily_sales = self.average_daily_sales[np.newaxis, :]
+        if self.daily_sales_std is None:
+            # Keys are (lead time + buffer days, unused)
+            quantity_needed = average_daily_sales * keys[:, :1]
+        else:
+            lead_times = keys[:, :1]
+            quantity_needed = average_daily_sales * (lead_times + keys[:, 1:])
+            known = ~np.isnan(self.daily_sales_std)
+            safety_stock = settings.SAFETY_STOCK_Z * self.daily_sales_std[known] * np.sqrt(lead_times)
+            quantity_needed[:, known] = average_daily_sales[:, known] * lead_times + safety_stock
+        quantity_needed[:, self.urgent] *= self.multipliers[self.urgent]
+
+        whole = np.trunc(quantity_needed).astype(np.int64)
+        quantities = whole + (ORDER_QUANTITY_STEP - whole % ORDER_QUANTITY_STEP)
+        quantities = np.maximum(quantities, MIN_ORDER_QUANTITY)
+        quantities[:, ~(self.average_daily_sales > 0)] = TRIAL_ORDER_QUANTITY
+        return quantities
+
+    @staticmethod
+    def _resolve(scenario: ScenarioParameters) -> ScenarioParameters:
+        """The scenario with unset parameters filled from settings"""
+        defaults = {
+            'reorder_lead_time_days': settings.REORDER_LEAD_TIME_DAYS,
+            'slow_moving_threshold_days': settings.SLOW_MOVING_THRESHOLD_DAYS,
+            'safety_buffer_days': SAFETY_BUFFER_DAYS,
+        }
+        return scenario.model_copy(update={
+            name: value for name, value in defaults.items() if getattr(scenario, name) is None
+        })
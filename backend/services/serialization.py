@@ -0,0 +1,165 @@
+"""
+Fast JSON encoding and compression for large responses
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional; without it only gzip is offered
+    brotli = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Encode plain data (dicts, lists, scalars, datetimes, enums) as compact JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def model_json(model: BaseModel) -> bytes:
+    """Encode one pydantic model with pydantic-core's serializer"""
+    return model.__pydantic_serializer__.to_json(model)
+
+
+def object_with_array(fields: Dict[str, Any], key: str, array: bytes) -> bytes:
+    """JSON object of fields plus one member whose value is already-encoded JSON"""
+    return object_with_arrays(fields, {key: array})
+
+
+def object_with_arrays(fields: Dict[str, Any], arrays: Dict[str, bytes]) -> bytes:
+    """JSON object of fields plus members whose values are already-encoded JSON"""
+    head = dumps(fields)
+    members = [dumps(key) + b':' + array for key, array in arrays.items()]
+    if len(head) > 2:
+        members.insert(0, head[1:-1])
+    return b'{' + b','.join(members) + b'}'
+
+
+class JsonRows:
+    """
+    Encoded JSON for each row of a result sequence, built on first use
+
+    Rows may be materialized lazily; each is built and encoded once,
+    then pages are assembled by joining the cached bytes. Concurrent
+    callers may encode the same row twice, which is harmless.
+    """
+
+    def __init__(self, rows: Sequence[BaseModel]):
+        self.rows = rows
+        self._encoded: List[Optional[bytes]] = [None] * len(rows)
+
+    def array(self, positions: Iterable[int]) -> bytes:
+        """JSON array of the rows at positions, in order"""
+        return b'[' + b','.join(self.iter_rows(positions)) + b']'
+
+    def iter_rows(self, positions: Iterable[int]) -> Iterator[bytes]:
+        """Encoded rows at positions, in order, each encoded as it is reached"""
+        encoded = self._encoded
+        for position in positions:
+            value = encoded[position]
+            if value is None:
+                value = encoded[position] = model_json(self.rows[position])
+            yield value
+
+
+def ndjson_frames(rows: Iterable[bytes]) -> Iterator[bytes]:
+    """One encoded row per line"""
+    for row in rows:
+        yield row + b'\n'
+
+
+def sse_frames(rows: Iterable[bytes], event: str, end: Dict[str, Any]) -> Iterator[bytes]:
+    """One server-sent event per row, then an "end" event carrying end"""
+    prefix = b'event: ' + event.encode() + b'\ndata: '
+    for row in rows:
+        yield prefix + row + b'\n\n'
+    yield b'event: end\ndata: ' + dumps(end) + b'\n\n'
+
+
+def stream_chunks(frames: Iterable[bytes], chunk_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Group small frames into chunks of about chunk_bytes
+
+    The first frame is sent on its own so clients see it as soon as it
+    is encoded; later frames are batched to keep per-chunk overhead low.
+    """
+    if chunk_bytes is None:
+        chunk_bytes = settings.STREAM_CHUNK_BYTES
+
+    frames = iter(frames)
+    for first in frames:
+        yield first
+        break
+
+    parts, size = [], 0
+    for frame in frames:
+        parts.append(frame)
+        size += len(frame)
+        if size >= chunk_bytes:
+            yield b''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b''.join(parts)
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Content codings from an Accept-Encoding header, with their q-values"""
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a response body with the best coding the client accepts
+
+    Returns the body and its Content-Encoding (None if left as is).
+    Brotli is preferred when installed, then gzip; bodies smaller than
+    RESPONSE_COMPRESS_MIN_BYTES are not compressed.
+    """
+    if len(body) < settings.RESPONSE_COMPRESS_MIN_BYTES:
+        return body, None
+
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY), 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL), 'gzip'
+    return body, None
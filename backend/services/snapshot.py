@@ -0,0 +1,243 @@
+"""
+Binary columnar snapshots of the dataset
+
+A snapshot is a directory with a JSON manifest and one NumPy .npy file
+per column, grouped into tables:
+
+    manifest.json
+    aggregates/   per-product totals and daily sales buckets
+    inventory/    the computed InventoryTable
+    transactions/ the TransactionHistory, when history is retained
+    transaction_ids/ fingerprints of ingested ids, when deduplicating
+    stock/        imported stock levels, when there are any
+
+String lists (product ids, names, ...) are stored as one UTF-8 byte
+array plus int64 offsets. Uncompressed snapshots are memory-mapped on
+load, so loading costs roughly the size of the string tables no matter
+how many transactions there are. Compressed snapshots store each column
+as a deflated .npz instead; they are smaller but read fully into memory.
+"""
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from core.config import settings
+from services.aggregates import ProductAggregates
+from services.columnar import InventoryTable
+from services.dedup import TransactionIdIndex
+from services.history import TransactionHistory
+from services.stock import StockLevels
+
+
+FORMAT_VERSION = 2
+MANIFEST = 'manifest.json'
+
+Column = Union[np.ndarray, List[str]]
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, unreadable or from another format"""
+
+
+@dataclass
+class Snapshot:
+    """Dataset state restored from a snapshot"""
+    version: int
+    created_at: datetime
+    aggregates: ProductAggregates
+    inventory: InventoryTable
+    history: Optional[TransactionHistory] = None
+    transaction_ids: Optional[TransactionIdIndex] = None
+    stock: Optional[StockLevels] = None
+
+
+def save_snapshot(
+    path: str,
+    aggregates: ProductAggregates,
+    inventory: InventoryTable,
+    history: Optional[TransactionHistory] = None,
+    version: int = 0,
+    compress: Optional[bool] = None,
+    transaction_ids: Optional[TransactionIdIndex] = None,
+    stock: Optional[StockLevels] = None
+) -> Dict:
+    """
+    Write a snapshot directory, replacing any existing one at path
+
+    The snapshot is written next to path and swapped in when complete,
+    so readers never see a partial snapshot. Returns the manifest.
+    """
+    if compress is None:
+        compress = settings.SNAPSHOT_COMPRESS
+
+    tables = {
+        'aggregates': (len(aggregates), aggregates.to_arrays()),
+        'inventory': (
+            len(inventory),
+            {
+                field.name: getattr(inventory, field.name) for field in fields(inventory)
+                if getattr(inventory, field.name) is not None  # Optional columns
+            }
+        ),
+    }
+    if history is not None:
+        tables['transactions'] = (len(history), history.to_arrays())
+    if transaction_ids is not None:
+        tables['transaction_ids'] = (len(transaction_ids), transaction_ids.to_arrays())
+    if stock is not None:
+        tables['stock'] = (len(stock), stock.to_arrays())
+
+    staging = path.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'version': version,
+        'compressed': compress,
+        'tables': {
+            name: _write_table(os.path.join(staging, name), rows, columns, compress)
+            for name, (rows, columns) in tables.items()
+        },
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    previous = path.rstrip(os.sep) + '.old'
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, previous)
+    os.rename(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+def load_snapshot(path: str, with_history: bool = True) -> Snapshot:
+    """Restore aggregates, inventory, any transaction id index and stock levels, and (if saved and wanted) the history"""
+    manifest = read_manifest(path)
+
+    history = None
+    if with_history and 'transactions' in manifest['tables']:
+        history = TransactionHistory.from_arrays(_read_table(path, manifest, 'transactions'))
+    transaction_ids = None
+    if 'transaction_ids' in manifest['tables']:
+        transaction_ids = TransactionIdIndex.from_arrays(_read_table(path, manifest, 'transaction_ids'))
+    stock = None
+    if 'stock' in manifest['tables']:
+        stock = StockLevels.from_arrays(_read_table(path, manifest, 'stock'))
+
+    return Snapshot(
+        version=manifest['version'],
+        created_at=datetime.fromisoformat(manifest['created_at']),
+        aggregates=ProductAggregates.from_arrays(_read_table(path, manifest, 'aggregates')),
+        inventory=InventoryTable(**_read_table(path, manifest, 'inventory')),
+        history=history,
+        transaction_ids=transaction_ids,
+        stock=stock
+    )
+
+
+def read_manifest(path: str) -> Dict:
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f"No snapshot at {path}")
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Unreadable snapshot manifest: {e}")
+
+    if manifest.get('format') != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format: {manifest.get('format')}")
+    return manifest
+
+
+def read_table(path: str, table: str, columns: Optional[Iterable[str]] = None) -> Dict[str, Column]:
+    """
+    Read some or all columns of one snapshot table
+
+    Only the requested columns' files are opened. Numeric columns of an
+    uncompressed snapshot are read-only memory maps.
+    """
+    return _read_table(path, read_manifest(path), table, columns)
+
+
+def _read_table(
+    path: str,
+    manifest: Dict,
+    table: str,
+    columns: Optional[Iterable[str]] = None
+) -> Dict[str, Column]:
+    entry = manifest['tables'].get(table)
+    if entry is None:
+        raise SnapshotError(f"Snapshot has no {table} table")
+
+    if columns is None:
+        columns = list(entry['columns'])
+    unknown = [name for name in columns if name not in entry['columns']]
+    if unknown:
+        raise SnapshotError(f"Unknown {table} columns: {', '.join(unknown)}")
+
+    directory = os.path.join(path, table)
+    compressed = manifest['compressed']
+    result: Dict[str, Column] = {}
+    for name in columns:
+        if entry['columns'][name]['kind'] == 'strings':
+            result[name] = _decode_strings(
+                _read_array(directory, f"{name}.data", compressed),
+                _read_array(directory, f"{name}.offsets", compressed)
+            )
+        else:
+            result[name] = _read_array(directory, name, compressed)
+    return result
+
+
+def _write_table(directory: str, rows: int, columns: Dict[str, Column], compress: bool) -> Dict:
+    os.makedirs(directory)
+    entry = {'rows': rows, 'columns': {}}
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            _write_array(directory, name, values, compress)
+            entry['columns'][name] = {'kind': 'array', 'dtype': str(values.dtype)}
+        else:
+            data, offsets = _encode_strings(values)
+            _write_array(directory, f"{name}.data", data, compress)
+            _write_array(directory, f"{name}.offsets", offsets, compress)
+            entry['columns'][name] = {'kind': 'strings'}
+    return entry
+
+
+def _write_array(directory: str, name: str, values: np.ndarray, compress: bool) -> None:
+    if compress:
+        np.savez_compressed(os.path.join(directory, f"{name}.npz"), values=values)
+    else:
+        np.save(os.path.join(directory, f"{name}.npy"), values)
+
+
+def _read_array(directory: str, name: str, compressed: bool) -> np.ndarray:
+    try:
+        if compressed:
+            with np.load(os.path.join(directory, f"{name}.npz")) as archive:
+                return archive['values']
+        return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Unreadable snapshot column {name}: {e}")
+
+
+def _encode_strings(values: List[str]):
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[start:end].decode('utf-8') for start, end in zip(bounds, bounds[1:])]
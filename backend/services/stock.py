@@ -0,0 +1,151 @@
+"""
+Imported stock-on-hand and unit cost levels per product
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.columnar import StockColumns
+
+
+def _last_given(rows: np.ndarray, given: np.ndarray):
+    """(row, batch position) of the last given value for each distinct row"""
+    positions = np.flatnonzero(given)[::-1]
+    unique_rows, first = np.unique(rows[positions], return_index=True)
+    return unique_rows, positions[first]
+
+
+class StockLevels:
+    """
+    Stock on hand and unit cost per product, keyed by product_id
+
+    Rows are kept sorted by product_id in fixed-width string arrays, so
+    an import is merged in with one vectorized sort, and products are
+    matched to their stock rows with binary searches rather than one
+    dict lookup each. The match of every aggregate slot to its stock row
+    is cached and only extended for products added since, so deriving
+    inventory for changed products indexes the cached rows by slot.
+
+    A stock count holds at the end of its as_of day; units sold on later
+    days are subtracted when inventory is derived. A product without an
+    imported count has stock_on_hand -1, one without a cost NaN.
+    """
+
+    def __init__(self):
+        self.product_ids = np.zeros(0, dtype=str)
+        self.stock_on_hand = np.zeros(0, dtype=np.int64)
+        self.as_of_day = np.zeros(0, dtype=np.int64)
+        self.unit_cost = np.zeros(0, dtype=np.float64)
+        self.version = 0
+        self._joined: Optional[List[str]] = None
+        self._joined_version = -1
+        self._slot_rows = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def upsert(self, batch: StockColumns, as_of_day: int) -> np.ndarray:
+        """
+        Merge an import into the levels, returning the rows it touched
+
+        Products not seen before are added. For each product the last
+        given stock_on_hand and unit_cost of the batch win; values left
+        blank keep what was imported before.
+        """
+        if len(batch) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        # The one string sort: the batch; merging it in is then linear
+        order = np.argsort(batch.product_ids, kind='stable')
+        ids = batch.product_ids[order]
+        first = np.concatenate([[True], ids[1:] != ids[:-1]])
+        batch_rows = self._merge(ids[first])[np.cumsum(first) - 1]
+
+        stock_rows, source = _last_given(batch_rows, batch.stock_on_hand[order] >= 0)
+        self.stock_on_hand[stock_rows] = batch.stock_on_hand[order[source]]
+        self.as_of_day[stock_rows] = as_of_day
+        cost_rows, source = _last_given(batch_rows, ~np.isnan(batch.unit_cost[order]))
+        self.unit_cost[cost_rows] = batch.unit_cost[order[source]]
+
+        self.version += 1
+        return batch_rows[first]
+
+    def rows_for(self, product_ids: Sequence[str]) -> np.ndarray:
+        """Stock row of each product id, -1 where none was imported"""
+        if len(self.product_ids) == 0 or len(product_ids) == 0:
+            return np.full(len(product_ids), -1, dtype=np.int64)
+        keys = np.array(product_ids, dtype=str)
+        rows = np.minimum(np.searchsorted(self.product_ids, keys), len(self.product_ids) - 1)
+        return np.where(self.product_ids[rows] == keys, rows, -1)
+
+    def slot_rows(self, product_ids: List[str], slots: np.ndarray) -> np.ndarray:
+        """
+        Stock rows of aggregate slots, given the aggregates' product_ids
+
+        The cache is rebuilt when the aggregates object (its product id
+        list) or the levels change, and extended when products are added.
+        """
+        if self._joined is not product_ids or self._joined_version != self.version:
+            self._joined, self._joined_version = product_ids, self.version
+            self._slot_rows = np.zeros(0, dtype=np.int64)
+        joined = len(self._slot_rows)
+        if joined < len(product_ids):
+            self._slot_rows = np.concatenate([self._slot_rows, self.rows_for(product_ids[joined:])])
+        return self._slot_rows[slots]
+
+    def memory_bytes(self) -> int:
+        return (
+            self.product_ids.nbytes + self.stock_on_hand.nbytes + self.as_of_day.nbytes
+            + self.unit_cost.nbytes + self._slot_rows.nbytes
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'product_ids': self.product_ids,
+            'stock_on_hand': self.stock_on_hand,
+            'as_of_day': self.as_of_day,
+            'unit_cost': self.unit_cost,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'StockLevels':
+        levels = cls()
+        # Copied out of any read-only memory map, since imports update in place
+        levels.product_ids = np.array(arrays['product_ids'], dtype=str)
+        levels.stock_on_hand = np.array(arrays['stock_on_hand'], dtype=np.int64)
+        levels.as_of_day = np.array(arrays['as_of_day'], dtype=np.int64)
+        levels.unit_cost = np.array(arrays['unit_cost'], dtype=np.float64)
+        return levels
+
+    def _merge(self, product_ids: np.ndarray) -> np.ndarray:
+        """
+        Add sorted, distinct product ids not present yet
+
+        Returns the row of each of them after the merge.
+        """
+        existing = len(self.product_ids)
+        combined = np.concatenate([self.product_ids, product_ids])
+        # Timsort finds the two sorted runs, so this is a linear merge;
+        # being stable, an id already present comes before the batch's
+        merge_order = np.argsort(combined, kind='stable')
+        merged = combined[merge_order]
+        repeated = np.concatenate([[False], merged[1:] == merged[:-1]])
+        rows = np.empty(len(combined), dtype=np.int64)
+        rows[merge_order] = np.cumsum(~repeated) - 1
+        present = np.count_nonzero(repeated)
+        if present < len(product_ids):
+            count = len(merged) - present
+            old_rows = rows[:existing]
+            self.product_ids = merged[~repeated]
+            self.stock_on_hand = self._spread(self.stock_on_hand, old_rows, count, -1)
+            self.as_of_day = self._spread(self.as_of_day, old_rows, count, 0)
+            self.unit_cost = self._spread(self.unit_cost, old_rows, count, np.nan)
+        return rows[existing:]
+
+    @staticmethod
+    def _spread(values: np.ndarray, rows: np.ndarray, count: int, fill) -> np.ndarray:
+        """values moved to the given rows of a new column of count rows"""
+        spread = np.full(count, fill, dtype=values.dtype)
+        spread[rows] = values
+        return spread
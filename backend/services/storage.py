@@ -0,0 +1,514 @@
+"""
+Durable transaction storage shared between worker processes
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from core.config import settings
+from services.columnar import DATETIME_DTYPE, StockColumns, TransactionColumns, dictionary_encode
+
+
+@dataclass(frozen=True)
+class StoreState:
+    """
+    Position in a store's history
+
+    generation changes whenever the stored data is replaced; version
+    increases with every committed write; last_row_id is the highest
+    row id committed so far. Rows are only ever appended within a
+    generation, so rows after last_row_id are exactly the newer ones.
+    stock_version increases with every change to the stock levels,
+    which are kept across generations.
+    """
+    generation: int
+    version: int
+    last_row_id: int
+    stock_version: int = 0
+
+
+class TransactionStore:
+    """Interface for storage backends"""
+
+    def state(self) -> StoreState:
+        """Current position of the stored history"""
+        raise NotImplementedError
+
+    def epoch(self) -> str:
+        """Id chosen when the store was created, so versions of different stores never match"""
+        raise NotImplementedError
+
+    def read_rows(self, after_row_id: int, up_to_row_id: int) -> Iterator[TransactionColumns]:
+        """Committed rows with ids in (after_row_id, up_to_row_id], in batches"""
+        raise NotImplementedError
+
+    def writer(self, replace: bool = False, skip_existing_ids: bool = False) -> 'StoreWriter':
+        """Start writing an upload; see StoreWriter"""
+        raise NotImplementedError
+
+    def read_stock(self) -> Dict[str, np.ndarray]:
+        """Stock levels as StockLevels.to_arrays() columns, sorted by product_id"""
+        raise NotImplementedError
+
+    def import_stock(self, batch: StockColumns, as_of_day: int) -> StoreState:
+        """
+        Merge stock rows like StockLevels.upsert and commit them
+
+        Blank values (stock_on_hand -1, unit_cost NaN) keep the stored
+        ones. Returns the state after the commit.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class StoreWriter:
+    """
+    One upload being written, used as a context manager
+
+    Rows passed to add() are staged privately. begin() blocks other
+    writers and returns the store state at that point; commit() then
+    appends the staged rows (or replaces all data with them) and makes
+    them visible. Leaving the context without committing discards them.
+
+    With skip_existing_ids, an appending commit() leaves out staged rows
+    whose transaction_id is already stored, checked under the write
+    lock so rows committed by other processes meanwhile count too, and
+    sets rows_skipped to their number.
+    """
+    rows_skipped = 0
+
+    def add(self, batch: TransactionColumns) -> None:
+        raise NotImplementedError
+
+    def begin(self) -> StoreState:
+        raise NotImplementedError
+
+    def read_rows(self, after_row_id: int, up_to_row_id: int) -> Iterator[TransactionColumns]:
+        """Read committed rows while holding the write lock"""
+        raise NotImplementedError
+
+    def read_stock(self) -> Dict[str, np.ndarray]:
+        """Read the stock levels while holding the write lock"""
+        raise NotImplementedError
+
+    def clear_stock(self) -> None:
+        """Delete all stock levels as part of this write; call after begin()"""
+        raise NotImplementedError
+
+    def commit(self) -> StoreState:
+        raise NotImplementedError
+
+    def __enter__(self) -> 'StoreWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    transaction_date INTEGER NOT NULL,  -- Microseconds since the epoch, UTC
+    customer_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_product_id ON transactions (product_id, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_transaction_date ON transactions (transaction_date);
+CREATE TABLE IF NOT EXISTS store_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    generation INTEGER NOT NULL,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_meta (id, generation, version) VALUES (0, 0, 0);
+CREATE TABLE IF NOT EXISTS stock_levels (
+    product_id TEXT PRIMARY KEY,
+    stock_on_hand INTEGER NOT NULL,  -- -1 when never imported
+    as_of_day INTEGER NOT NULL,      -- Days since the epoch the count holds at the end of
+    unit_cost REAL                   -- NULL when never imported
+);
+CREATE TABLE IF NOT EXISTS stock_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stock_meta (id, version) VALUES (0, 0);
+CREATE TABLE IF NOT EXISTS store_epoch (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    epoch TEXT NOT NULL
+);
+INSERT OR IGNORE INTO store_epoch (id, epoch) VALUES (0, lower(hex(randomblob(4))));
+"""
+
+_STATE_QUERY = """
+SELECT generation, version, (SELECT COALESCE(MAX(id), 0) FROM transactions),
+    (SELECT version FROM stock_meta WHERE id = 0)
+FROM store_meta WHERE id = 0
+"""
+
+# A blank stock_on_hand or unit_cost keeps the stored value
+_UPSERT_STOCK = """
+INSERT INTO stock_levels (product_id, stock_on_hand, as_of_day, unit_cost) VALUES (?, ?, ?, ?)
+ON CONFLICT (product_id) DO UPDATE SET
+    stock_on_hand = CASE WHEN excluded.stock_on_hand >= 0 THEN excluded.stock_on_hand ELSE stock_on_hand END,
+    as_of_day = CASE WHEN excluded.stock_on_hand >= 0 THEN excluded.as_of_day ELSE as_of_day END,
+    unit_cost = COALESCE(excluded.unit_cost, unit_cost)
+"""
+
+_STAGE = """
+INSERT INTO temp.staged_transactions
+    (transaction_id, product_id, product_name, quantity, unit_price, transaction_date, customer_id)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Only stores written with deduplication need it; others may hold repeated
+# ids, so it is not UNIQUE
+_ID_INDEX = "CREATE INDEX IF NOT EXISTS idx_transactions_transaction_id ON transactions (transaction_id)"
+
+_SELECT_COLUMNS = (
+    "transaction_id, product_id, product_name, quantity, unit_price, transaction_date, customer_id"
+)
+
+
+class SqliteConnectionPool:
+    """
+    Fixed-size pool of SQLite connections usable from any thread
+
+    Connections run in autocommit mode with WAL journaling, so readers
+    never block the single writer; transactions are opened explicitly.
+    Pooled connections are only held for short reads, never while
+    waiting on other locks.
+    """
+
+    def __init__(self, path: str, size: int, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._idle: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._capacity = threading.Semaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        self._capacity.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._capacity.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def connect(self) -> sqlite3.Connection:
+        """A new connection with the pool's settings, which the caller closes"""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Index pages touched by a large upload should stay cached
+        conn.execute(f"PRAGMA cache_size=-{settings.STORAGE_CACHE_MB * 1024}")
+        return conn
+
+
+class SqliteTransactionStore(TransactionStore):
+    """Transactions in one SQLite file, indexed by product and date"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.path = path or settings.STORAGE_PATH
+        self.batch_size = batch_size or settings.STORAGE_BATCH_SIZE
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.pool = SqliteConnectionPool(
+            self.path,
+            pool_size or settings.STORAGE_POOL_SIZE,
+            timeout or settings.STORAGE_TIMEOUT_SECONDS
+        )
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def state(self) -> StoreState:
+        with self.pool.connection() as conn:
+            return _read_state(conn)
+
+    def epoch(self) -> str:
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT epoch FROM store_epoch WHERE id = 0").fetchone()[0]
+
+    def read_rows(self, after_row_id: int, up_to_row_id: int) -> Iterator[TransactionColumns]:
+        with self.pool.connection() as conn:
+            yield from _read_rows(conn, after_row_id, up_to_row_id, self.batch_size)
+
+    def read_product(
+        self,
+        product_id: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> TransactionColumns:
+        """One product's transactions, optionally within [since, until)"""
+        query = f"SELECT {_SELECT_COLUMNS} FROM transactions WHERE product_id = ?"
+        params: list = [product_id]
+        if since is not None:
+            query += " AND transaction_date >= ?"
+            params.append(_to_micros(since))
+        if until is not None:
+            query += " AND transaction_date < ?"
+            params.append(_to_micros(until))
+
+        with self.pool.connection() as conn:
+            rows = conn.execute(query + " ORDER BY transaction_date", params).fetchall()
+        return _rows_to_columns(rows)
+
+    def writer(self, replace: bool = False, skip_existing_ids: bool = False) -> 'SqliteWriter':
+        return SqliteWriter(self, replace, skip_existing_ids)
+
+    def read_stock(self) -> Dict[str, np.ndarray]:
+        with self.pool.connection() as conn:
+            return _read_stock(conn)
+
+    def import_stock(self, batch: StockColumns, as_of_day: int) -> StoreState:
+        stock_on_hand = batch.stock_on_hand.tolist()
+        rows = zip(
+            batch.product_ids.tolist(),
+            stock_on_hand,
+            [as_of_day if stock >= 0 else 0 for stock in stock_on_hand],
+            [None if np.isnan(cost) else cost for cost in batch.unit_cost.tolist()]
+        )
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(_UPSERT_STOCK, rows)
+                conn.execute("UPDATE stock_meta SET version = version + 1 WHERE id = 0")
+                conn.execute("UPDATE store_meta SET version = version + 1 WHERE id = 0")
+                state = _read_state(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return state
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class SqliteWriter(StoreWriter):
+    """
+    Upload staged in a per-connection TEMP table
+
+    Staging does not touch the shared database file, so parsing a large
+    upload does not block other processes; the write lock is only held
+    from begin() until the staged rows have been copied and committed.
+
+    Each writer has a connection of its own rather than one from the
+    pool: an upload holds it for the whole parse and then waits for the
+    dataset lock, while a sync holding the dataset lock needs a pooled
+    connection, so sharing the pool could deadlock.
+    """
+
+    def __init__(self, store: SqliteTransactionStore, replace: bool, skip_existing_ids: bool = False):
+        self.store = store
+        self.replace = replace
+        self.skip_existing_ids = skip_existing_ids
+        self.rows_staged = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> 'SqliteWriter':
+        self._conn = self.store.pool.connect()
+        self._conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS staged_transactions AS "
+            f"SELECT {_SELECT_COLUMNS} FROM transactions WHERE 0"
+        )
+        self._conn.execute("DELETE FROM temp.staged_transactions")
+        if self.skip_existing_ids:
+            self._conn.execute(_ID_INDEX)
+        return self
+
+    def add(self, batch: TransactionColumns) -> None:
+        if len(batch) == 0:
+            return
+
+        dates = batch.transaction_date.astype(DATETIME_DTYPE).view(np.int64).tolist()
+        product_ids = [batch.product_ids[code] for code in batch.product_codes.tolist()]
+        product_names = [batch.product_names[code] for code in batch.product_name_codes.tolist()]
+        customer_ids = [
+            batch.customer_ids[code] if code >= 0 else None
+            for code in batch.customer_codes.tolist()
+        ]
+        rows = zip(
+            batch.transaction_ids.tolist(),
+            product_ids,
+            product_names,
+            batch.quantity.tolist(),
+            batch.unit_price.tolist(),
+            dates,
+            customer_ids
+        )
+        self._conn.execute("BEGIN")
+        self._conn.executemany(_STAGE, rows)
+        self._conn.execute("COMMIT")
+        self.rows_staged += len(batch)
+
+    def begin(self) -> StoreState:
+        # BEGIN IMMEDIATE takes the write lock now, so no other process
+        # can commit between reading this state and commit()
+        self._conn.execute("BEGIN IMMEDIATE")
+        self.base = _read_state(self._conn)
+        return self.base
+
+    def read_rows(self, after_row_id: int, up_to_row_id: int) -> Iterator[TransactionColumns]:
+        return _read_rows(self._conn, after_row_id, up_to_row_id, self.store.batch_size)
+
+    def read_stock(self) -> Dict[str, np.ndarray]:
+        return _read_stock(self._conn)
+
+    def clear_stock(self) -> None:
+        self._conn.execute("DELETE FROM stock_levels")
+        self._conn.execute("UPDATE stock_meta SET version = version + 1 WHERE id = 0")
+
+    def commit(self) -> StoreState:
+        if not self._conn.in_transaction:
+            self.begin()
+        if self.replace:
+            self._conn.execute("DELETE FROM transactions")
+            self._conn.execute("UPDATE store_meta SET generation = generation + 1 WHERE id = 0")
+        query = (
+            f"INSERT INTO transactions ({_SELECT_COLUMNS}) "
+            f"SELECT {_SELECT_COLUMNS} FROM temp.staged_transactions AS staged"
+        )
+        if self.skip_existing_ids and not self.replace:
+            query += (
+                " WHERE NOT EXISTS (SELECT 1 FROM transactions"
+                " WHERE transactions.transaction_id = staged.transaction_id)"
+            )
+        inserted = self._conn.execute(query + " ORDER BY staged.rowid").rowcount
+        self.rows_skipped = self.rows_staged - inserted
+        self._conn.execute("UPDATE store_meta SET version = version + 1 WHERE id = 0")
+        state = _read_state(self._conn)
+        self._conn.execute("COMMIT")
+        return state
+
+    def __exit__(self, *exc_info) -> None:
+        if self._conn is None:
+            return
+        try:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            self._conn.execute("DELETE FROM temp.staged_transactions")
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+def _read_state(conn: sqlite3.Connection) -> StoreState:
+    generation, version, last_row_id, stock_version = conn.execute(_STATE_QUERY).fetchone()
+    return StoreState(generation, version, last_row_id, stock_version)
+
+
+def _read_stock(conn: sqlite3.Connection) -> Dict[str, np.ndarray]:
+    rows = conn.execute(
+        "SELECT product_id, stock_on_hand, as_of_day, unit_cost FROM stock_levels"
+    ).fetchall()
+    product_ids, stock_on_hand, as_of_day, unit_cost = zip(*rows) if rows else ((), (), (), ())
+    product_ids = np.array(product_ids, dtype=str)
+    order = np.argsort(product_ids, kind='stable')
+    return {
+        'product_ids': product_ids[order],
+        'stock_on_hand': np.array(stock_on_hand, dtype=np.int64)[order],
+        'as_of_day': np.array(as_of_day, dtype=np.int64)[order],
+        'unit_cost': np.array([np.nan if cost is None else cost for cost in unit_cost], dtype=np.float64)[order],
+    }
+
+
+def _read_rows(
+    conn: sqlite3.Connection,
+    after_row_id: int,
+    up_to_row_id: int,
+    batch_size: int
+) -> Iterator[TransactionColumns]:
+    cursor = conn.execute(
+        f"SELECT {_SELECT_COLUMNS} FROM transactions WHERE id > ? AND id <= ? ORDER BY id",
+        (after_row_id, up_to_row_id)
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield _rows_to_columns(rows)
+
+
+def _rows_to_columns(rows: List[tuple]) -> TransactionColumns:
+    if not rows:
+        return TransactionColumns.empty()
+
+    transaction_ids, product_ids, product_names, quantity, unit_price, dates, customer_ids = zip(*rows)
+    product_codes, product_id_values = dictionary_encode(product_ids)
+    product_name_codes, product_name_values = dictionary_encode(product_names)
+
+    # Missing customers are stored as NULL and encoded as -1
+    customer_codes, customer_values = dictionary_encode(customer_ids)
+    if None in customer_values:
+        missing = customer_values.index(None)
+        customer_codes = np.where(
+            customer_codes == missing, -1, customer_codes - (customer_codes > missing)
+        ).astype(np.int32)
+        del customer_values[missing]
+
+    return TransactionColumns(
+        transaction_ids=np.array(transaction_ids, dtype=object),
+        product_codes=product_codes,
+        product_ids=product_id_values,
+        product_name_codes=product_name_codes,
+        product_names=product_name_values,
+        quantity=np.array(quantity, dtype=np.int64),
+        unit_price=np.array(unit_price, dtype=np.float64),
+        transaction_date=np.array(dates, dtype=np.int64).view(DATETIME_DTYPE),
+        customer_codes=customer_codes,
+        customer_ids=customer_values,
+    )
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(value, 'us').view(np.int64))
+
+
+def create_store() -> Optional[TransactionStore]:
+    """Store selected by STORAGE_BACKEND, or None to keep data in memory only"""
+    if settings.STORAGE_BACKEND == "sqlite":
+        return SqliteTransactionStore()
+    if settings.STORAGE_BACKEND != "memory":
+        raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+    return None
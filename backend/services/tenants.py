@@ -0,0 +1,240 @@
+"""
+Tenant-scoped datasets and decision pipelines with LRU residency
+"""
+
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.config import settings
+from services.data_service import DataService
+from services.dataset import Dataset
+from services.decision_cache import DecisionCache, DecisionPipeline
+from services.decision_service import DecisionService
+
+
+TENANT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class TenantNotFound(Exception):
+    """Raised when a tenant has no resident or saved data"""
+
+
+@dataclass
+class Tenant:
+    """One tenant's dataset and the decision pipeline over it"""
+    tenant_id: str
+    dataset: Dataset
+    pipeline: DecisionPipeline
+    pins: int = 0  # Requests currently using the tenant; pinned tenants are not evicted
+    saved_version: Optional[int] = None  # Dataset version in the tenant's snapshot
+    memory_bytes: int = 0  # Estimate taken when the tenant was last released
+    loaded: bool = True  # False until its snapshot has been read back in
+    deleted: bool = False  # Set by delete(); an eviction in progress then saves nothing
+    io_lock: threading.Lock = field(default_factory=threading.Lock)  # Held while loading or saving
+
+
+class TenantRegistry:
+    """
+    Per-tenant datasets kept in memory in least-recently-used order
+
+    Each tenant has its own dataset, inventory and decision cache. When
+    more than max_resident tenants are loaded, or their estimated memory
+    exceeds the budget, the least recently used unpinned tenants are
+    saved as snapshots under tenant_dir and dropped from memory. The
+    next request for an evicted tenant reloads its snapshot.
+
+    Snapshots are read and written outside the registry lock, under the
+    tenant's own io_lock, so a large tenant being loaded or saved only
+    holds up requests for that tenant. A tenant is kept in _evicting
+    while its snapshot is written; a request for it meanwhile takes it
+    back with its data still in memory.
+    """
+
+    def __init__(
+        self,
+        tenant_dir: Optional[str] = None,
+        max_resident: Optional[int] = None,
+        memory_budget_bytes: Optional[int] = None
+    ):
+        self.tenant_dir = tenant_dir or settings.TENANT_DIR
+        self.max_resident = max_resident or settings.TENANT_MAX_RESIDENT
+        self.memory_budget_bytes = memory_budget_bytes or settings.TENANT_MEMORY_BUDGET_MB * 1024 * 1024
+        self.data_service = DataService()
+        self.decision_service = DecisionService()
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._evicting: Dict[str, Tenant] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    @contextmanager
+    def use(self, tenant_id: str, create: bool = False) -> Iterator[Tenant]:
+        """
+        Pin a tenant for the duration of a request
+
+        Loads an evicted tenant from its snapshot. Unknown tenants are
+        created if create is set, otherwise TenantNotFound is raised.
+        """
+        tenant = self._acquire(tenant_id, create)
+        try:
+            yield tenant
+        finally:
+            # Measured outside the registry lock: it waits for the dataset lock
+            memory_bytes = tenant.dataset.memory_bytes()
+            with self._lock:
+                tenant.pins -= 1
+                tenant.memory_bytes = memory_bytes
+            self._evict()
+
+    def exists(self, tenant_id: str) -> bool:
+        with self._lock:
+            return (
+                tenant_id in self._tenants or tenant_id in self._evicting
+                or os.path.isdir(self._snapshot_path(tenant_id))
+            )
+
+    def delete(self, tenant_id: str) -> bool:
+        """Forget a tenant and its saved snapshot; returns whether it existed"""
+        with self._lock:
+            tenants = [
+                tenant for tenant in (self._tenants.pop(tenant_id, None), self._evicting.pop(tenant_id, None))
+                if tenant is not None
+            ]
+        for tenant in tenants:
+            # Waits for a load or save of this tenant already under way
+            with tenant.io_lock:
+                tenant.deleted = True
+
+        path = self._snapshot_path(tenant_id)
+        saved = os.path.isdir(path)
+        shutil.rmtree(path, ignore_errors=True)
+        return bool(tenants) or saved
+
+    def stats(self) -> Dict[str, Any]:
+        """Resident tenants with their memory use, and lifetime counters"""
+        with self._lock:
+            tenants = list(self._tenants.values())
+        resident = [
+            {"tenant_id": tenant.tenant_id, "memory_bytes": tenant.memory_bytes,
+             "version": tenant.dataset.version, "products": len(tenant.dataset)}
+            for tenant in reversed(tenants)
+        ]
+        return {
+            "resident": resident,
+            "resident_memory_bytes": sum(entry["memory_bytes"] for entry in resident),
+            "max_resident": self.max_resident,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "saved": self.saved_tenants(),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def saved_tenants(self) -> List[str]:
+        """Tenants with a snapshot on disk"""
+        if not os.path.isdir(self.tenant_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.tenant_dir)
+            if TENANT_ID_PATTERN.match(name) and os.path.isdir(os.path.join(self.tenant_dir, name))
+        )
+
+    def _acquire(self, tenant_id: str, create: bool) -> Tenant:
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError("Tenant ids are 1-64 letters, digits, '-' or '_'")
+
+        with self._lock:
+            tenant = self._tenants.get(tenant_id) or self._evicting.get(tenant_id)
+            if tenant is None:
+                if os.path.isdir(self._snapshot_path(tenant_id)):
+                    tenant = self._new_tenant(tenant_id)
+                    tenant.loaded = False
+                elif create:
+                    tenant = self._new_tenant(tenant_id)
+                else:
+                    raise TenantNotFound(f"Unknown tenant: {tenant_id}")
+            self._tenants[tenant_id] = tenant
+            self._tenants.move_to_end(tenant_id)
+            tenant.pins += 1
+
+        if not tenant.loaded:
+            try:
+                self._load(tenant)
+            except BaseException:
+                with self._lock:
+                    tenant.pins -= 1
+                    if self._tenants.get(tenant_id) is tenant and not tenant.loaded:
+                        del self._tenants[tenant_id]
+                raise
+        return tenant
+
+    def _load(self, tenant: Tenant) -> None:
+        """Read an evicted tenant's snapshot; concurrent requests for it wait here"""
+        with tenant.io_lock:
+            if tenant.loaded:
+                return
+            tenant.dataset.load_snapshot(self._snapshot_path(tenant.tenant_id))
+            tenant.saved_version = tenant.dataset.version
+            tenant.loaded = True
+        with self._lock:
+            self.loads += 1
+
+    def _new_tenant(self, tenant_id: str) -> Tenant:
+        dataset = Dataset(self.data_service)
+        pipeline = DecisionPipeline(
+            dataset,
+            self.decision_service,
+            cache=DecisionCache(max_entries=settings.TENANT_DECISION_CACHE_ENTRIES)
+        )
+        return Tenant(tenant_id=tenant_id, dataset=dataset, pipeline=pipeline)
+
+    def _evict(self) -> None:
+        """Snapshot and drop least recently used tenants until within limits"""
+        victims = []
+        with self._lock:
+            resident_bytes = sum(tenant.memory_bytes for tenant in self._tenants.values())
+
+            for tenant in list(self._tenants.values()):
+                if len(self._tenants) <= self.max_resident and resident_bytes <= self.memory_budget_bytes:
+                    break
+                if tenant.pins:
+                    continue
+                del self._tenants[tenant.tenant_id]
+                self._evicting[tenant.tenant_id] = tenant
+                resident_bytes -= tenant.memory_bytes
+                self.evictions += 1
+                victims.append(tenant)
+
+        for tenant in victims:
+            self._save(tenant)
+
+    def _save(self, tenant: Tenant) -> None:
+        """Write an evicted tenant's snapshot if its data changed since the last one"""
+        try:
+            with tenant.io_lock:
+                if tenant.loaded and not tenant.deleted and tenant.dataset:
+                    with tenant.dataset.lock:
+                        if tenant.dataset.version != tenant.saved_version:
+                            tenant.dataset.save_snapshot(self._snapshot_path(tenant.tenant_id))
+                            tenant.saved_version = tenant.dataset.version
+        except BaseException:
+            # Keep the data in memory rather than lose it
+            with self._lock:
+                if self._evicting.get(tenant.tenant_id) is tenant:
+                    self._tenants.setdefault(tenant.tenant_id, tenant)
+            raise
+        finally:
+            with self._lock:
+                if self._evicting.get(tenant.tenant_id) is tenant:
+                    del self._evicting[tenant.tenant_id]
+
+    def _snapshot_path(self, tenant_id: str) -> str:
+        return os.path.join(self.tenant_dir, tenant_id)
+
+
+tenant_registry = TenantRegistry()
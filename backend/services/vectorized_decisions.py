@@ -0,0 +1,390 @@
+"""
+Vectorized decision engine over columnar inventory
+
+Computes the same results as DecisionService, but evaluates risk tiers,
+slow-mover flags and reorder quantities as whole-array operations over
+an InventoryTable. Results are returned as lazy row sequences: pydantic
+models are only built for the rows that are actually read.
+"""
+
+from datetime import datetime
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar, Union
+
+import numpy as np
+
+from core.config import settings
+from core.models import (
+    DecisionInsight,
+    DecisionType,
+    InventoryRisk,
+    ReorderRecommendation,
+    RiskLevel,
+    SlowMovingProduct,
+)
+from services.columnar import InventoryTable
+from services.decision_service import (
+    DISCONTINUE_AFTER_DAYS,
+    MIN_ORDER_QUANTITY,
+    ORDER_QUANTITY_STEP,
+    OUT_OF_STOCK_ACTION,
+    OUT_OF_STOCK_REASON,
+    RISK_PRIORITY,
+    SAFETY_BUFFER_DAYS,
+    STOCK_UNIT_VALUE,
+    STOCKOUT_RISK_TIERS,
+    TRIAL_ORDER_QUANTITY,
+    URGENCY_MULTIPLIERS,
+    demand_safety_stock,
+    reorder_reasoning,
+    risk_insight,
+    slow_mover_action,
+    slow_mover_insight,
+    stockout_risk_message,
+    trial_order_reasoning,
+)
+
+
+T = TypeVar('T')
+
+# Risk levels indexed by their priority code
+LEVELS_BY_PRIORITY = sorted(RISK_PRIORITY, key=RISK_PRIORITY.get)
+
+DECISION_TYPE_CODES = {decision_type: code for code, decision_type in enumerate(DecisionType)}
+
+# Priority, decision type code and product id of each result row
+IndexColumns = Tuple[np.ndarray, np.ndarray, List[str]]
+
+
+class LazyRows(Sequence[T], Generic[T]):
+    """
+    Read-only sequence of result rows built on first access
+
+    Subclasses hold the results as arrays and implement _build to turn
+    one position into a model. Built models are memoized.
+    """
+
+    def __init__(self, size: int):
+        self._built: List[Optional[T]] = [None] * size
+
+    def __len__(self) -> int:
+        return len(self._built)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("result row index out of range")
+
+        row = self._built[index]
+        if row is None:
+            row = self._built[index] = self._build(index)
+        return row
+
+    def index_columns(self) -> IndexColumns:
+        """Per-row priority, decision type and product id for indexing"""
+        raise NotImplementedError
+
+    def _build(self, position: int) -> T:
+        raise NotImplementedError
+
+
+def slow_mover_priorities(days_since_last_sale: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Priority and decision type a slow mover gets as an insight"""
+    discontinue = days_since_last_sale >= DISCONTINUE_AFTER_DAYS
+    priorities = np.where(
+        discontinue, RISK_PRIORITY[RiskLevel.HIGH], RISK_PRIORITY[RiskLevel.MEDIUM]
+    ).astype(np.int8)
+    decision_types = np.where(
+        discontinue,
+        DECISION_TYPE_CODES[DecisionType.DISCONTINUE],
+        DECISION_TYPE_CODES[DecisionType.REVIEW]
+    ).astype(np.int8)
+    return priorities, decision_types
+
+
+def _reorder_types(count: int) -> np.ndarray:
+    return np.full(count, DECISION_TYPE_CODES[DecisionType.REORDER], dtype=np.int8)
+
+
+def _count_by_level(priorities: np.ndarray) -> Dict[RiskLevel, int]:
+    counts = np.bincount(priorities, minlength=len(LEVELS_BY_PRIORITY))
+    return {level: int(counts[code]) for code, level in enumerate(LEVELS_BY_PRIORITY)}
+
+
+class RiskRows(LazyRows[InventoryRisk]):
+    """Inventory risks, ordered critical first"""
+
+    def __init__(
+        self,
+        table: InventoryTable,
+        rows: np.ndarray,
+        priorities: np.ndarray,
+        days: np.ndarray,
+        out_of_stock: np.ndarray
+    ):
+        super().__init__(len(rows))
+        self.table = table
+        self.rows = rows
+        self.priorities = priorities
+        self.days = days
+        self.out_of_stock = out_of_stock
+
+    def count_by_level(self) -> Dict[RiskLevel, int]:
+        return _count_by_level(self.priorities)
+
+    def index_columns(self) -> IndexColumns:
+        product_ids = [self.table.product_ids[row] for row in self.rows]
+        return self.priorities, _reorder_types(len(self)), product_ids
+
+    def _build(self, position: int) -> InventoryRisk:
+        row = self.rows[position]
+        risk_level = LEVELS_BY_PRIORITY[self.priorities[position]]
+        days = self.days[position]
+
+        if self.out_of_stock[position]:
+            risk_reason, recommended_action = OUT_OF_STOCK_REASON, OUT_OF_STOCK_ACTION
+            days_until_stockout = 0
+        elif np.isnan(days):
+            risk_reason, recommended_action = "", ""
+            days_until_stockout = None
+        else:
+            days_until_stockout = float(days)
+            risk_reason, recommended_action = stockout_risk_message(risk_level, days_until_stockout)
+
+        return InventoryRisk(
+            product_id=self.table.product_ids[row],
+            product_name=self.table.product_names[row],
+            risk_level=risk_level,
+            risk_reason=risk_reason,
+            current_stock=int(self.table.current_stock[row]),
+            days_until_stockout=days_until_stockout,
+            recommended_action=recommended_action
+        )
+
+
+class SlowMoverRows(LazyRows[SlowMovingProduct]):
+    """Slow-moving products, longest without a sale first"""
+
+    def __init__(self, table: InventoryTable, rows: np.ndarray, days_since_last_sale: np.ndarray):
+        super().__init__(len(rows))
+        self.table = table
+        self.rows = rows
+        self.days_since_last_sale = days_since_last_sale
+        unit_cost = table.unit_cost[rows]
+        self.total_value = table.current_stock[rows] * np.where(unit_cost > 0, unit_cost, STOCK_UNIT_VALUE)
+
+    def index_columns(self) -> IndexColumns:
+        priorities, decision_types = slow_mover_priorities(self.days_since_last_sale)
+        product_ids = [self.table.product_ids[row] for row in self.rows]
+        return priorities, decision_types, product_ids
+
+    def _build(self, position: int) -> SlowMovingProduct:
+        row = self.rows[position]
+        days = int(self.days_since_last_sale[position])
+        current_stock = int(self.table.current_stock[row])
+
+        return SlowMovingProduct(
+            product_id=self.table.product_ids[row],
+            product_name=self.table.product_names[row],
+            days_since_last_sale=days,
+            current_stock=current_stock,
+            total_value=float(self.total_value[position]),
+            recommended_action=slow_mover_action(days, current_stock)
+        )
+
+
+class ReorderRows(LazyRows[ReorderRecommendation]):
+    """Reorder recommendations, most urgent first"""
+
+    def __init__(
+        self,
+        table: InventoryTable,
+        rows: np.ndarray,
+        priorities: np.ndarray,
+        quantities: np.ndarray,
+        lead_time_days: int
+    ):
+        super().__init__(len(rows))
+        self.table = table
+        self.rows = rows
+        self.priorities = priorities
+        self.quantities = quantities
+        self.lead_time_days = lead_time_days
+
+        # Position of each table row's recommendation, or -1
+        self.position_by_row = np.full(len(table), -1, dtype=np.int64)
+        self.position_by_row[rows] = np.arange(len(rows))
+
+    def for_row(self, row: int) -> Optional[ReorderRecommendation]:
+        """Recommendation for a table row, if there is one"""
+        position = self.position_by_row[row]
+        return self[position] if position >= 0 else None
+
+    def index_columns(self) -> IndexColumns:
+        product_ids = [self.table.product_ids[row] for row in self.rows]
+        return self.priorities, _reorder_types(len(self)), product_ids
+
+    def _build(self, position: int) -> ReorderRecommendation:
+        row = self.rows[position]
+        current_stock = int(self.table.current_stock[row])
+        average_daily_sales = float(self.table.average_daily_sales[row])
+
+        if average_daily_sales > 0:
+            std = self.table.daily_sales_std
+            reasoning = reorder_reasoning(
+                average_daily_sales, current_stock, self.lead_time_days, SAFETY_BUFFER_DAYS,
+                demand_safety_stock(float(std[row]) if std is not None else None, self.lead_time_days)
+            )
+        else:
+            reasoning = trial_order_reasoning(current_stock)
+
+        return ReorderRecommendation(
+            product_id=self.table.product_ids[row],
+            product_name=self.table.product_names[row],
+            current_stock=current_stock,
+            recommended_quantity=int(self.quantities[position]),
+            reasoning=reasoning,
+            urgency=LEVELS_BY_PRIORITY[self.priorities[position]]
+        )
+
+
+class InsightRows(LazyRows[DecisionInsight]):
+    """Decision insights ordered by priority, then product name"""
+
+    def __init__(
+        self,
+        risks: RiskRows,
+        slow_movers: SlowMoverRows,
+        reorder_recommendations: ReorderRows
+    ):
+        risk_count = len(risks)
+        self.risks = risks
+        self.slow_movers = slow_movers
+        self.reorder_recommendations = reorder_recommendations
+
+        # Risk insights come first, then slow movers, as in DecisionService
+        slow_priorities, slow_types = slow_mover_priorities(slow_movers.days_since_last_sale)
+        priorities = np.concatenate([risks.priorities, slow_priorities]).astype(np.int8)
+        decision_types = np.concatenate([_reorder_types(risk_count), slow_types])
+        table = risks.table
+        table_rows = np.concatenate([risks.rows, slow_movers.rows])
+        names = np.array([table.product_names[row] for row in table_rows], dtype=str)
+
+        # Two stable passes sort by (priority, name) and keep ties in order
+        order = np.argsort(names, kind='stable')
+        order = order[np.argsort(priorities[order], kind='stable')]
+
+        super().__init__(len(order))
+        self.table = table
+        self.sources = order
+        self.risk_count = risk_count
+        self.priorities = priorities[order]
+        self.decision_types = decision_types[order]
+        self.table_rows = table_rows[order]
+
+    def count_by_level(self) -> Dict[RiskLevel, int]:
+        return _count_by_level(self.priorities)
+
+    def index_columns(self) -> IndexColumns:
+        product_ids = [self.table.product_ids[row] for row in self.table_rows]
+        return self.priorities, self.decision_types, product_ids
+
+    def _build(self, position: int) -> DecisionInsight:
+        source = self.sources[position]
+        if source < self.risk_count:
+            risk = self.risks[source]
+            reorder_rec = self.reorder_recommendations.for_row(self.risks.rows[source])
+            return risk_insight(risk, reorder_rec)
+        return slow_mover_insight(self.slow_movers[source - self.risk_count])
+
+
+class VectorizedDecisionEngine:
+    """Array-based counterpart of DecisionService"""
+
+    def __init__(self):
+        self.slow_moving_threshold = settings.SLOW_MOVING_THRESHOLD_DAYS
+        self.low_stock_threshold = settings.LOW_STOCK_THRESHOLD_PERCENT
+        self.reorder_lead_time = settings.REORDER_LEAD_TIME_DAYS
+
+    def identify_inventory_risks(self, table: InventoryTable) -> RiskRows:
+        """Identify products at risk of stockout"""
+        # Skip products with no sales history
+        rows = np.flatnonzero(table.average_daily_sales != 0)
+        days = table.days_of_stock_remaining[rows]
+
+        priorities = np.full(len(rows), RISK_PRIORITY[RiskLevel.LOW], dtype=np.int8)
+        # Apply looser tiers first so stricter ones overwrite them;
+        # NaN compares false and stays LOW, as in DecisionService
+        for max_days, risk_level in reversed(STOCKOUT_RISK_TIERS):
+            priorities[days <= max_days] = RISK_PRIORITY[risk_level]
+
+        out_of_stock = table.current_stock[rows] == 0
+        priorities[out_of_stock] = RISK_PRIORITY[RiskLevel.CRITICAL]
+
+        order = np.argsort(priorities, kind='stable')
+        return RiskRows(table, rows[order], priorities[order], days[order], out_of_stock[order])
+
+    def identify_slow_moving_products(
+        self,
+        table: InventoryTable,
+        current_date: Optional[datetime] = None
+    ) -> SlowMoverRows:
+        """Identify slow-moving products that tie up cash"""
+        now = np.datetime64(current_date or datetime.now(), 'us')
+        has_sale = ~np.isnat(table.last_sale_date)
+        days_since = np.zeros(len(table), dtype=np.int64)
+        days_since[has_sale] = (now - table.last_sale_date[has_sale]) // np.timedelta64(1, 'D')
+
+        rows = np.flatnonzero(has_sale & (days_since >= self.slow_moving_threshold))
+        order = np.argsort(-days_since[rows], kind='stable')
+        rows = rows[order]
+        return SlowMoverRows(table, rows, days_since[rows])
+
+    def generate_reorder_recommendations(
+        self,
+        table: InventoryTable,
+        inventory_risks: RiskRows
+    ) -> ReorderRows:
+        """Generate reorder quantity recommendations"""
+        # Risks are already in inventory order sorted by urgency, which is
+        # the order DecisionService produces
+        rows = inventory_risks.rows
+        priorities = inventory_risks.priorities
+        stock = table.current_stock[rows]
+        average_daily_sales = table.average_daily_sales[rows]
+
+        # Skip if already out of stock and no sales history
+        keep = ~((stock == 0) & (average_daily_sales == 0))
+        rows, priorities = rows[keep], priorities[keep]
+        average_daily_sales = average_daily_sales[keep]
+
+        total_days_needed = self.reorder_lead_time + SAFETY_BUFFER_DAYS
+        quantity_needed = average_daily_sales * total_days_needed
+        if settings.SAFETY_STOCK_METHOD == "demand_variance" and table.daily_sales_std is not None:
+            # Lead-time demand plus variance-based safety stock where known
+            std = table.daily_sales_std[rows]
+            known = ~np.isnan(std)
+            safety_stock = settings.SAFETY_STOCK_Z * std[known] * np.sqrt(self.reorder_lead_time)
+            quantity_needed[known] = average_daily_sales[known] * self.reorder_lead_time + safety_stock
+        for risk_level, multiplier in URGENCY_MULTIPLIERS.items():
+            urgent = priorities == RISK_PRIORITY[risk_level]
+            quantity_needed[urgent] *= multiplier
+
+        # Round up to nearest reasonable quantity, as int() truncates
+        whole = np.trunc(quantity_needed).astype(np.int64)
+        quantities = whole + (ORDER_QUANTITY_STEP - whole % ORDER_QUANTITY_STEP)
+        quantities = np.maximum(quantities, MIN_ORDER_QUANTITY)
+        quantities[~(average_daily_sales > 0)] = TRIAL_ORDER_QUANTITY
+
+        return ReorderRows(table, rows, priorities, quantities, self.reorder_lead_time)
+
+    def generate_decision_insights(
+        self,
+        inventory_risks: RiskRows,
+        slow_movers: SlowMoverRows,
+        reorder_recommendations: ReorderRows
+    ) -> InsightRows:
+        """Combine all analyses into priority-ordered decision insights"""
+        return InsightRows(inventory_risks, slow_movers, reorder_recommendations)
@@ -0,0 +1,52 @@
+"""
+Shared test fixtures
+
+Every data directory points into a temporary directory, set through the
+environment before the settings are first imported.
+"""
+
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="decision-tests-")
+for _name, _path in {
+    "DATA_DIR": "",
+    "UPLOAD_DIR": "uploads",
+    "STORAGE_PATH": "transactions.db",
+    "SNAPSHOT_PATH": "snapshot",
+    "TENANT_DIR": "tenants",
+    "JOB_DIR": "jobs",
+    "PROFILE_DIR": "profiles",
+}.items():
+    os.environ[_name] = os.path.join(_DATA_DIR, _path)
+os.environ["JOB_PERSIST"] = "false"
+
+import pytest  # noqa: E402
+
+from benchmarks.synthetic import CSV_HEADER  # noqa: E402
+
+
+def transactions_csv(rows) -> bytes:
+    """CSV upload of (transaction_id, product_id, quantity, unit_price, date) rows"""
+    return (CSV_HEADER + "".join(
+        f"{transaction_id},{product_id},Product {product_id},{quantity},{unit_price},{day},C1\n"
+        for transaction_id, product_id, quantity, unit_price, day in rows
+    )).encode()
+
+
+@pytest.fixture
+def make_csv():
+    return transactions_csv
+
+
+@pytest.fixture
+def client():
+    """Test client of the app, with the default dataset emptied afterwards"""
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.dataset import dataset
+
+    with TestClient(app) as client:
+        yield client
+    dataset.reset()
@@ -0,0 +1,72 @@
+import numpy as np
+
+from services.aggregates import DailySalesBuckets, ProductAggregates
+from services.columnar import CsvStreamParser
+
+PRODUCTS = 15
+
+
+def _sales(rng, count, first_day=19000, days=120):
+    return (
+        rng.integers(0, PRODUCTS, count),
+        rng.integers(first_day, first_day + days, count),
+        rng.integers(1, 20, count),
+    )
+
+
+def _buckets(slots, days, quantity, batches=7):
+    buckets = DailySalesBuckets()
+    for part in np.array_split(np.arange(len(slots)), batches):
+        buckets.add(slots[part], days[part].astype("datetime64[D]"), quantity[part])
+    return buckets
+
+
+def test_date_ranges_match_brute_force():
+    rng = np.random.default_rng(3)
+    slots, days, quantity = _sales(rng, 4000)
+    buckets = _buckets(slots, days, quantity)
+    products = np.arange(PRODUCTS)
+
+    assert buckets.last_day == days.max()
+    for first, last in [(19000, 19119), (19031, 19059), (19050, 19050), (18000, 18999), (19100, 25000)]:
+        inside = (days >= first) & (days <= last)
+        expected = np.bincount(slots[inside], weights=quantity[inside], minlength=PRODUCTS)
+        assert buckets.sold_between(products, first, last).tolist() == expected.tolist()
+
+    after = rng.integers(18990, 19130, PRODUCTS)
+    expected = [quantity[(slots == p) & (days > after[p])].sum() for p in products]
+    assert buckets.sold_after(products, after).tolist() == expected
+
+
+def test_merge_and_snapshot_keep_ranges_and_last_day():
+    rng = np.random.default_rng(4)
+    slots, days, quantity = _sales(rng, 2000)
+    whole = _buckets(slots, days, quantity)
+
+    half = len(slots) // 2
+    merged = _buckets(slots[:half], days[:half], quantity[:half])
+    merged.merge(_buckets(slots[half:], days[half:], quantity[half:]), np.arange(PRODUCTS))
+    restored = DailySalesBuckets.from_arrays(whole.to_arrays())
+
+    products = np.arange(PRODUCTS)
+    for buckets in (merged, restored):
+        assert buckets.last_day == whole.last_day
+        assert (buckets.sold_between(products, 19010, 19070)
+                == whole.sold_between(products, 19010, 19070)).all()
+
+
+def test_recent_daily_sales_average_over_window(make_csv):
+    parser = CsvStreamParser()
+    batch = parser.feed(make_csv([
+        ("T1", "P1", 10, 1.0, "2024-01-01"),
+        ("T2", "P1", 6, 1.0, "2024-03-25"),
+        ("T3", "P2", 9, 1.0, "2024-03-29"),
+        ("T4", "P1", 4, 1.0, "2024-03-30"),
+    ]))
+    aggregates = ProductAggregates()
+    aggregates.update(batch)
+
+    # Window of 10 days ending 2024-03-30; P2 was first sold 2 days before its end
+    averages = aggregates.recent_daily_sales(10)
+    assert averages[aggregates.slot_of("P1")] == 1.0
+    assert averages[aggregates.slot_of("P2")] == 4.5
@@ -0,0 +1,107 @@
+import csv
+import io
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+
+from core.models import Transaction
+from services.columnar import CsvStreamParser, parse_transaction_rows, read_records
+
+CSV = (
+    "transaction_id,product_id,product_name,quantity,unit_price,transaction_date,customer_id\n"
+    "T1,P1,Widget,3,2.50,2024-01-05,C1\n"
+    "T2,P2,\"Gadget, large\",1,10,2024-01-06T10:30:00,\n"
+    "T3,P1,Widget,zero,2.50,2024-01-07,C2\n"
+    "T4,P3,Thing,0,1.00,2024-01-07,C2\n"
+    "T5,P3,Thing,2,abc,2024-01-08,C3\n"
+    "T6,P3,Thing,2,-1,2024-01-08,C3\n"
+    "T7,P3,Thing,2,1.00,not a date,C3\n"
+    "T8,P4,\"Multi\nline\",4,0.75,2024-02-01 08:00:00,C4\n"
+    "T9,P4\n"
+    "\n"
+    "T10,P2,Gadget,5,9.99,2024-02-03,C1\n"
+    "T11,P2,Gadget,1,9.99,now,C1\n"
+    "T12,P2,Gadget,1,9.99,2024,C1\n"
+    "T13,P2,Gadget,1,9.99,2024-02,C1\n"
+    "T14,P2,Gadget,1,9.99,2024-02-04T09:15:00+01:00,C1\n"
+)
+
+
+def _naive_utc(value):
+    """Columns hold timestamps with offsets as naive UTC"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _reference(text):
+    """The per-row pydantic parse the columnar path replaced"""
+    accepted = []
+    for row in csv.DictReader(io.StringIO(text, newline="")):
+        try:
+            accepted.append(Transaction(
+                transaction_id=row["transaction_id"],
+                product_id=row["product_id"],
+                product_name=row["product_name"],
+                quantity=int(row["quantity"]),
+                unit_price=float(row["unit_price"]),
+                transaction_date=_naive_utc(datetime.fromisoformat(row["transaction_date"])),
+                customer_id=row["customer_id"],
+            ))
+        except (TypeError, ValueError, ValidationError):
+            continue
+    return accepted
+
+
+def _parse(text):
+    reader = csv.reader(io.StringIO(text, newline=""))
+    return parse_transaction_rows(next(reader), *read_records(reader))
+
+
+def test_columnar_parse_matches_row_by_row_parse():
+    batch, _ = _parse(CSV)
+    assert batch.to_transactions() == _reference(CSV)
+    assert batch.transaction_ids.tolist() == ["T1", "T2", "T8", "T10", "T14"]
+
+
+def test_reject_report_names_each_rejected_line():
+    _, report = _parse(CSV)
+
+    assert report.total_rejected == 9
+    assert report.reasons == {
+        "malformed row": 1,
+        "invalid quantity": 1,
+        "quantity must be greater than 0": 1,
+        "invalid unit_price": 1,
+        "unit_price must be greater than 0": 1,
+        "invalid transaction_date": 4,
+    }
+    # T8's product name spans two lines and a blank line follows T9,
+    # so line numbers are physical lines, not record counts
+    assert [(s.line_number, s.reason) for s in report.samples] == [
+        (4, "invalid quantity"),
+        (5, "quantity must be greater than 0"),
+        (6, "invalid unit_price"),
+        (7, "unit_price must be greater than 0"),
+        (8, "invalid transaction_date"),
+        (11, "malformed row"),
+        (14, "invalid transaction_date"),
+        (15, "invalid transaction_date"),
+        (16, "invalid transaction_date"),
+    ]
+
+
+def test_stream_parser_matches_whole_parse_for_any_chunking():
+    batch, report = _parse(CSV)
+    data = CSV.encode()
+
+    for size in (1, 7, 64, len(data)):
+        parser = CsvStreamParser()
+        streamed = []
+        for start in range(0, len(data), size):
+            streamed += parser.feed(data[start:start + size]).to_transactions()
+        streamed += parser.close().to_transactions()
+
+        assert streamed == batch.to_transactions()
+        assert parser.rows_parsed == len(batch)
+        assert parser.reject_report == report
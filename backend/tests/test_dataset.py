@@ -0,0 +1,37 @@
+from services.dataset import Dataset
+
+
+def _rows(first, count, products, day):
+    return [
+        (f"T{first + i}", f"P{i % products}", 1 + i % 4, 2.5, day)
+        for i in range(count)
+    ]
+
+
+def test_ingest_does_not_build_inventory_models(make_csv):
+    dataset = Dataset()
+    dataset.ingest_csv_buffer(make_csv(_rows(0, 50, 10, "2024-03-01")))
+
+    assert len(dataset) == 10
+    assert dataset._inventory == {}
+    assert len(dataset.inventory_table()) == 10
+    assert dataset._inventory == {}
+
+
+def test_inventory_is_brought_up_to_date_on_access(make_csv):
+    first = make_csv(_rows(0, 50, 10, "2024-03-01"))
+    delta = make_csv(_rows(50, 14, 14, "2024-03-05"))
+
+    dataset = Dataset()
+    dataset.ingest_csv_buffer(first)
+    assert len(dataset.inventory) == 10
+    dataset.ingest_csv_buffer(delta)
+
+    # Only the products in the delta are recomputed, matching a fresh load
+    fresh = Dataset()
+    fresh.ingest_csv_buffer(first)
+    fresh.ingest_csv_buffer(delta)
+    assert dataset._stale_slots
+    assert dataset.inventory == fresh.inventory
+    assert dataset._stale_slots == []
+    assert len(dataset.inventory) == len(dataset) == 14
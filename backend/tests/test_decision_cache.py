@@ -0,0 +1,90 @@
+import threading
+
+from services import decision_cache
+from services.dataset import Dataset
+from services.decision_cache import DecisionCache, DecisionPipeline
+from services.decision_service import DecisionService
+
+
+def _pipeline(dataset, **cache_options):
+    return DecisionPipeline(dataset, DecisionService(), DecisionCache(**cache_options))
+
+
+def _rows(first, count, day):
+    return [(f"T{first + i}", f"P{i % 7}", 1 + i % 3, 2.0, day) for i in range(count)]
+
+
+def test_hits_misses_and_lru_eviction():
+    cache = DecisionCache(max_entries=2, ttl_seconds=60)
+    calls = []
+
+    def compute(key):
+        return lambda: calls.append(key) or key.upper()
+
+    assert cache.get_or_compute("a", compute("a")) == "A"
+    assert cache.get_or_compute("a", compute("a")) == "A"
+    cache.get_or_compute("b", compute("b"))
+    cache.get_or_compute("c", compute("c"))  # evicts "a"
+    cache.get_or_compute("a", compute("a"))
+
+    assert calls == ["a", "b", "c", "a"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 4
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(decision_cache.time, "monotonic", lambda: now[0])
+    cache = DecisionCache(ttl_seconds=10)
+    values = iter(range(10))
+
+    assert cache.get_or_compute("k", lambda: next(values)) == 0
+    now[0] += 9
+    assert cache.get_or_compute("k", lambda: next(values)) == 0
+    now[0] += 2
+    assert cache.get_or_compute("k", lambda: next(values)) == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_new_data_version_is_computed_afresh(make_csv):
+    dataset = Dataset()
+    dataset.ingest_csv_buffer(make_csv(_rows(0, 30, "2024-03-01")))
+    pipeline = _pipeline(dataset)
+
+    first = pipeline.insights()
+    assert pipeline.insights() is first
+    dataset.ingest_csv_buffer(make_csv(_rows(30, 5, "2024-03-09")))
+
+    second = pipeline.insights()
+    assert second is not first
+    fresh = _pipeline(dataset).insights()
+    assert [i.product_id for i in second] == [i.product_id for i in fresh]
+
+
+class _IngestOnLock:
+    """A dataset lock that bumps the version the first time it is taken"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.lock = threading.RLock()
+        self.bumped = False
+
+    def __enter__(self):
+        self.lock.acquire()
+        if not self.bumped:
+            self.bumped = True
+            self.dataset.version += 1
+
+    def __exit__(self, *exc):
+        self.lock.release()
+
+
+def test_values_are_stored_under_the_version_they_were_computed_from(make_csv):
+    dataset = Dataset()
+    dataset.ingest_csv_buffer(make_csv(_rows(0, 30, "2024-03-01")))
+    pipeline = _pipeline(dataset)
+    dataset.lock = _IngestOnLock(dataset)
+    version = dataset.version
+
+    assert pipeline._cached("probe", lambda: dataset.version) == version + 1
+    assert [key[1].number for key in pipeline.cache._entries] == [version + 1]
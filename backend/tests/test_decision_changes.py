@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+
+A = "/api/v1"
+
+
+def _kind(insight):
+    return 0 if insight["decision_type"] == "reorder" else 1
+
+
+def _keyed(insights):
+    return {(insight["product_id"], _kind(insight)): insight for insight in insights}
+
+
+def _insights(client):
+    body = client.get(A + "/decisions/stream", params={"format": "ndjson"}).text
+    return [json.loads(line) for line in body.splitlines() if line]
+
+
+def _ingest(client, make_csv, rows):
+    response = client.post(A + "/ingest/csv?append=true", files={"file": ("d.csv", make_csv(rows), "text/csv")})
+    assert response.status_code == 200
+
+
+def _history(now):
+    # Products last sold from days to a year ago, so they span every priority
+    return [
+        (f"T{p}-{n}", f"P{p}", 1 + (p + n) % 4, 3.0, (now - timedelta(days=p * 12 + n * 2)).date().isoformat())
+        for p in range(30)
+        for n in range(3)
+    ]
+
+
+def test_changes_match_a_brute_force_diff(client, make_csv):
+    now = datetime.now()
+    _ingest(client, make_csv, _history(now))
+    before = _insights(client)
+    since = client.get(A + "/decisions/cache").json()["data_version"]
+
+    assert client.get(A + "/decisions/changes", params={"since": since}).json()["total_changes"] == 0
+
+    # Recent sales revive slow movers, older ones turn discontinued products
+    # back into reviews, and new products appear
+    recent = now.date().isoformat()
+    delta = [(f"D{p}", f"P{p}", 20, 3.0, recent) for p in range(0, 30, 3)]
+    delta += [(f"R{p}", f"P{p}", 1, 3.0, (now - timedelta(days=100)).date().isoformat()) for p in range(25, 30)]
+    delta += [(f"N{p}", f"NEW{p}", 5, 3.0, recent) for p in range(3)]
+    _ingest(client, make_csv, delta)
+    after = _insights(client)
+
+    body = client.get(A + "/decisions/changes", params={"since": since}).json()
+    old, new = _keyed(before), _keyed(after)
+    changed = {
+        key for key in new.keys() & old.keys()
+        if (old[key]["priority"], old[key]["decision_type"]) != (new[key]["priority"], new[key]["decision_type"])
+    }
+    assert not body["full_resync"]
+    assert {(i["product_id"], _kind(i)) for i in body["added"]} == new.keys() - old.keys()
+    assert {(r["product_id"], _kind(r)) for r in body["removed"]} == old.keys() - new.keys()
+    assert {(c["insight"]["product_id"], _kind(c["insight"])) for c in body["changed"]} == changed
+    for change in body["changed"]:
+        previous = old[(change["insight"]["product_id"], _kind(change["insight"]))]
+        assert change["previous_priority"] == previous["priority"]
+        assert change["previous_decision_type"] == previous["decision_type"]
+    assert body["added"] and body["changed"] and body["removed"]
+    assert body["total_changes"] == len(body["added"]) + len(body["changed"]) + len(body["removed"])
+
+
+def test_unretained_versions_get_a_full_resync(client, make_csv):
+    now = datetime.now()
+    _ingest(client, make_csv, _history(now))
+    _ingest(client, make_csv, [("X1", "P1", 2, 3.0, now.date().isoformat())])
+    current = _insights(client)
+    version = client.get(A + "/decisions/cache").json()["data_version"]
+
+    for since in (0, version - 1):
+        response = client.get(A + "/decisions/changes", params={"since": since})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["full_resync"] and body["data_version"] == version
+        assert body["added"] == current
+        assert body["changed"] == body["removed"] == []
+
+    assert client.get(A + "/decisions/changes", params={"since": version + 1}).status_code == 400
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+from services.decision_cache import DecisionCache, DecisionPipeline
+from services.decision_service import DecisionService
+from services.dataset import dataset
+from services.tenants import tenant_registry
+
+
+def _ingest(client, make_csv, rows):
+    response = client.post("/api/v1/ingest/csv?append=true", files={"file": ("d.csv", make_csv(rows), "text/csv")})
+    assert response.status_code == 200
+
+
+def _rows(prefix, count):
+    today = date.today()
+    return [
+        (f"{prefix}{i}", f"P{i}", i + 1, 2.5, (today - timedelta(days=i * 20)).isoformat())
+        for i in range(count)
+    ]
+
+
+def test_etag_is_shared_by_pipelines_and_survives_recomputation():
+    # Two pipelines with separate caches stand in for two worker processes
+    first = DecisionPipeline(dataset, DecisionService(), DecisionCache(ttl_seconds=0))
+    second = DecisionPipeline(dataset, DecisionService(), DecisionCache())
+
+    assert first.etag('insights', 'limit=10') == first.etag('insights', 'limit=10')
+    assert first.etag('insights', 'limit=10') == second.etag('insights', 'limit=10')
+    assert first.etag('insights', 'limit=10') != first.etag('insights', 'limit=20')
+    assert first.etag('insights') != first.etag('summary')
+
+
+def test_conditional_requests_follow_data_and_query(client, make_csv):
+    _ingest(client, make_csv, _rows("T", 8))
+    url = "/api/v1/decisions/slow-movers"
+
+    response = client.get(url, params={"limit": 5})
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+
+    assert client.get(url, params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, params={"limit": 4}, headers={"If-None-Match": etag}).status_code == 200
+
+    summary = client.get("/api/v1/decisions/summary").headers["etag"]
+    assert client.get("/api/v1/decisions/summary", headers={"If-None-Match": summary}).status_code == 304
+
+    _ingest(client, make_csv, _rows("U", 3))
+    assert client.get(url, params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api/v1/decisions/summary", headers={"If-None-Match": summary}).status_code == 200
+
+
+def test_etags_and_cursors_do_not_survive_a_tenant_reload(client, make_csv, monkeypatch):
+    monkeypatch.setattr(tenant_registry, "max_resident", 1)
+    url = "/api/v1/tenants/north/decisions"
+
+    def ingest(tenant_id, rows):
+        response = client.post(
+            f"/api/v1/tenants/{tenant_id}/ingest/csv",
+            files={"file": ("d.csv", make_csv(rows), "text/csv")}
+        )
+        assert response.status_code == 200
+
+    try:
+        ingest("north", _rows("T", 6))
+        first = client.get(url, params={"limit": 2})
+        ingest("north", _rows("U", 3))
+        cursor = client.get(url, params={"limit": 2}).json()["next_cursor"]
+        # Evict north, then reload it from its snapshot
+        ingest("south", _rows("T", 2))
+        assert tenant_registry.evictions >= 1
+
+        response = client.get(url, params={"limit": 2}, headers={"If-None-Match": first.headers["etag"]})
+        assert response.status_code == 200
+        assert response.json()["data_version"] == 2
+        response = client.get(url, params={"limit": 2, "cursor": cursor})
+        assert response.status_code == 400 and "expired" in response.json()["detail"]
+    finally:
+        tenant_registry.delete("north")
+        tenant_registry.delete("south")
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+
+from api.routes import decisions
+from services.dataset import dataset
+
+A = "/api/v1"
+
+
+def _rows(prefix, products, days_ago=0):
+    day = (date.today() - timedelta(days=days_ago)).isoformat()
+    return [(f"{prefix}{p}", f"P{p:02d}", 1 + p % 3, 2.0, day) for p in range(products)]
+
+
+def _ingest(client, make_csv, rows):
+    response = client.post(A + "/ingest/csv?append=true", files={"file": ("d.csv", make_csv(rows), "text/csv")})
+    assert response.status_code == 200
+
+
+def _all_pages(client, path, key, **params):
+    rows, cursor = [], None
+    while True:
+        body = client.get(A + path, params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        rows += body[key]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return rows, body["total"]
+
+
+def test_pages_follow_each_other_to_the_full_list(client, make_csv):
+    _ingest(client, make_csv, _rows("T", 23))
+    everything = client.get(A + "/decisions/reorder-recommendations").json()["recommendations"]
+
+    paged, total = _all_pages(client, "/decisions/reorder-recommendations", "recommendations", limit=5)
+
+    assert paged == everything and total == len(everything) == 23
+
+
+def test_filters_and_top_k(client, make_csv):
+    _ingest(client, make_csv, _rows("T", 23))
+    _ingest(client, make_csv, [(f"O{p}", f"OLD{p}", 1, 2.0, (date.today() - timedelta(days=200)).isoformat()) for p in range(4)])
+    insights = client.post(A + "/decisions/generate?append=true").json()["insights"]
+
+    body = client.get(A + "/decisions/slow-movers", params={"product_id_prefix": "OLD"}).json()
+    assert body["total"] == 4 and all(row["product_id"].startswith("OLD") for row in body["slow_movers"])
+
+    body = client.post(A + "/decisions/generate?append=true", params={"decision_type": "reorder", "top_k": 3}).json()
+    reorders = [row for row in insights if row["decision_type"] == "reorder"]
+    assert body["insights"] == reorders[:3]
+    assert body["total_insights"] == len(reorders) and body["next_cursor"] is None
+
+
+def test_cursors_expire_when_the_data_changes(client, make_csv):
+    _ingest(client, make_csv, _rows("T", 12))
+    body = client.get(A + "/decisions/inventory-risks", params={"limit": 5}).json()
+    cursor = body["next_cursor"]
+    assert client.get(A + "/decisions/inventory-risks", params={"limit": 5, "cursor": cursor}).status_code == 200
+
+    _ingest(client, make_csv, _rows("U", 3))
+    response = client.get(A + "/decisions/inventory-risks", params={"limit": 5, "cursor": cursor})
+    assert response.status_code == 400 and "expired" in response.json()["detail"]
+    assert client.get(A + "/decisions/inventory-risks", params={"cursor": "junk"}).status_code == 400
+
+
+def test_page_reports_the_version_it_was_built_from(client, make_csv, monkeypatch):
+    _ingest(client, make_csv, _rows("T", 12))
+    version = dataset.version
+    versioned_index = decisions.pipeline.versioned_index
+
+    def ingest_after_lookup(analysis):
+        result = versioned_index(analysis)
+        dataset.ingest_csv_buffer(make_csv(_rows("U", 3)))
+        return result
+
+    monkeypatch.setattr(decisions.pipeline, "versioned_index", ingest_after_lookup)
+    body = client.post(A + "/decisions/generate?append=true", params={"limit": 5}).json()
+
+    assert dataset.version == version + 1
+    assert body["data_version"] == version and body["total_insights"] == 12
+    monkeypatch.undo()
+    response = client.post(A + "/decisions/generate?append=true", params={"limit": 5, "cursor": body["next_cursor"]})
+    assert response.status_code == 400
@@ -0,0 +1,73 @@
+import json
+from datetime import date, timedelta
+
+from services.serialization import stream_chunks
+
+URL = "/api/v1/decisions/stream"
+
+
+def _ingest(client, make_csv, count=6):
+    today = date.today()
+    rows = [
+        (f"T{i}", f"P{i}", i + 1, 2.5, (today - timedelta(days=100 + i * 30)).isoformat())
+        for i in range(count)
+    ]
+    response = client.post("/api/v1/ingest/csv?append=true", files={"file": ("d.csv", make_csv(rows), "text/csv")})
+    assert response.status_code == 200
+
+
+def _sse_events(body):
+    """(event, data) of each frame; frames end with a blank line"""
+    assert body.endswith("\n\n")
+    events = []
+    for frame in body[:-2].split("\n\n"):
+        event, data = frame.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_ndjson_sends_one_row_per_line_in_list_order(client, make_csv):
+    _ingest(client, make_csv)
+    listed = client.get("/api/v1/decisions/slow-movers").json()["slow_movers"]
+    assert len(listed) == 6
+
+    response = client.get(URL, params={"analysis": "slow_movers", "format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.endswith("\n")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == listed
+    assert response.headers["x-total-count"] == str(len(listed))
+    assert "x-next-cursor" not in response.headers
+
+    page = client.get(URL, params={"analysis": "slow_movers", "format": "ndjson", "limit": 2})
+    assert [json.loads(line) for line in page.text.splitlines()] == listed[:2]
+    cursor = page.headers["x-next-cursor"]
+    rest = client.get(URL, params={"analysis": "slow_movers", "format": "ndjson", "cursor": cursor})
+    assert [json.loads(line) for line in rest.text.splitlines()] == listed[2:]
+
+
+def test_sse_sends_one_event_per_row_then_an_end_event(client, make_csv):
+    _ingest(client, make_csv)
+    listed = client.get("/api/v1/decisions/slow-movers").json()["slow_movers"]
+
+    # Chosen from the Accept header when no format is given
+    response = client.get(
+        URL, params={"analysis": "slow_movers", "limit": 4}, headers={"Accept": "text/event-stream"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    events = _sse_events(response.text)
+    assert events[:-1] == [("slow_movers", row) for row in listed[:4]]
+    assert events[-1] == ("end", {"total": len(listed), "next_cursor": response.headers["x-next-cursor"]})
+
+
+def test_chunks_send_the_first_frame_alone_then_batch():
+    frames = [b"a" * 10] * 7
+    assert list(stream_chunks(iter(frames), chunk_bytes=25)) == [
+        b"a" * 10, b"a" * 30, b"a" * 30
+    ]
+    assert list(stream_chunks(iter([]), chunk_bytes=25)) == []
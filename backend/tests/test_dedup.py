@@ -0,0 +1,67 @@
+import numpy as np
+
+from services.columnar import CsvStreamParser
+from services.dedup import TransactionIdIndex, UploadDeduplicator, fingerprint_ids
+
+_MASK = (1 << 64) - 1
+
+
+def _reference_fingerprint(transaction_id):
+    """The fingerprint algorithm one id at a time, in plain Python"""
+    def mix(h):
+        h ^= h >> 30
+        h = (h * 0xBF58476D1CE4E5B9) & _MASK
+        h ^= h >> 27
+        h = (h * 0x94D049BB133111EB) & _MASK
+        return h ^ (h >> 31)
+
+    raw = transaction_id.encode()
+    raw = raw.ljust(max(-(-len(raw) // 8), 1) * 8, b"\0")
+    h = 0x9E3779B97F4A7C15
+    for start in range(0, len(raw), 8):
+        h = mix(h ^ int.from_bytes(raw[start:start + 8], "little"))
+    return h
+
+
+def test_fingerprints_depend_only_on_the_id():
+    ids = ["T1", "", "exactly8", "a-much-longer-transaction-id-0001", "ünïcode-id", "T1"]
+    fingerprints = fingerprint_ids(np.array(ids, dtype=object))
+
+    assert fingerprints.tolist() == [_reference_fingerprint(i) for i in ids]
+    # Batch composition (and so the padded width) does not matter
+    assert fingerprint_ids(np.array(["T1"], dtype=object))[0] == fingerprints[0]
+    assert len(set(fingerprints.tolist())) == 5
+
+
+def test_index_keeps_first_occurrences_only():
+    for bloom_bits in (0, 10):
+        index = TransactionIdIndex(bloom_bits)
+        first = fingerprint_ids(np.array([f"T{i}" for i in range(1000)], dtype=object))
+        assert index.add_new(first).all()
+
+        again = fingerprint_ids(np.array(["T5", "N1", "N1", "T999", "N2"], dtype=object))
+        assert index.add_new(again).tolist() == [False, True, False, False, True]
+        assert len(index) == 1002
+
+        restored = TransactionIdIndex.from_arrays(index.to_arrays(), bloom_bits)
+        assert restored.contains(again).all()
+        index.remove(again[[1, 4]])
+        assert index.contains(again).tolist() == [True, False, False, True, False]
+
+
+def test_upload_deduplicator_drops_known_and_repeated_rows(make_csv):
+    index = TransactionIdIndex(0)
+    rows = [("T1", "P1", 1, 1.0, "2024-01-01"), ("T2", "P1", 1, 1.0, "2024-01-02")]
+
+    first = UploadDeduplicator(index)
+    parser = CsvStreamParser()
+    assert len(first(parser.feed(make_csv(rows)))) == 2
+
+    second = UploadDeduplicator(index)
+    parser = CsvStreamParser()
+    batch = second(parser.feed(make_csv(rows + [("T3", "P2", 2, 1.0, "2024-01-03")] * 2)))
+    assert batch.transaction_ids.tolist() == ["T3"]
+    assert second.duplicates == 3
+
+    second.rollback()
+    assert index.contains(fingerprint_ids(np.array(["T1", "T3"], dtype=object))).tolist() == [True, False]
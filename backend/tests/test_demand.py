@@ -0,0 +1,73 @@
+import numpy as np
+
+from services.demand import RollingDemand
+
+WINDOWS = (7, 30)
+
+
+def _sales(rng, count, products=12, first_day=19000, days=90):
+    return (
+        rng.integers(0, products, count),
+        rng.integers(first_day, first_day + days, count),
+        rng.integers(1, 20, count),
+    )
+
+
+def _brute_force(slots, days, quantity, window, products):
+    """Mean and std of daily units over the window, from the first sale on"""
+    end = days.max()
+    means, stds = np.zeros(products), np.zeros(products)
+    for product in range(products):
+        sold = slots == product
+        if not sold.any():
+            continue
+        start = max(end - window + 1, days[sold].min())
+        daily = np.zeros(end - start + 1)
+        inside = sold & (days >= start)
+        np.add.at(daily, days[inside] - start, quantity[inside])
+        means[product], stds[product] = daily.mean(), daily.std()
+    return means, stds
+
+
+def test_incremental_batches_match_brute_force():
+    rng = np.random.default_rng(7)
+    slots, days, quantity = _sales(rng, 3000)
+    demand = RollingDemand(WINDOWS)
+    # Unordered batches, including sales older than the current windows
+    for part in np.array_split(rng.permutation(len(slots)), 9):
+        demand.add(slots[part], days[part], quantity[part])
+
+    assert demand.end_day == days.max()
+    for window in WINDOWS:
+        means, stds = _brute_force(slots, days, quantity, window, 12)
+        np.testing.assert_allclose(demand.mean(window), means)
+        np.testing.assert_allclose(demand.std(window), stds, atol=1e-9)
+
+
+def test_rolling_forward_drops_old_days():
+    demand = RollingDemand(WINDOWS)
+    demand.add(np.array([0, 0]), np.array([100, 101]), np.array([5, 3]))
+    demand.add(np.array([1]), np.array([140]), np.array([2]))
+
+    # Product 0's sales are more than 30 days before the newest day
+    np.testing.assert_allclose(demand.mean(30), [0.0, 2.0])
+    np.testing.assert_allclose(demand.mean(7), [0.0, 2.0])
+
+
+def test_merge_equals_adding_everything_to_one_instance():
+    rng = np.random.default_rng(11)
+    slots, days, quantity = _sales(rng, 2000)
+    whole = RollingDemand.from_daily_sales(slots, days, quantity, WINDOWS)
+
+    # The second instance numbers products in reverse
+    slot_map = np.arange(12)[::-1]
+    half = len(slots) // 2
+    merged = RollingDemand.from_daily_sales(slots[:half], days[:half], quantity[:half], WINDOWS)
+    other = RollingDemand.from_daily_sales(
+        slot_map[slots[half:]], days[half:], quantity[half:], WINDOWS
+    )
+    merged.merge(other, slot_map)
+
+    for window in WINDOWS:
+        np.testing.assert_allclose(merged.mean(window), whole.mean(window))
+        np.testing.assert_allclose(merged.std(window), whole.std(window), atol=1e-9)
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_runs_work_and_frees_the_slot():
+    executor = BoundedExecutor(max_workers=2, max_queue=0)
+
+    assert asyncio.run(executor.run(sum, [1, 2, 3])) == 6
+    assert executor.stats()["in_flight"] == 0
+    assert executor.stats()["completed"] == 1
+
+
+def test_cancelled_caller_keeps_the_slot_until_the_work_ends():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking() -> None:
+        started.set()
+        release.wait(5)
+
+    async def scenario() -> None:
+        task = asyncio.create_task(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # The worker is still busy, so the bound still applies
+        assert executor.stats()["in_flight"] == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(sum, [])
+
+    asyncio.run(scenario())
+    release.set()
+    executor._pool.shutdown(wait=True)
+    assert executor.stats()["in_flight"] == 0
+    assert executor.stats()["rejected"] == 1
@@ -0,0 +1,23 @@
+from services.dataset import dataset
+
+
+def _upload(client, make_csv, **params):
+    rows = [("T1", "P1", 2, 1.5, "2024-01-01"), ("T2", "P2", 0, 1.5, "2024-01-02")]
+    return client.post(
+        "/api/v1/ingest/csv", params=params, files={"file": ("d.csv", make_csv(rows), "text/csv")}
+    )
+
+
+def test_csv_upload_is_only_validated_by_default(client, make_csv):
+    version = dataset.version
+    body = _upload(client, make_csv).json()
+
+    assert body["records_processed"] == 1 and body["records_rejected"] == 1
+    assert dataset.version == version and not dataset
+
+
+def test_csv_upload_is_added_with_append(client, make_csv):
+    body = _upload(client, make_csv, append=True).json()
+
+    assert body["records_processed"] == 1
+    assert len(dataset) == 1
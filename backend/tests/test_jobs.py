@@ -0,0 +1,98 @@
+import io
+import os
+import threading
+import time
+
+from core.models import JobStatus
+from services.jobs import JobQueue
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _queue(job_dir, handler):
+    queue = JobQueue(job_dir=str(job_dir), persist=True, workers=1, max_queued=10, history_size=10)
+    queue.register("echo", handler)
+    return queue
+
+
+def test_queues_sharing_a_directory_leave_each_others_jobs_alone(tmp_path):
+    release = threading.Event()
+
+    def blocking(job):
+        release.wait(10)
+        return {"ok": True}
+
+    first = _queue(tmp_path, blocking)
+    first.start()
+    running = first.submit("echo", {}, io.BytesIO(b"a,b\n"))
+    queued = first.submit("echo", {}, io.BytesIO(b"c,d\n"))
+    _wait_for(lambda: running.status == JobStatus.RUNNING)
+
+    second = _queue(tmp_path, lambda job: {"ran_twice": True})
+    second.start()
+
+    assert second.get(running.job_id) is None
+    assert second.get(queued.job_id) is None
+    assert os.path.exists(queued.upload_path)
+
+    release.set()
+    _wait_for(lambda: queued.status == JobStatus.SUCCEEDED)
+    assert running.result == queued.result == {"ok": True}
+
+
+def test_jobs_of_a_stopped_process_are_taken_over(tmp_path):
+    stopped = _queue(tmp_path, lambda job: None)
+    # Submitted without workers running, then the owner goes away
+    job = stopped.submit("echo", {"n": 1}, io.BytesIO(b"x,y\n"))
+    stopped_dir = os.path.dirname(job.upload_path)
+    stopped._owner_lock.close()
+
+    def read_upload(job):
+        with open(job.upload_path, 'rb') as f:
+            return {"upload": f.read().decode()}
+
+    successor = _queue(tmp_path, read_upload)
+    successor.start()
+    resumed = successor.get(job.job_id)
+    assert resumed is not None
+    _wait_for(lambda: resumed.status == JobStatus.SUCCEEDED)
+
+    assert resumed.result == {"upload": "x,y\n"}
+    assert not os.path.exists(stopped_dir)
+    assert sorted(os.listdir(successor._queue_dir)) == sorted(["owner.lock", f"{job.job_id}.json"])
+
+
+def test_generate_job_keeps_totals_and_pages_insights(client, make_csv):
+    upload = make_csv([(f"T{i}", f"P{i % 6}", 2, 3.0, "2024-01-0%d" % (1 + i % 5)) for i in range(30)])
+    submitted = client.post(
+        "/api/v1/decisions/generate/jobs",
+        files={"file": ("t.csv", upload, "text/csv")}
+    ).json()
+
+    def finished():
+        return client.get(f"/api/v1/jobs/{submitted['job_id']}").json()["status"] in ("succeeded", "failed")
+
+    _wait_for(finished)
+    job = client.get(f"/api/v1/jobs/{submitted['job_id']}").json()
+    assert job["status"] == "succeeded"
+    assert "insights" not in job["result"]
+    total = job["result"]["total_insights"]
+    assert total > 2
+
+    url = f"/api/v1/decisions/generate/jobs/{submitted['job_id']}/insights"
+    first = client.get(url, params={"limit": 2}).json()
+    assert first["total_insights"] == total
+    assert first["data_version"] == job["result"]["data_version"]
+    assert len(first["insights"]) == 2
+    rest = client.get(url, params={"cursor": first["next_cursor"]}).json()
+    full = client.post("/api/v1/decisions/generate").json()
+    assert first["insights"] + rest["insights"] == full["insights"]
+
+    client.post("/api/v1/ingest/csv?append=true", files={"file": ("d.csv", make_csv([("N1", "P9", 1, 1.0, "2024-01-09")]), "text/csv")})
+    assert client.get(url).status_code == 410
+    assert client.get("/api/v1/decisions/generate/jobs/unknown/insights").status_code == 404
@@ -0,0 +1,94 @@
+import re
+
+from services.metrics import MetricsRegistry
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+
+def _samples(text):
+    """{(name, labels): value} of every sample line, checking the exposition format"""
+    assert text.endswith("\n")
+    samples, declared = {}, set()
+    for line in text.splitlines():
+        if line.startswith("# HELP ") or line.startswith("# TYPE "):
+            declared.add(line.split()[2])
+            continue
+        match = _SAMPLE.match(line)
+        assert match, line
+        name, labels, value = match.groups()
+        assert re.sub(r'_(bucket|sum|count)$', '', name) in declared or name in declared, line
+        samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def test_render_uses_the_text_exposition_format():
+    registry = MetricsRegistry()
+    counter = registry.counter("uploads_total", "Uploads", ["source"])
+    counter.inc(source='say "hi"\n')
+    counter.inc(2, source="api")
+    registry.gauge("answer", "The answer", lambda: 42)
+    histogram = registry.histogram("wait_seconds", "Waits", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(3)
+
+    lines = registry.render().splitlines()
+    assert lines[lines.index("# HELP uploads_total Uploads"):][:4] == [
+        "# HELP uploads_total Uploads",
+        "# TYPE uploads_total counter",
+        'uploads_total{source="api"} 2',
+        'uploads_total{source="say \\"hi\\"\\n"} 1',
+    ]
+    assert lines[lines.index("# TYPE answer gauge") + 1] == "answer 42"
+    assert lines[lines.index("# TYPE wait_seconds histogram") + 1:] == [
+        'wait_seconds_bucket{le="0.1"} 1',
+        'wait_seconds_bucket{le="1"} 2',
+        'wait_seconds_bucket{le="+Inf"} 3',
+        "wait_seconds_sum 3.55",
+        "wait_seconds_count 3",
+    ]
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter("uploads_total", "Uploads")
+    counter.inc()
+    with registry.stage("parse") as stage:
+        stage.rows = 10
+    assert counter.value() == 0
+    assert registry.stage_seconds.count(stage="parse") == 0
+
+
+def test_metrics_endpoint_counts_ingestion_and_cache_lookups(client, make_csv):
+    def scrape():
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        return _samples(response.text)
+
+    before = scrape()
+    upload = make_csv([("T1", "A", 2, 1.0, "2024-01-01"), ("T2", "B", "x", 1.0, "2024-01-02")])
+    assert client.post("/api/v1/ingest/csv?append=true", files={"file": ("d.csv", upload, "text/csv")}).status_code == 200
+    assert client.get("/api/v1/decisions/summary").status_code == 200
+    assert client.get("/api/v1/decisions/summary").status_code == 200
+    after = scrape()
+
+    def delta(name, labels=""):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+
+    assert sum(
+        value - before.get(key, 0) for key, value in after.items() if key[0] == "ingest_rejected_rows_total"
+    ) == 1
+    assert delta("decision_cache_requests_total", '{result="miss"}') >= 1
+    assert delta("decision_cache_requests_total", '{result="hit"}') >= 1
+    assert after[("dataset_products", "")] == 1
+
+    # Buckets are cumulative and end with +Inf, which equals the count
+    stages = {labels.split(",")[0] + "}" for name, labels in after if name == "pipeline_stage_seconds_bucket"}
+    assert stages
+    for stage in stages:
+        label = stage[1:-1]
+        buckets = [value for (name, labels), value in after.items()
+                   if name == "pipeline_stage_seconds_bucket" and labels.startswith("{" + label + ",")]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == after[("pipeline_stage_seconds_count", stage)]
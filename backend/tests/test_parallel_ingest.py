@@ -0,0 +1,53 @@
+import numpy as np
+
+from benchmarks.synthetic import generate_transactions_csv
+from services import parallel_ingest
+from services.data_service import DataService
+from services.parallel_ingest import parse_csv_file_parallel
+
+# Rejected, blank and multi-line rows, so line numbers cross shard boundaries
+_EXTRA = (
+    "X1,P1,Widget,zero,2.50,2024-01-07,C2\n"
+    "\n"
+    "X2,P2,\"Multi\nline\",4,0.75,2024-02-01 08:00:00,C4\n"
+    "X3,P3,Thing,2,1.00,not a date,C3\n"
+)
+
+
+def _assert_same_arrays(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, values in expected.items():
+        values, other = np.asarray(values), np.asarray(actual[name])
+        if values.dtype.kind == "f":
+            # Shard sums are added in a different order
+            assert np.allclose(other, values), name
+        else:
+            assert np.array_equal(other, values), name
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    path = generate_transactions_csv(str(tmp_path / "transactions.csv"), 20_000, products=300)
+    with open(path, "a") as f:
+        f.write(_EXTRA)
+    serial = DataService().ingest_csv_file(path, workers=1, keep_history=True)
+
+    for workers in (2, 3):
+        parallel = parse_csv_file_parallel(path, workers, keep_history=True)
+
+        assert parallel.rows_parsed == serial.rows_processed
+        assert len(parallel.product_ids) == serial.products_identified
+        assert parallel.reject_report == serial.reject_report
+        _assert_same_arrays(parallel.aggregates.to_arrays(), serial.aggregates.to_arrays())
+        _assert_same_arrays(parallel.history.to_arrays(), serial.history.to_arrays())
+
+
+def test_parses_share_one_pool(tmp_path):
+    path = generate_transactions_csv(str(tmp_path / "transactions.csv"), 1_000, products=10)
+
+    parse_csv_file_parallel(path, 2)
+    pool = parallel_ingest._pool
+    parse_csv_file_parallel(path, 2)
+    assert parallel_ingest._pool is pool
+
+    parallel_ingest.shutdown_pool()
+    assert parallel_ingest._pool is None
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from core.config import settings
+
+GENERATE = "/api/v1/decisions/generate"
+INGEST = "/api/v1/ingest/csv"
+
+
+@pytest.fixture
+def upload(make_csv):
+    return make_csv([("T1", "A", 2, 1.0, "2024-01-01"), ("T2", "B", 3, 2.0, "2024-01-05")])
+
+
+def _files(upload):
+    return {"file": ("d.csv", upload, "text/csv")}
+
+
+def test_profile_only_when_requested(client, upload, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_ENABLED", True)
+
+    plain = client.post(GENERATE, files=_files(upload))
+    assert plain.status_code == 200
+    assert "profile" not in plain.json()
+    assert client.post(INGEST, files=_files(upload)).json()["profile"] is None
+
+    for params, headers in [({"profile": "true"}, {}), ({}, {"X-Profile": "1"})]:
+        profile = client.post(GENERATE, params=params, headers=headers, files=_files(upload)).json()["profile"]
+        assert profile["hotspots"]
+        assert profile["path"] == os.path.join(settings.PROFILE_DIR, f"{profile['profile_id']}.prof")
+        assert os.path.exists(profile["path"])
+
+    profile = client.post(INGEST, params={"profile": "true"}, files=_files(upload)).json()["profile"]
+    assert "-ingest-" in profile["profile_id"]
+
+
+def test_requests_are_not_profiled_unless_enabled(client, upload, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_ENABLED", False)
+
+    response = client.post(GENERATE, params={"profile": "true"}, headers={"X-Profile": "1"}, files=_files(upload))
+    assert response.status_code == 200
+    assert "profile" not in response.json()
+    assert client.post(INGEST, params={"profile": "true"}, files=_files(upload)).json()["profile"] is None
@@ -0,0 +1,49 @@
+import asyncio
+import gzip
+import json
+
+from starlette.requests import Request
+
+from api import responses
+from core.config import settings
+
+
+def _request(accept_encoding="gzip"):
+    return Request({"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]})
+
+
+def _offloaded(monkeypatch):
+    calls = []
+    run = responses.executor.run
+
+    async def recording_run(fn, *args):
+        calls.append(fn)
+        return await run(fn, *args)
+
+    monkeypatch.setattr(responses.executor, "run", recording_run)
+    return calls
+
+
+def test_large_bodies_are_compressed_on_the_worker_pool(monkeypatch):
+    calls = _offloaded(monkeypatch)
+    body = json.dumps({"rows": list(range(100_000))}).encode()
+    assert len(body) >= settings.RESPONSE_COMPRESS_OFFLOAD_BYTES
+
+    response = asyncio.run(responses.json_response(_request(), body, etag='W/"1"'))
+
+    assert calls
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"1"'
+    assert gzip.decompress(response.body) == body
+
+
+def test_small_bodies_are_compressed_inline(monkeypatch):
+    calls = _offloaded(monkeypatch)
+    body = json.dumps({"rows": list(range(1000))}).encode()
+
+    response = asyncio.run(responses.json_response(_request(), body))
+
+    assert not calls
+    assert gzip.decompress(response.body) == body
+    plain = asyncio.run(responses.json_response(_request("identity"), body))
+    assert "content-encoding" not in plain.headers and plain.body == body
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.config import settings
+from core.models import RiskLevel, ScenarioGrid, ScenarioParameters
+from services import vectorized_decisions
+from services.columnar import InventoryTable
+from services.scenarios import ScenarioSweep, expand_grid
+from services.vectorized_decisions import VectorizedDecisionEngine
+
+NOW = datetime(2024, 6, 1)
+PRODUCTS = 400
+
+
+def _table(rng):
+    """Inventory with stockouts, unsold products, unknown costs and unknown deviations"""
+    stock = rng.integers(0, 200, PRODUCTS)
+    stock[rng.random(PRODUCTS) < 0.1] = 0
+    average_daily_sales = np.round(rng.uniform(0, 12, PRODUCTS), 3)
+    average_daily_sales[rng.random(PRODUCTS) < 0.1] = 0
+    last_sale = np.datetime64(NOW, 'us') - rng.integers(0, 200 * 86400, PRODUCTS).astype('timedelta64[s]')
+    last_sale[rng.random(PRODUCTS) < 0.05] = np.datetime64('NaT')
+    unit_cost = np.round(rng.uniform(0, 30, PRODUCTS), 2)
+    unit_cost[rng.random(PRODUCTS) < 0.2] = 0
+    daily_sales_std = rng.uniform(0, 4, PRODUCTS)
+    daily_sales_std[rng.random(PRODUCTS) < 0.2] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_remaining = np.where(average_daily_sales > 0, stock / average_daily_sales, np.nan)
+    return InventoryTable(
+        product_ids=[f"P{i}" for i in range(PRODUCTS)],
+        product_names=[f"Product {i}" for i in range(PRODUCTS)],
+        current_stock=stock,
+        unit_cost=unit_cost,
+        last_sale_date=last_sale.astype('datetime64[us]'),
+        average_daily_sales=average_daily_sales,
+        days_of_stock_remaining=days_remaining,
+        daily_sales_std=daily_sales_std
+    )
+
+
+def _single_run(table, scenario, monkeypatch):
+    """Totals from VectorizedDecisionEngine configured with the scenario's settings"""
+    monkeypatch.setattr(settings, "REORDER_LEAD_TIME_DAYS", scenario.reorder_lead_time_days)
+    monkeypatch.setattr(settings, "SLOW_MOVING_THRESHOLD_DAYS", scenario.slow_moving_threshold_days)
+    monkeypatch.setattr(vectorized_decisions, "SAFETY_BUFFER_DAYS", scenario.safety_buffer_days)
+    engine = VectorizedDecisionEngine()
+    risks = engine.identify_inventory_risks(table)
+    slow_movers = engine.identify_slow_moving_products(table, NOW)
+    reorders = engine.generate_reorder_recommendations(table, risks)
+    return risks, slow_movers, reorders
+
+
+@pytest.mark.parametrize("method", ["buffer_days", "demand_variance"])
+def test_sweep_matches_single_runs(monkeypatch, method):
+    monkeypatch.setattr(settings, "SAFETY_STOCK_METHOD", method)
+    table = _table(np.random.default_rng(11))
+    scenarios = expand_grid(ScenarioGrid(
+        reorder_lead_time_days=[0, 3, 7, 21],
+        slow_moving_threshold_days=[0, 30, 90, 500],
+        safety_buffer_days=[0, 14]
+    ))
+    assert len(scenarios) == 32
+
+    results = ScenarioSweep(table, NOW).evaluate(scenarios)
+
+    for scenario, result in zip(scenarios, results):
+        assert result.parameters == scenario
+        with monkeypatch.context() as patch:
+            risks, slow_movers, reorders = _single_run(table, scenario, patch)
+        assert result.inventory_risks == len(risks)
+        assert result.critical_actions == risks.count_by_level()[RiskLevel.CRITICAL]
+        assert result.slow_moving_products == len(slow_movers)
+        assert result.capital_tied_up == pytest.approx(float(slow_movers.total_value.sum()))
+        assert result.reorder_recommendations == len(reorders)
+        assert result.reorder_units == int(reorders.quantities.sum())
+        assert result.reorder_cost == pytest.approx(float(reorders.quantities @ table.unit_cost[reorders.rows]), abs=0.01)
+        assert result.total_insights == len(risks) + len(slow_movers)
+
+
+def test_unset_parameters_use_the_configured_ones():
+    table = _table(np.random.default_rng(12))
+    sweep = ScenarioSweep(table, NOW)
+    configured = ScenarioParameters(
+        reorder_lead_time_days=settings.REORDER_LEAD_TIME_DAYS,
+        slow_moving_threshold_days=settings.SLOW_MOVING_THRESHOLD_DAYS,
+        safety_buffer_days=vectorized_decisions.SAFETY_BUFFER_DAYS
+    )
+    default, explicit = sweep.evaluate([ScenarioParameters(name="default"), configured])
+    assert default.parameters == configured.model_copy(update={"name": "default"})
+    assert default.model_dump(exclude={"parameters"}) == explicit.model_dump(exclude={"parameters"})
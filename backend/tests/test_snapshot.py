@@ -0,0 +1,53 @@
+from dataclasses import fields
+
+import numpy as np
+import pytest
+
+from services.columnar import read_stock_csv
+from services.dataset import Dataset
+
+
+def _assert_same_columns(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name, values in expected.items():
+        if isinstance(values, np.ndarray):
+            assert np.array_equal(np.asarray(actual[name]), values, equal_nan=values.dtype.kind == "f"), name
+        else:
+            assert list(actual[name]) == list(values), name
+
+
+def _table_columns(table):
+    return {field.name: getattr(table, field.name) for field in fields(table)
+            if getattr(table, field.name) is not None}
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_save_and_load_round_trip(tmp_path, make_csv, compress):
+    source = Dataset(retain_history=True, deduplicate=True)
+    source.ingest_csv_buffer(make_csv([("T1", "A", 2, 1.5, "2024-01-01"), ("T2", "B", 3, 4.0, "2024-01-05")]))
+    source.ingest_csv_buffer(make_csv([("T3", "A", 1, 1.5, "2024-02-01")]))
+    batch, _ = read_stock_csv(b"product_id,stock_on_hand,unit_cost\nA,50,4.5\n")
+    source.import_stock(batch)
+    manifest = source.save_snapshot(str(tmp_path / "snapshot"), compress=compress)
+    assert manifest["version"] == source.version
+
+    restored = Dataset(retain_history=True, deduplicate=True)
+    for _ in range(5):
+        restored.ingest_csv_buffer(make_csv([("X1", "Z", 1, 1.0, "2023-01-01")]), replace=True)
+    epoch = restored.epoch
+    snapshot = restored.load_snapshot(str(tmp_path / "snapshot"))
+
+    # The saved version comes back, under a new epoch
+    assert snapshot.version == restored.version == source.version
+    assert restored.epoch != epoch
+    _assert_same_columns(restored.aggregates.to_arrays(), source.aggregates.to_arrays())
+    _assert_same_columns(_table_columns(restored.inventory_table()), _table_columns(source.inventory_table()))
+    _assert_same_columns(restored.history.to_arrays(), source.history.to_arrays())
+    _assert_same_columns(restored.stock.to_arrays(), source.stock.to_arrays())
+    assert len(restored.transaction_ids) == 3
+
+    # Restored state keeps working: the id index still rejects old rows
+    result = restored.ingest_csv_buffer(make_csv([("T1", "A", 2, 1.5, "2024-01-01"), ("T4", "C", 1, 2.0, "2024-02-02")]))
+    assert result.duplicate_rows == 1
+    assert restored.version == source.version + 1
+    assert sorted(restored.aggregates.product_ids) == ["A", "B", "C"]
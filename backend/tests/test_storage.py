@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+from services.dataset import Dataset
+from services.storage import SqliteTransactionStore
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "transactions.db")
+
+
+def _stored_dataset(path, pool_size=2):
+    dataset = Dataset()
+    dataset.attach_store(SqliteTransactionStore(path=path, pool_size=pool_size))
+    return dataset
+
+
+def _totals(dataset):
+    summary = dataset.aggregates.summary()
+    return dict(zip(summary.product_ids, summary.total_sold.tolist()))
+
+
+def test_processes_sharing_a_store_see_each_others_writes(store_path, make_csv):
+    writer = _stored_dataset(store_path)
+    reader = _stored_dataset(store_path)
+
+    writer.ingest_csv_buffer(make_csv([("T1", "A", 2, 1.0, "2024-01-01"), ("T2", "B", 3, 1.0, "2024-01-02")]))
+    assert reader.sync()
+    assert _totals(reader) == {"A": 2, "B": 3}
+    assert reader.version == writer.version
+
+    writer.ingest_csv_buffer(make_csv([("T3", "C", 1, 1.0, "2024-01-03")]), replace=True)
+    assert reader.sync()
+    assert _totals(reader) == {"C": 1}
+    assert not reader.sync()
+
+    # A fresh process rebuilds everything from the store
+    assert _totals(_stored_dataset(store_path)) == {"C": 1}
+
+
+def test_sync_during_a_slow_upload_does_not_deadlock(store_path, make_csv):
+    # One pooled connection: an upload that held it while parsing used
+    # to deadlock with a sync holding the dataset lock
+    dataset = _stored_dataset(store_path, pool_size=1)
+    upload = make_csv([(f"T{i}", f"P{i % 3}", 1, 1.0, "2024-01-01") for i in range(20)])
+    parsing, proceed = threading.Event(), threading.Event()
+
+    def chunks():
+        yield upload[:60]
+        parsing.set()
+        proceed.wait(10)
+        yield upload[60:]
+
+    uploader = threading.Thread(target=dataset.ingest_csv_stream, args=(chunks(),), daemon=True)
+    syncer = threading.Thread(target=dataset.sync, daemon=True)
+    uploader.start()
+    assert parsing.wait(10)
+    syncer.start()
+    syncer.join(0.5)
+    proceed.set()
+
+    uploader.join(10)
+    syncer.join(10)
+    assert not uploader.is_alive() and not syncer.is_alive()
+    assert sum(_totals(dataset).values()) == 20
+
+
+def test_stock_imports_are_stored_and_survive_replacing_transactions(store_path, make_csv):
+    from services.columnar import read_stock_csv
+
+    writer = _stored_dataset(store_path)
+    reader = _stored_dataset(store_path)
+    writer.ingest_csv_buffer(make_csv([("T1", "A", 2, 1.0, "2024-01-01"), ("T2", "B", 3, 1.0, "2024-01-05")]))
+
+    batch, _ = read_stock_csv(b"product_id,stock_on_hand,unit_cost\nA,50,4.5\nB,,2.0\nZ,7,\n")
+    assert writer.import_stock(batch) == 2
+    batch, _ = read_stock_csv(b"product_id,stock_on_hand,unit_cost\nA,,5.0\n")
+    writer.import_stock(batch)
+
+    def levels(dataset):
+        table = dataset.inventory_table()
+        return {
+            product_id: (stock, cost)
+            for product_id, stock, cost in zip(table.product_ids, table.current_stock.tolist(), table.unit_cost.tolist())
+        }
+
+    expected = {"A": (50, 5.0), "B": (0, 2.0)}
+    assert levels(writer) == expected
+    assert reader.sync()
+    assert levels(reader) == expected
+    assert reader.version == writer.version
+
+    # Stock stays when the transactions are replaced, and after a restart
+    writer.ingest_csv_buffer(make_csv([("T3", "A", 1, 1.0, "2024-02-01")]), replace=True)
+    assert reader.sync()
+    assert levels(reader) == {"A": (49, 5.0)}
+    assert levels(_stored_dataset(store_path)) == {"A": (49, 5.0)}
+
+    writer.reset()
+    assert reader.sync()
+    assert len(reader.stock) == 0
+
+
+def test_ids_committed_by_another_process_during_a_parse_are_skipped(store_path, make_csv):
+    def stored(path):
+        dataset = Dataset(deduplicate=True)
+        dataset.attach_store(SqliteTransactionStore(path=path, pool_size=2))
+        return dataset
+
+    first, second = stored(store_path), stored(store_path)
+    overlapping = make_csv([(f"T{i}", f"P{i % 3}", 1, 1.0, "2024-01-01") for i in range(10)])
+    later = make_csv([(f"T{i}", f"P{i % 3}", 1, 1.0, "2024-01-02") for i in range(5, 15)])
+
+    def chunks():
+        yield later[:80]
+        # The other process commits ids T5..T9 before this upload does
+        first.ingest_csv_buffer(overlapping)
+        yield later[80:]
+
+    result = second.ingest_csv_stream(chunks())
+    assert result.duplicate_rows == 5
+    assert sum(_totals(second).values()) == 15
+    assert len(second.transaction_ids) == 15
+
+    assert first.sync()
+    assert _totals(first) == _totals(second)
+    assert sum(_totals(stored(store_path)).values()) == 15
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from services.dataset import Dataset
+from services.tenants import TenantNotFound, TenantRegistry
+
+
+def _registry(tmp_path, max_resident=1):
+    return TenantRegistry(tenant_dir=str(tmp_path), max_resident=max_resident, memory_budget_bytes=1 << 40)
+
+
+def _ingest(registry, tenant_id, upload):
+    with registry.use(tenant_id, create=True) as tenant:
+        tenant.dataset.ingest_csv_buffer(upload)
+
+
+def _products(registry, tenant_id):
+    with registry.use(tenant_id) as tenant:
+        return sorted(tenant.dataset.aggregates.product_ids)
+
+
+def _finishes(fn, *args, timeout=5.0):
+    """Whether fn(*args) returns within the timeout"""
+    thread = threading.Thread(target=fn, args=args, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_tenants_are_isolated_and_reloaded_after_eviction(tmp_path, make_csv):
+    registry = _registry(tmp_path)
+    _ingest(registry, "north", make_csv([("T1", "A", 1, 1.0, "2024-01-01")]))
+    _ingest(registry, "south", make_csv([("T1", "B", 1, 1.0, "2024-01-01")]))
+
+    assert registry.evictions == 1
+    assert registry.saved_tenants() == ["north"]
+    assert _products(registry, "north") == ["A"]
+    assert _products(registry, "south") == ["B"]
+    assert registry.loads == 2
+
+    assert registry.delete("north")
+    with pytest.raises(TenantNotFound):
+        registry.use("north").__enter__()
+
+
+def test_loading_a_tenant_does_not_block_other_tenants(tmp_path, make_csv, monkeypatch):
+    registry = _registry(tmp_path, max_resident=2)
+    _ingest(registry, "big", make_csv([("T1", "A", 1, 1.0, "2024-01-01")]))
+    _ingest(registry, "small", make_csv([("T1", "B", 1, 1.0, "2024-01-01")]))
+    registry.max_resident = 1
+    registry._evict()
+    assert registry.saved_tenants() == ["big"]
+
+    loading, release = threading.Event(), threading.Event()
+    load_snapshot = Dataset.load_snapshot
+
+    def slow_load(self, path=None):
+        loading.set()
+        release.wait(10)
+        return load_snapshot(self, path)
+
+    monkeypatch.setattr(Dataset, "load_snapshot", slow_load)
+    results = {}
+    reader = threading.Thread(target=lambda: results.update(big=_products(registry, "big")), daemon=True)
+    reader.start()
+    assert loading.wait(10)
+
+    # Served while big's snapshot is still being read
+    assert _finishes(_products, registry, "small")
+    release.set()
+    reader.join(10)
+    assert results == {"big": ["A"]}
+
+
+def test_evicting_tenant_is_taken_back_while_its_snapshot_is_written(tmp_path, make_csv, monkeypatch):
+    registry = _registry(tmp_path)
+    _ingest(registry, "first", make_csv([("T1", "A", 1, 1.0, "2024-01-01")]))
+
+    saving, release = threading.Event(), threading.Event()
+    save_snapshot = Dataset.save_snapshot
+
+    def slow_save(self, path=None, compress=None):
+        if not saving.is_set():
+            saving.set()
+            release.wait(10)
+        return save_snapshot(self, path, compress)
+
+    monkeypatch.setattr(Dataset, "save_snapshot", slow_save)
+    writer = threading.Thread(
+        target=_ingest, args=(registry, "second", make_csv([("T1", "B", 1, 1.0, "2024-01-01")])), daemon=True
+    )
+    writer.start()
+    assert saving.wait(10)
+
+    # Other tenants are not held up, and the evicting one is still usable
+    assert _finishes(_ingest, registry, "third", make_csv([("T1", "C", 1, 1.0, "2024-01-01")]))
+    with registry.use("first") as tenant:
+        # Taken back from memory rather than reloaded
+        assert registry.loads == 0
+        assert sorted(tenant.dataset.aggregates.product_ids) == ["A"]
+        release.set()
+    writer.join(10)
+    assert not writer.is_alive()